@@ -1,49 +1,72 @@
+import os
 import sys
-import time
 
-from PySide6.QtCore import QThread, Signal, Qt
-from PySide6.QtGui import QColor
-from PySide6.QtWidgets import QApplication, QFileDialog, QComboBox, QPushButton, QLabel, QCheckBox
-
-from CSVManager.view.CSVView import CSVTableViewer, CSVLoaderThread
-from CSVManager.Reader import Reader as CSVReader
+from PySide6.QtCore import Signal, Qt
+from PySide6.QtGui import QAction, QColor
+from PySide6.QtWidgets import (QApplication, QFileDialog, QComboBox, QPushButton, QLabel, QCheckBox, QLineEdit,
+                               QMessageBox, QSpinBox)
+
+from CSVManager.Aggregation import (STAT_MEAN, STAT_SUM, STAT_COUNT, STAT_MIN, STAT_MAX,
+                                     STAT_MEDIAN)
+from CSVManager.Expressions import Expression, ExpressionError
+from CSVManager.Filters import RowFilter
+from CSVManager.ParseErrors import ON_ERROR_RAISE, ON_ERROR_SKIP, ON_ERROR_NAN, ON_ERROR_QUARANTINE
+from CSVManager.Jobs import Job, JobScheduler, PRIORITY_LOAD, PRIORITY_PREFETCH, PRIORITY_PREVIEW
+from CSVManager.view.CSVView import CSVTableViewer, CSVPrefetchJob, read_table
+from CSVManager.view.CheckableComboBox import CheckableComboBox
+from CSVManager.view.ParseErrorsView import ParseErrorsDialog
+from CSVManager.Shards import preview_path
 from ColorListModel import ColorListModel, ColorDelegate
+from PlotService import RemoteDataset, ServiceClient, ServiceError
 
 
-class CSVLoaderNThread(QThread):
-    """
-    Поток для загрузки n-го количества строк из CSV файла.
+class CSVServiceJob(CSVPrefetchJob):
     """
+    Разбор файла локальным сервисом (PlotService).
 
-    data_loaded = Signal(list, list)
-    error_message = Signal(str)
+    Задача только опрашивает состояние разбора и передаёт окну графиков
+    RemoteDataset с теми же сигналами, что и при разборе в приложении.
+    """
 
-    def __init__(self, file_path, n):
-        super().__init__()
-        self.file_path = file_path
-        self.delimiter = None
-        self.encoding = None
-        self.rows_to_load = n
+    def __init__(self, client, file_path, on_error=ON_ERROR_NAN, row_filter=None, poll_interval=100,
+                 priority=PRIORITY_PREFETCH):
+        """
+        :param client: ServiceClient.
+        :param file_path: Путь к файлу.
+        :param on_error: Политика обработки ошибок.
+        :param row_filter: Фильтр строк (RowFilter) или None.
+        :param poll_interval: Интервал опроса сервиса, мс.
+        """
+        super().__init__(file_path, on_error=on_error, row_filter=row_filter, priority=priority)
+        self.client = client
+        self.poll_interval = poll_interval
 
     def run(self):
+        dataset = RemoteDataset(self.client, self.file_path, self.on_error, self.row_filter)
+        self.dataset = dataset
         try:
-            reader = CSVReader(self.file_path)
-            data = reader.read_n(self.rows_to_load)
-            self.encoding = reader.encoding
-            self.delimiter = reader.delimiter
-            if data:
-                headers = list(data[0].keys())
-                rows = [list(row.values()) for row in data]
-                self.data_loaded.emit(headers, rows)
-            else:
-                self.data_loaded.emit([],[])
-        except Exception as e:
-            self.error_message.emit(str(e))
+            while not self.is_cancelled():
+                if dataset.refresh() and dataset.row_count:
+                    self._on_chunk(dataset)
+                if dataset.complete:
+                    return dataset
+                self.sleep(self.poll_interval / 1000)
+        except (ServiceError, OSError, EOFError) as e:
+            raise RuntimeError(f"Сервис: {e}") from None
 
 
 class CSVLoader(CSVTableViewer):
 
-    cols_selected = Signal(list, str, str, str)
+    # Набор данных, файл, столбец X, столбцы Y, цвета их серий и настройки агрегирования (или None)
+    cols_selected = Signal(object, str, str, list, list, object)
+
+    # Дозагрузка и завершение загрузки набора данных, уже переданного в cols_selected
+    dataset_updated = Signal(object)
+
+    dataset_completed = Signal(object)
+    # Загрузка набора данных, уже переданного в cols_selected, прервана (другой файл, фильтр или ошибка):
+    # графики остаются построенными по уже разобранным строкам
+    dataset_aborted = Signal(object)
 
     is_line_checked = Signal(bool)
 
@@ -63,11 +86,41 @@ class CSVLoader(CSVTableViewer):
         # QColor("gray"), # Пример добавления без имени
     ]
 
+    on_error_policies = [
+        ("Ошибки: NaN", ON_ERROR_NAN),
+        ("Ошибки: пропуск", ON_ERROR_SKIP),
+        ("Ошибки: карантин", ON_ERROR_QUARANTINE),
+        ("Ошибки: остановка", ON_ERROR_RAISE),
+    ]
+
+    aggregations = [
+        ("Без агрегации", None),
+        ("Среднее", STAT_MEAN),
+        ("Сумма", STAT_SUM),
+        ("Количество", STAT_COUNT),
+        ("Минимум", STAT_MIN),
+        ("Максимум", STAT_MAX),
+        ("Медиана", STAT_MEDIAN),
+        ("90-й процентиль", 0.9),
+    ]
+
     def __init__(self):
         super().__init__()
         self._init_selection_widget()
         self.setMaximumHeight(350)
 
+        self.file_name = None
+        # Подключение к локальному сервису разбора, если он запущен
+        self.service = None
+        self.prefetch_job = None
+        self._build_pending = False
+        self._streaming_dataset = None
+        self._errors_dataset = None
+        # Выражения производных столбцов, которые можно выбрать наравне со столбцами файла
+        self.derived_columns = []
+        # Столбцы файла для проверки условий фильтра
+        self.file_headers = []
+
 
 
     def _open_file(self):
@@ -78,25 +131,45 @@ class CSVLoader(CSVTableViewer):
 
         self.file_name, _ = QFileDialog.getOpenFileName(
             self, "Открыть CSV файл с данными", "",
-            "CSV Files (*.csv);;All Files (*)"
+            "CSV Files (*.csv *.csv.gz *.csv.bz2 *.csv.xz *.csv.zst);;All Files (*)"
         )
         if self.file_name:
             self._load_5_lines_from_csv_file(self.file_name)
 
+    def _open_folder(self):
+        """
+        Открытие папки с частями файла (одинаковые заголовки) как одной таблицы.
+        :return:
+        """
+        folder = QFileDialog.getExistingDirectory(self, "Открыть папку с CSV файлами")
+        if folder:
+            self.file_name = folder
+            self._load_5_lines_from_csv_file(folder)
+
+    def _create_actions(self):
+        super()._create_actions()
+        self.open_folder_action = QAction("Открыть папку", self)
+        self.open_folder_action.setShortcut("Ctrl+Shift+O")
+        self.open_folder_action.triggered.connect(self._open_folder)
+
+    def _create_menus(self):
+        super()._create_menus()
+        self.file_menu.insertAction(self.file_menu.actions()[1], self.open_folder_action)
+
     def _load_5_lines_from_csv_file(self, file_name):
         """
         Загрузка данных из CSV.
         :param file_name:
         :return:
         """
+        self._cancel_prefetch()
+
         self.progress_bar.setRange(0, 0)
         self.progress_bar.setVisible(True)
         self.status_bar.showMessage(f"Загрузка файла: {file_name}")
 
-        self.loader_5_thread = CSVLoaderNThread(file_name, 5)
-        self.loader_5_thread.data_loaded.connect(self._on_data_loaded)
-        self.loader_5_thread.error_message.connect(self._on_load_error)
-        self.loader_5_thread.start()
+        # Для папки с частями предпросмотр строится по первой части
+        self._submit_table_job(Job(read_table, preview_path(file_name), rows=5, priority=PRIORITY_PREVIEW))
 
     def _on_data_loaded(self, headers, data):
         super()._on_data_loaded(headers, data)
@@ -104,18 +177,133 @@ class CSVLoader(CSVTableViewer):
         self.x_col_combobox.clear()
         self.y_col_combobox.clear()
 
-        self.x_col_combobox.addItems(headers)
-        self.y_col_combobox.addItems(headers)
+        # Выражения над столбцами, которых нет в новом файле, отбрасываются
+        self.derived_columns = [text for text in self.derived_columns
+                                if set(Expression(text).columns) <= set(headers)]
+        self.x_col_combobox.addItems(headers + self.derived_columns)
+        self.y_col_combobox.addItems(headers + self.derived_columns)
+
+        # Условия фильтра по столбцам, которых нет в новом файле, отбрасываются
+        self.file_headers = headers
+        conditions = [self.filters_combobox.itemText(i) for i in range(self.filters_combobox.count())]
+        checked = self.filters_combobox.checked_items()
+        conditions = [text for text in conditions if set(RowFilter([text]).columns) <= set(headers)]
+        self.filters_combobox.blockSignals(True)
+        self.filters_combobox.clear()
+        self.filters_combobox.addItems(conditions)
+        self.filters_combobox.set_checked_items(checked)
+        self.filters_combobox.blockSignals(False)
+
+        # Пока пользователь выбирает столбцы, файл разбирается в фоне
+        self._start_prefetch(PRIORITY_PREFETCH)
+
+    def _start_prefetch(self, priority):
+        """
+        Запуск фонового разбора всего файла.
+        :param priority: Приоритет задачи PRIORITY_*.
+        :return:
+        """
+        self._cancel_prefetch()
+        if self.service is None:
+            self.service = ServiceClient.connect()
+        if self.service is not None:
+            # Файл разбирает сервис, общий для всех запущенных приложений
+            self.prefetch_job = CSVServiceJob(
+                self.service, self.file_name,
+                on_error=self.on_error_combobox.currentData(),
+                row_filter=self.row_filter(),
+                priority=priority
+            )
+        else:
+            self.prefetch_job = CSVPrefetchJob(
+                self.file_name,
+                delimiter=self.file_delimiter,
+                encoding=self.file_encoding,
+                on_error=self.on_error_combobox.currentData(),
+                row_filter=self.row_filter(),
+                priority=priority
+            )
+        self.prefetch_job.derived_columns = self.derived_columns
+        self.prefetch_job.progress.connect(self._on_prefetch_progress)
+        self.prefetch_job.finished.connect(self._on_prefetch_finished)
+        self.prefetch_job.failed.connect(self._on_prefetch_error)
+        JobScheduler.shared().submit(self.prefetch_job)
+
+    def _cancel_prefetch(self):
+        """
+        Отмена фонового разбора, например, при выборе другого файла.
+        :return:
+        """
+        self._build_pending = False
+        self._abort_streaming()
+        if self.prefetch_job is None:
+            return
+        for signal in (self.prefetch_job.progress, self.prefetch_job.finished, self.prefetch_job.failed):
+            signal.disconnect()
+        # Задача из очереди удаляется, выполняющаяся завершается в пуле сама, проверив отмену:
+        # её сигналы отключены, а недоразобранный набор она убирает из кэша
+        JobScheduler.shared().cancel(self.prefetch_job)
+        self.prefetch_job = None
+
+    def _abort_streaming(self):
+        """
+        Сообщение окну графиков, что построенный по мере загрузки набор данных больше не дополняется.
+        :return:
+        """
+        dataset, self._streaming_dataset = self._streaming_dataset, None
+        if dataset is not None:
+            self.dataset_aborted.emit(dataset)
+
+    def _is_current_prefetch(self, dataset):
+        return self.prefetch_job is not None and self.prefetch_job.dataset is dataset
+
+    def _on_prefetch_progress(self, dataset):
+        if not self._is_current_prefetch(dataset):
+            return
+        if self._build_pending:
+            # Первые блоки готовы - строим график, не дожидаясь конца файла
+            self._build_pending = False
+            self._streaming_dataset = dataset
+            self.build_graph(dataset)
+        elif self._streaming_dataset is dataset:
+            self.dataset_updated.emit(dataset)
+        else:
+            return
+        self.status_bar.showMessage(f"Загрузка файла: {self.file_name}, строк: {dataset.row_count}")
+
+    def _on_prefetch_finished(self, dataset):
+        if not self._is_current_prefetch(dataset):
+            return
+        if self._build_pending:
+            self._build_pending = False
+            self.build_graph(dataset)
+        elif self._streaming_dataset is dataset:
+            self._streaming_dataset = None
+            self.progress_bar.setVisible(False)
+            self.status_bar.showMessage("")
+            self._update_errors_button(dataset)
+            self.dataset_completed.emit(dataset)
+
+    def _on_prefetch_error(self, error_msg):
+        if self.sender() is not self.prefetch_job:
+            return
+        if isinstance(self.prefetch_job, CSVServiceJob):
+            # Сервис мог завершиться - при следующей загрузке подключение создаётся заново
+            self.service = None
+        if self._build_pending or self._streaming_dataset is not None:
+            self._build_pending = False
+            self._abort_streaming()
+            self._on_load_error(error_msg)
 
     def _init_selection_widget(self):
 
-        self.y_col_combobox = QComboBox()
+        self.y_col_combobox = CheckableComboBox()
         self.x_col_combobox = QComboBox()
         self.is_line_checkbox = QCheckBox("Соединить линией?")
         self.color_combobox = QComboBox()
 
         self.x_col_combobox.setPlaceholderText("Выбор столбца x")
-        self.y_col_combobox.setPlaceholderText("Выбор столбца y")
+        self.y_col_combobox.setPlaceholderText("Выбор столбцов y")
         self.color_combobox.setPlaceholderText("Выбор цвета")
         self.color_combobox.setToolTip("Выбор цвета")
 
@@ -125,6 +313,49 @@ class CSVLoader(CSVTableViewer):
         self.color_delegate = ColorDelegate()
         self.color_combobox.setItemDelegate(self.color_delegate)
 
+        self.on_error_combobox = QComboBox()
+        self.on_error_combobox.setToolTip("Обработка строк, которые не удалось разобрать")
+        for title, policy in self.on_error_policies:
+            self.on_error_combobox.addItem(title, policy)
+
+        self.errors_btn = QPushButton()
+        self.errors_btn.setVisible(False)
+        self.errors_btn.clicked.connect(self._show_parse_errors)
+
+        self.aggregation_combobox = QComboBox()
+        self.aggregation_combobox.setToolTip("Статистика Y по интервалам X вместо отдельных точек")
+        for title, statistic in self.aggregations:
+            self.aggregation_combobox.addItem(title, statistic)
+        self.bins_spinbox = QSpinBox()
+        self.bins_spinbox.setRange(2, 1000000)
+        self.bins_spinbox.setValue(1000)
+        self.bins_spinbox.setPrefix("Интервалов: ")
+        self.by_label_checkbox = QCheckBox("По значениям X")
+        self.by_label_checkbox.setToolTip("Группировка по значениям X как по категориям")
+
+        self.expression_edit = QLineEdit()
+        self.expression_edit.setPlaceholderText("Выражение, например a / b")
+        self.expression_edit.setToolTip(
+            "Производный столбец: арифметика, sqrt, log, mean, std и др.\n"
+            "Названия с пробелами - в обратных кавычках: `Время, с` / 60"
+        )
+        self.add_expression_btn = QPushButton("Добавить столбец")
+        self.add_expression_btn.clicked.connect(self._add_derived_column)
+        self.expression_edit.returnPressed.connect(self._add_derived_column)
+
+        self.filters_combobox = CheckableComboBox()
+        self.filters_combobox.setPlaceholderText("Без фильтра")
+        self.filters_combobox.setToolTip("Отмеченные условия фильтра строк, объединяются через «и»")
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText('Фильтр, например t > 1000')
+        self.filter_edit.setToolTip(
+            "Условие отбора строк, проверяется при разборе файла:\n"
+            "t > 1000, status == \"OK\", (a > 0) and (b < 5)"
+        )
+        self.add_filter_btn = QPushButton("Добавить фильтр")
+        self.add_filter_btn.clicked.connect(self._add_filter)
+        self.filter_edit.returnPressed.connect(self._add_filter)
+
         self.build_graph_btn = QPushButton("Построить")
         self.build_graph_btn.setEnabled(False)
 
@@ -135,15 +366,90 @@ class CSVLoader(CSVTableViewer):
         self.info_layout.addWidget(QLabel("Выбор цвета"))
         self.info_layout.addWidget(self.color_combobox)
         self.info_layout.addWidget(self.is_line_checkbox)
+        self.info_layout.addWidget(self.on_error_combobox)
+        self.info_layout.addWidget(self.aggregation_combobox)
+        self.info_layout.addWidget(self.bins_spinbox)
+        self.info_layout.addWidget(self.by_label_checkbox)
+        self.info_layout.addWidget(self.expression_edit)
+        self.info_layout.addWidget(self.add_expression_btn)
+        self.info_layout.addWidget(self.filters_combobox)
+        self.info_layout.addWidget(self.filter_edit)
+        self.info_layout.addWidget(self.add_filter_btn)
 
         self.info_layout.addWidget(self.build_graph_btn)
+        self.info_layout.addWidget(self.errors_btn)
 
         self.build_graph_btn.clicked.connect(self._load_csv_file)
         self.x_col_combobox.currentIndexChanged.connect(self._on_selection_changed)
-        self.y_col_combobox.currentIndexChanged.connect(self._on_selection_changed)
+        self.y_col_combobox.checked_changed.connect(self._on_selection_changed)
         self.is_line_checkbox.stateChanged.connect(self.line_checkbox_changed)
         self.color_combobox.currentIndexChanged.connect(self.on_color_selected)
+        self.filters_combobox.checked_changed.connect(self._on_filters_changed)
+
+
+    def _add_derived_column(self):
+        """
+        Проверка выражения и добавление производного столбца в списки осей.
+        :return:
+        """
+        text = self.expression_edit.text().strip()
+        if not text or text in self.derived_columns:
+            return
+        headers = [self.x_col_combobox.itemText(i) for i in range(self.x_col_combobox.count())]
+        try:
+            unknown = [name for name in Expression(text).columns if name not in headers]
+            if unknown:
+                raise ExpressionError(f"нет столбца {unknown[0]!r}")
+        except ExpressionError as e:
+            QMessageBox.warning(self, "Ошибка в выражении", str(e))
+            return
+
+        self.derived_columns.append(text)
+        self.x_col_combobox.addItem(text)
+        self.y_col_combobox.addItems([text])
+        self.expression_edit.clear()
+
+    def _add_filter(self):
+        """
+        Проверка условия из поля ввода и добавление его в фильтр строк.
+        :return:
+        """
+        text = self.filter_edit.text().strip()
+        if not text:
+            return
+        try:
+            self.add_filter(text)
+        except ExpressionError as e:
+            QMessageBox.warning(self, "Ошибка в фильтре", str(e))
+            return
+        self.filter_edit.clear()
+
+    def add_filter(self, text):
+        """
+        Добавление условия в фильтр строк, файл перечитывается с новым фильтром.
 
+        :param text: Условие, например 't > 1000' или 'status == "OK"'.
+        :return:
+        """
+        unknown = [name for name in RowFilter([text]).columns if name not in self.file_headers]
+        if unknown:
+            raise ExpressionError(f"нет столбца {unknown[0]!r}")
+        text = text.strip()
+        if text not in [self.filters_combobox.itemText(i) for i in range(self.filters_combobox.count())]:
+            self.filters_combobox.addItems([text])
+        self.filters_combobox.set_checked_items(self.filters_combobox.checked_items() + [text])
+
+    def row_filter(self):
+        """
+        Фильтр строк из отмеченных условий.
+        :return: RowFilter или None, если условия не выбраны.
+        """
+        return RowFilter(self.filters_combobox.checked_items()) or None
+
+    def _on_filters_changed(self):
+        # Отфильтрованный файл - другой набор данных: разбор начинается заново (или берётся из кэша)
+        if self.file_name and self.prefetch_job is not None:
+            self._start_prefetch(PRIORITY_PREFETCH)
 
     def line_checkbox_changed(self, state):
         if state == 2:
@@ -151,23 +457,69 @@ class CSVLoader(CSVTableViewer):
         else:
             self.is_line_checked.emit(False)
 
-    def build_graph(self, list):
-        print("build")
-        self.progress_bar.setVisible(False)
-        self.status_bar.showMessage("")
+    def build_graph(self, dataset):
+        if dataset.complete:
+            self.progress_bar.setVisible(False)
+            self.status_bar.showMessage("")
 
         x_field = self.x_col_combobox.currentText()
 
-        y_field = self.y_col_combobox.currentText()
+        y_fields = self.y_col_combobox.checked_items()
+
+        aggregation = self.aggregation()
+        numeric_fields = y_fields if aggregation and aggregation["by_label"] else [x_field] + y_fields
 
-        keys_to_build = [x_field, y_field]
+        # Преобразование кэшируется в наборе данных, здесь же собираются ошибки значений
+        try:
+            for text in self.derived_columns:
+                dataset.add_derived(text)
+            for field in numeric_fields:
+                dataset.float_column(field)
+        except ValueError as e:
+            self._on_load_error(str(e))
+            return
+        self._update_errors_button(dataset)
+
+        self.cols_selected.emit(dataset, self.file_name, x_field, y_fields, self._series_colors(len(y_fields)),
+                                aggregation)
+
+    def aggregation(self):
+        """
+        Настройки агрегирования для make_aggregator.
+        :return: Словарь или None, если строятся отдельные точки.
+        """
+        statistic = self.aggregation_combobox.currentData()
+        if statistic is None:
+            return None
+        return {"statistic": statistic, "bins": self.bins_spinbox.value(),
+                "by_label": self.by_label_checkbox.isChecked()}
 
-        data_for_build = [{key: item[key] for key in keys_to_build} for item in list]
-        self.cols_selected.emit(data_for_build, self.file_name, x_field, y_field)
+    def _series_colors(self, count):
+        """
+        Цвета серий: начиная с выбранного цвета по кругу списка colors.
+        :param count: Количество серий.
+        :return: Список цветов в формате '#rrggbb'.
+        """
+        start = max(self.color_combobox.currentIndex(), 0)
+        return [self.colors[(start + i) % len(self.colors)][1].name() for i in range(count)]
+
+    def _update_errors_button(self, dataset):
+        self._errors_dataset = dataset
+        error_count = len(dataset.errors)
+        self.errors_btn.setText(f"Ошибки ({error_count})")
+        self.errors_btn.setVisible(error_count > 0)
+        if error_count:
+            self.status_bar.showMessage(f"Строк с ошибками: {error_count}")
+
+    def _show_parse_errors(self):
+        dataset = self._errors_dataset
+        # У набора из нескольких файлов смещения считаются в файлах-частях
+        dataset.errors.resolve_offsets(dataset.file_path if os.path.isfile(dataset.file_path) else None)
+        ParseErrorsDialog(dataset.errors, dataset.encoding or "utf-8", self).exec()
 
     def _on_selection_changed(self):
         x_selection = self.x_col_combobox.currentIndex() >= 0
-        y_selection = self.y_col_combobox.currentIndex() >= 0
+        y_selection = bool(self.y_col_combobox.checked_items())
         self.build_graph_btn.setEnabled(x_selection and y_selection)
 
     def on_color_selected(self, index):
@@ -183,33 +535,53 @@ class CSVLoader(CSVTableViewer):
                 self.color_selected.emit(selected_color.name())
         pass
 
-    def _update_file_info(self, row_count, col_count):
-        self.encoding_label.setText(f"Кодировка: {self.loader_5_thread.encoding}")
-        self.delimiter_label.setText(f"Разделитель: {self.loader_5_thread.delimiter}")
-        self.dimensions_label.setText(f"Строк: {row_count}, Столбцов: {col_count}")
-
     def set_solid_data(self, data: list):
         self._solid_data = data
 
     def _load_csv_file(self):
         """
-        Загрузка данных из CSV файла.
-        :param file_name: Путь к файлу.
+        Построение по всему файлу: используется готовый или ещё идущий фоновый разбор.
         :return:
         """
-        print("Loading csv")
+        prefetch = self.prefetch_job
+        policy = self.on_error_combobox.currentData()
+        if prefetch is not None and prefetch.on_error != policy:
+            # Файл разбирался с другой политикой обработки ошибок
+            prefetch = None
+        if prefetch is not None and prefetch.is_done() and prefetch.dataset is not None \
+                and prefetch.dataset.complete:
+            self.build_graph(prefetch.dataset)
+            return
+
         # Показать прогресс-бар
         self.progress_bar.setRange(0, 0)  # Неопределенный прогресс
         self.progress_bar.setVisible(True)
         self.status_bar.showMessage(f"Загрузка файла: {self.file_name}")
 
-        # Создать и запустить поток для загрузки CSV
-        self.loader_thread = CSVLoaderThread(self.file_name, encoding=self.encoding)
-        self.loader_thread.solid_data_loaded.connect(self.build_graph)
-        self.loader_thread.start()
-        while self.loader_thread.isRunning():
-            print("waiting for finish")
-            time.sleep(1)
+        if prefetch is not None and not prefetch.is_done():
+            # Пользователь ждёт результата - разбор больше не фоновый
+            JobScheduler.shared().set_priority(prefetch, PRIORITY_LOAD)
+        else:
+            self._start_prefetch(PRIORITY_LOAD)
+            prefetch = self.prefetch_job
+
+        # Выбранные столбцы преобразуются в числа в задаче загрузки по мере чтения
+        aggregation = self.aggregation()
+        x_fields = [] if aggregation and aggregation["by_label"] else [self.x_col_combobox.currentText()]
+        prefetch.float_columns = list(dict.fromkeys(
+            prefetch.float_columns + x_fields + self.y_col_combobox.checked_items()
+        ))
+
+        dataset = prefetch.dataset
+        if dataset is not None and dataset.row_count and not dataset.complete:
+            self._streaming_dataset = dataset
+            self.build_graph(dataset)
+        else:
+            self._build_pending = True
+
+    def closeEvent(self, event):
+        self._cancel_prefetch()
+        super().closeEvent(event)
 
 if __name__ == "__main__":
     app = QApplication(sys.argv)
@@ -0,0 +1,280 @@
+import numpy as np
+
+from CSVManager.Dataset import to_float
+from CSVManager.Reader import Reader
+
+# Статистики агрегирования, число от 0 до 1 - квантиль
+STAT_MEAN = 'mean'
+STAT_SUM = 'sum'
+STAT_COUNT = 'count'
+STAT_MIN = 'min'
+STAT_MAX = 'max'
+STAT_MEDIAN = 'median'
+
+STATISTICS = (STAT_MEAN, STAT_SUM, STAT_COUNT, STAT_MIN, STAT_MAX, STAT_MEDIAN)
+
+
+def _quantile_of(statistic):
+    if statistic == STAT_MEDIAN:
+        return 0.5
+    if isinstance(statistic, float) and 0.0 <= statistic <= 1.0:
+        return statistic
+    if statistic in STATISTICS:
+        return None
+    raise ValueError(f"неизвестная статистика {statistic!r}")
+
+
+def group_quantile(groups, values, q, size):
+    """
+    Квантиль значений в каждой группе сортировкой по паре (группа, значение).
+
+    :param groups: Номера групп.
+    :param values: Значения.
+    :param q: Квантиль от 0 до 1.
+    :param size: Количество групп.
+    :return: Массив квантилей, NaN для пустых групп.
+    """
+    order = np.lexsort((values, groups))
+    groups, values = groups[order], values[order]
+    starts = np.searchsorted(groups, np.arange(size + 1))
+    counts = np.diff(starts)
+
+    result = np.full(size, np.nan)
+    filled = counts > 0
+    # Линейная интерполяция между соседними порядковыми статистиками, как в np.quantile
+    position = starts[:-1][filled] + q * (counts[filled] - 1)
+    low = np.floor(position).astype(np.int64)
+    high = np.minimum(low + 1, starts[1:][filled] - 1)
+    fraction = position - low
+    result[filled] = values[low] * (1 - fraction) + values[high] * fraction
+    return result
+
+
+class _Accumulator:
+    """
+    Накопители count/sum/min/max по группам, которые можно дополнять блоками.
+    Для квантилей значения хранятся целиком, потому что квантиль не складывается из частей.
+    """
+
+    def __init__(self, statistic):
+        self.statistic = statistic
+        self.quantile = _quantile_of(statistic)
+        self._count = np.zeros(0, dtype=np.int64)
+        self._sum = np.zeros(0)
+        self._min = np.zeros(0)
+        self._max = np.zeros(0)
+        self._values = []
+
+    def _grow(self, size):
+        extra = size - len(self._count)
+        if extra > 0:
+            self._count = np.concatenate((self._count, np.zeros(extra, dtype=np.int64)))
+            self._sum = np.concatenate((self._sum, np.zeros(extra)))
+            self._min = np.concatenate((self._min, np.full(extra, np.inf)))
+            self._max = np.concatenate((self._max, np.full(extra, -np.inf)))
+
+    def _accumulate(self, groups, y, size):
+        self._grow(size)
+        self._count += np.bincount(groups, minlength=size)
+        self._sum += np.bincount(groups, weights=y, minlength=size)
+        np.minimum.at(self._min, groups, y)
+        np.maximum.at(self._max, groups, y)
+
+    def _statistic(self, groups_and_values=None):
+        filled = self._count > 0
+        if self.quantile is not None:
+            groups, values = groups_and_values
+            values = group_quantile(groups, values, self.quantile, len(self._count))
+        elif self.statistic == STAT_MEAN:
+            values = self._sum / np.maximum(self._count, 1)
+        elif self.statistic == STAT_SUM:
+            values = self._sum
+        elif self.statistic == STAT_COUNT:
+            values = self._count.astype(np.float64)
+        elif self.statistic == STAT_MIN:
+            values = self._min
+        else:
+            values = self._max
+        return filled, values
+
+
+class BinAggregator(_Accumulator):
+    """
+    Агрегирование Y по интервалам X равной ширины с дозагрузкой блоками.
+
+    Диапазон X заранее неизвестен: ширина интервалов выбирается по первому
+    блоку, а когда данные выходят за сетку, соседние интервалы сливаются
+    (ширина удваивается), так что их всегда не больше bins и память не
+    зависит от числа строк.
+    """
+
+    def __init__(self, bins=1000, statistic=STAT_MEAN):
+        """
+        :param bins: Максимальное количество интервалов.
+        :param statistic: Статистика из STATISTICS или квантиль от 0 до 1.
+        """
+        super().__init__(statistic)
+        self.bins = bins
+        self.origin = None
+        self.width = None
+        self._grow(bins)
+
+    def update(self, x, y):
+        """
+        Добавление блока точек, точки с NaN пропускаются.
+
+        :param x: Значения по оси X.
+        :param y: Значения по оси Y.
+        :return:
+        """
+        x = np.asarray(x, dtype=np.float64)
+        y = np.asarray(y, dtype=np.float64)
+        finite = np.isfinite(x) & np.isfinite(y)
+        if not finite.all():
+            x, y = x[finite], y[finite]
+        if not len(x):
+            return
+
+        low, high = float(x.min()), float(x.max())
+        if self.origin is None:
+            self.origin = low
+            self.width = (high - low) / (self.bins - 1) or 1.0
+        self._cover(low, high)
+
+        self._accumulate(self._bin(x), y, self.bins)
+        if self.quantile is not None:
+            self._values.append((x, y))
+
+    def _bin(self, x):
+        return np.minimum(((x - self.origin) / self.width).astype(np.int64), self.bins - 1)
+
+    def _cover(self, low, high):
+        """
+        Расширение сетки до [low, high] слиянием соседних интервалов.
+        """
+        shift = max(int(np.ceil((self.origin - low) / self.width)), 0)
+        filled = np.flatnonzero(self._count)
+        top = int(filled[-1]) if len(filled) else -1
+        factor = 1
+        while (top + shift) // factor >= self.bins or \
+                (high - (self.origin - shift * self.width)) / (self.width * factor) >= self.bins:
+            factor *= 2
+        if not shift and factor == 1:
+            return
+
+        # Старый интервал i целиком попадает в новый (i + shift) // factor,
+        # вышедшие за сетку интервалы пусты
+        target = np.minimum((np.arange(self.bins) + shift) // factor, self.bins - 1)
+        count, total, low_values, high_values = self._count, self._sum, self._min, self._max
+        self._count = np.bincount(target, weights=count, minlength=self.bins).astype(np.int64)
+        self._sum = np.bincount(target, weights=total, minlength=self.bins)
+        self._min = np.full(self.bins, np.inf)
+        self._max = np.full(self.bins, -np.inf)
+        np.minimum.at(self._min, target, low_values)
+        np.maximum.at(self._max, target, high_values)
+
+        self.origin -= shift * self.width
+        self.width *= factor
+
+    def result(self):
+        """
+        Текущий результат агрегирования, пустые интервалы пропускаются.
+
+        :return: Кортеж (центры интервалов, значения).
+        """
+        if self.origin is None:
+            return np.empty(0), np.empty(0)
+        stored = None
+        if self.quantile is not None:
+            x = np.concatenate([x for x, _ in self._values])
+            y = np.concatenate([y for _, y in self._values])
+            stored = (self._bin(x), y)
+        filled, values = self._statistic(stored)
+        centers = self.origin + (np.arange(self.bins) + 0.5) * self.width
+        return centers[filled], values[filled]
+
+
+class GroupAggregator(_Accumulator):
+    """
+    Агрегирование Y по значениям-меткам X (категориям) с дозагрузкой блоками.
+    Метки нумеруются в порядке появления блоков, внутри блока - по алфавиту.
+    """
+
+    def __init__(self, statistic=STAT_MEAN):
+        """
+        :param statistic: Статистика из STATISTICS или квантиль от 0 до 1.
+        """
+        super().__init__(statistic)
+        self.labels = []
+        self._label_index = {}
+
+    def update(self, labels, y):
+        """
+        Добавление блока точек, точки с NaN в Y пропускаются.
+
+        :param labels: Метки (строки).
+        :param y: Значения по оси Y.
+        :return:
+        """
+        y = np.asarray(y, dtype=np.float64)
+        unique, inverse = np.unique(np.asarray(labels, dtype=str), return_inverse=True)
+        ids = np.array([self._label_index.setdefault(str(label), len(self._label_index)) for label in unique],
+                       dtype=np.int64)
+        self.labels = list(self._label_index)
+        groups = ids[inverse] if len(ids) else np.empty(0, dtype=np.int64)
+
+        finite = np.isfinite(y)
+        if not finite.all():
+            groups, y = groups[finite], y[finite]
+        self._accumulate(groups, y, len(self.labels))
+        if self.quantile is not None:
+            self._values.append((groups, y))
+
+    def result(self):
+        """
+        Текущий результат агрегирования.
+
+        :return: Кортеж (номера меток, значения, метки) только для непустых групп.
+        """
+        stored = None
+        if self.quantile is not None:
+            stored = (np.concatenate([g for g, _ in self._values] or [np.empty(0, dtype=np.int64)]),
+                      np.concatenate([y for _, y in self._values] or [np.empty(0)]))
+        filled, values = self._statistic(stored)
+        positions = np.flatnonzero(filled)
+        return positions.astype(np.float64), values[filled], [self.labels[i] for i in positions]
+
+
+def make_aggregator(statistic=STAT_MEAN, bins=1000, by_label=False):
+    """
+    Создание агрегатора по настройкам окна загрузки.
+
+    :param statistic: Статистика из STATISTICS или квантиль от 0 до 1.
+    :param bins: Количество интервалов X.
+    :param by_label: Группировать по значениям X, а не по интервалам.
+    :return: BinAggregator или GroupAggregator.
+    """
+    if by_label:
+        return GroupAggregator(statistic)
+    return BinAggregator(bins, statistic)
+
+
+def aggregate_file(file_path, x_field, y_field, chunk_rows=100000, row_filter=None, **settings):
+    """
+    Агрегирование файла блоками без загрузки всех строк в память.
+
+    :param file_path: Путь к файлу.
+    :param x_field: Столбец X.
+    :param y_field: Столбец Y.
+    :param chunk_rows: Размер блока в строках.
+    :param row_filter: Фильтр строк (RowFilter), применяемый при разборе.
+    :param settings: Параметры make_aggregator.
+    :return: Агрегатор с результатом.
+    """
+    aggregator = make_aggregator(**settings)
+    reader = Reader(file_path)
+    for chunk in reader.iter_chunks(chunk_rows, columns=[x_field, y_field], row_filter=row_filter):
+        y, _ = to_float(chunk[y_field])
+        x = chunk[x_field] if isinstance(aggregator, GroupAggregator) else to_float(chunk[x_field])[0]
+        aggregator.update(x, y)
+    return aggregator
@@ -0,0 +1,156 @@
+import numpy as np
+
+
+class ColumnOrder:
+    """
+    Упорядоченность столбца X: отсортирован ли он по неубыванию и равномерен ли шаг.
+
+    Определяется одним векторным проходом по разностям соседних значений
+    (блоками, чтобы не выделять массив размером со столбец) и дополняется
+    для дозагруженных строк без повторного просмотра начала. По ней поиск
+    диапазонов и ближайших точек для отсортированных данных идёт бинарным
+    поиском, а для равномерной сетки - арифметикой. Несортированные данные
+    сортируются один раз, перестановка хранится вместе с метаданными.
+    """
+
+    def __init__(self, length=0, is_sorted=True, first=np.nan, last=np.nan, step_min=np.inf, step_max=-np.inf):
+        """
+        :param length: Количество значений столбца.
+        :param is_sorted: Значения не убывают и не содержат NaN.
+        :param first: Первое значение.
+        :param last: Последнее значение.
+        :param step_min: Минимальная разность соседних значений.
+        :param step_max: Максимальная разность соседних значений.
+        """
+        self.length = length
+        self.is_sorted = is_sorted
+        self.first = first
+        self.last = last
+        self.step_min = step_min
+        self.step_max = step_max
+        # Перестановка для несортированных данных и отсортированные значения
+        self._sorted = None
+
+    def __repr__(self):
+        kind = "uniform" if self.is_uniform else "sorted" if self.is_sorted else "unsorted"
+        return f"ColumnOrder({kind}, length={self.length})"
+
+    @classmethod
+    def detect(cls, values, block_size=1 << 20):
+        """
+        Определение упорядоченности столбца.
+
+        :param values: Массив float64.
+        :param block_size: Размер блока разностей.
+        :return: ColumnOrder.
+        """
+        return cls().extend(values, block_size=block_size)
+
+    def extend(self, values, block_size=1 << 20):
+        """
+        Упорядоченность столбца, продолжающего уже описанный: просматриваются только новые значения.
+
+        :param values: Массив, первые self.length значений которого описаны этим объектом.
+        :param block_size: Размер блока разностей.
+        :return: Новый ColumnOrder (или этот же, если новых значений нет).
+        """
+        n = len(values)
+        if n == self.length:
+            return self
+        start = max(self.length - 1, 0)
+        first = float(values[0])
+        is_sorted = self.is_sorted and not np.isnan(first)
+        step_min, step_max = self.step_min, self.step_max
+        if is_sorted:
+            for block in range(start, n - 1, block_size):
+                steps = np.diff(values[block:min(block + block_size + 1, n)])
+                if not len(steps):
+                    continue
+                low, high = float(steps.min()), float(steps.max())
+                step_min, step_max = min(step_min, low), max(step_max, high)
+                # NaN в разностях (и значениях) делает сравнение ложным
+                if not low >= 0:
+                    is_sorted = False
+                    break
+        return ColumnOrder(n, is_sorted, first, float(values[-1]), step_min, step_max)
+
+    @property
+    def step(self):
+        """
+        Шаг равномерной сетки или None.
+        """
+        if not self.is_sorted or self.length < 2:
+            return None
+        step = (self.last - self.first) / (self.length - 1)
+        # Отклонение точки от сетки накапливается не больше чем на разброс шагов за шаг;
+        # пока оно меньше половины шага, арифметический номер ошибается не больше чем на единицу
+        if 0 < step < np.inf and (self.step_max - self.step_min) * (self.length - 1) <= step / 2:
+            return step
+        return None
+
+    @property
+    def is_uniform(self):
+        return self.step is not None
+
+    def locate(self, x, values):
+        """
+        Номера последних точек с x <= значения для массива значений.
+        Для равномерной сетки - арифметикой с поправкой на погрешность округления.
+
+        :param x: Отсортированный столбец, описанный этим объектом.
+        :param values: Искомые значения.
+        :return: Массив номеров, -1 - значение меньше всех точек.
+        """
+        values = np.asarray(values, dtype=np.float64)
+        step = self.step
+        if step is None:
+            return np.searchsorted(x, values, side='right') - 1
+        n = len(x)
+        with np.errstate(invalid='ignore'):
+            index = np.floor((values - self.first) / step)
+        index = np.clip(np.nan_to_num(index, nan=-1), -1, n - 1).astype(np.int64)
+        # Соседняя точка может оказаться по другую сторону значения из-за округления
+        ahead = np.minimum(index + 1, n - 1)
+        index = np.where((index + 1 < n) & (x[ahead] <= values), ahead, index)
+        behind = np.maximum(index, 0)
+        return np.where((index >= 0) & (x[behind] > values), index - 1, index)
+
+    def index_range(self, x, x_min, x_max):
+        """
+        Границы индексов точек с x_min <= x <= x_max отсортированного столбца.
+
+        :return: Кортеж (начало, конец).
+        """
+        start, stop = self.locate(x, [np.nextafter(x_min, -np.inf), x_max]) + 1
+        return int(start), int(max(stop, start))
+
+    def nearest(self, x, x0):
+        """
+        Ближайшая по X точка отсортированного столбца.
+
+        :return: Индекс или None для пустого столбца.
+        """
+        n = len(x)
+        if n == 0:
+            return None
+        i = min(int(self.locate(x, [x0])[0]) + 1, n - 1)
+        if i > 0 and x0 - x[i - 1] <= x[i] - x0:
+            i -= 1
+        return i
+
+    def sorted_view(self, x):
+        """
+        Отсортированный столбец для поиска: для отсортированных данных - сам столбец.
+        Перестановка считается один раз и кэшируется, точки с NaN в X в неё не входят.
+
+        :return: Кортеж (перестановка или None, отсортированные значения, ColumnOrder отсортированных значений).
+        """
+        if self.is_sorted:
+            return None, x, self
+        if self._sorted is None:
+            permutation = np.argsort(x, kind='stable')
+            # NaN при сортировке оказываются в конце
+            permutation = permutation[:len(x) - int(np.count_nonzero(np.isnan(x)))]
+            values = x[permutation]
+            self._sorted = (permutation, values, ColumnOrder.detect(values))
+        return self._sorted
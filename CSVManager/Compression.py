@@ -0,0 +1,185 @@
+import bz2
+import gzip
+import io
+import lzma
+import queue
+import threading
+
+try:
+    import zstandard
+except ImportError:  # Поддержка .zst необязательна
+    zstandard = None
+
+# Сигнатуры сжатых форматов
+GZIP_MAGIC = b'\x1f\x8b'
+BZIP2_MAGIC = b'BZh'
+XZ_MAGIC = b'\xfd7zXZ\x00'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+# Размер блока распаковки и глубина очереди между потоками
+CHUNK_SIZE = 1 << 20
+QUEUE_DEPTH = 8
+
+
+def detect_compression(head):
+    """
+    Определение формата сжатия по сигнатуре.
+
+    :param head: Первые байты файла.
+    :return: 'gzip', 'bz2', 'xz', 'zstd' или None для несжатого файла.
+    """
+    if head.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if head.startswith(BZIP2_MAGIC):
+        return 'bz2'
+    if head.startswith(XZ_MAGIC):
+        return 'xz'
+    if head.startswith(ZSTD_MAGIC):
+        return 'zstd'
+    return None
+
+
+def detect_file_compression(file_path):
+    """
+    Определение формата сжатия файла.
+
+    :param file_path: Путь к файлу.
+    :return: Формат сжатия или None.
+    """
+    with open(file_path, 'rb') as file:
+        return detect_compression(file.read(len(XZ_MAGIC)))
+
+
+class ThreadedDecompressor(io.RawIOBase):
+    """
+    Поток байтов, распаковка которого идёт в отдельном потоке.
+
+    Фоновый поток читает распакованные блоки из source и складывает их в
+    ограниченную очередь, поэтому распаковка идёт параллельно с разбором CSV,
+    а память ограничена QUEUE_DEPTH блоками.
+    """
+
+    def __init__(self, source, chunk_size=CHUNK_SIZE, queue_depth=QUEUE_DEPTH):
+        """
+        :param source: Распаковывающий файловый объект (gzip, bz2, ...).
+        :param chunk_size: Размер блока распаковки.
+        :param queue_depth: Максимальное количество блоков в очереди.
+        """
+        super().__init__()
+        self._source = source
+        self._chunk_size = chunk_size
+        self._queue = queue.Queue(queue_depth)
+        self._buffer = memoryview(b'')
+        self._eof = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+
+    def _produce(self):
+        try:
+            while not self._stop.is_set():
+                chunk = self._source.read(self._chunk_size)
+                if not chunk:
+                    break
+                self._put(chunk)
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._put(None)
+
+    def _put(self, item):
+        # Не блокируемся навсегда, если читатель уже закрыл поток
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        if not self._buffer:
+            if self._eof:
+                return 0
+            item = self._queue.get()
+            if item is None:
+                self._eof = True
+                return 0
+            if isinstance(item, Exception):
+                self._eof = True
+                raise item
+            self._buffer = memoryview(item)
+
+        n = min(len(b), len(self._buffer))
+        b[:n] = self._buffer[:n]
+        self._buffer = self._buffer[n:]
+        return n
+
+    def close(self):
+        if not self.closed:
+            self._stop.set()
+            self._thread.join()
+            self._source.close()
+        super().close()
+
+
+def _open_decompressor(file_path, compression):
+    if compression == 'gzip':
+        return gzip.open(file_path, 'rb')
+    if compression == 'bz2':
+        return bz2.open(file_path, 'rb')
+    if compression == 'xz':
+        return lzma.open(file_path, 'rb')
+    if compression == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("Для чтения .zst файлов установите пакет zstandard")
+        return zstandard.ZstdDecompressor().stream_reader(
+            open(file_path, 'rb'), read_across_frames=True, closefd=True
+        )
+    raise ValueError(f"Неизвестный формат сжатия: {compression}")
+
+
+def open_binary(file_path, compression=None):
+    """
+    Открытие файла на чтение байтов с прозрачной распаковкой.
+
+    :param file_path: Путь к файлу.
+    :param compression: Формат сжатия, для автоматического определения оставить None.
+    :return: Буферизированный бинарный поток распакованных данных.
+    """
+    if compression is None:
+        compression = detect_file_compression(file_path)
+    if compression is None:
+        return open(file_path, 'rb')
+
+    raw = ThreadedDecompressor(_open_decompressor(file_path, compression))
+    return io.BufferedReader(raw, buffer_size=CHUNK_SIZE)
+
+
+def open_text(file_path, encoding, compression=None, errors='strict'):
+    """
+    Открытие файла на чтение текста с прозрачной распаковкой.
+
+    :param file_path: Путь к файлу.
+    :param encoding: Кодировка файла.
+    :param compression: Формат сжатия, для автоматического определения оставить None.
+    :param errors: Обработка ошибок декодирования.
+    :return: Текстовый поток.
+    """
+    return io.TextIOWrapper(open_binary(file_path, compression), encoding=encoding,
+                            errors=errors, newline='')
+
+
+def read_head(file_path, size, compression=None):
+    """
+    Считывает первые size байт распакованного содержимого файла.
+
+    :param file_path: Путь к файлу.
+    :param size: Количество байт.
+    :param compression: Формат сжатия, для автоматического определения оставить None.
+    :return: Байты.
+    """
+    with open_binary(file_path, compression) as file:
+        return file.read(size)
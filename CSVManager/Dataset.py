@@ -0,0 +1,464 @@
+import bisect
+import os
+import threading
+import time
+
+import numpy as np
+
+from CSVManager.ColumnOrder import ColumnOrder
+from CSVManager.Expressions import Expression
+from CSVManager.Memory import MemoryBudget, SpilledStrings, array_bytes
+from CSVManager.ParseErrors import (ParseErrorIndex, ON_ERROR_NAN, ON_ERROR_RAISE, ON_ERROR_QUARANTINE,
+                                    REASON_NOT_A_NUMBER, REASON_EMPTY_VALUE)
+
+
+def to_float(values):
+    """
+    Преобразование списка строк в массив чисел.
+    Допускает запятую в качестве десятичного разделителя.
+
+    :param values: Список строк.
+    :return: Кортеж (массив float64, список индексов значений, которые не удалось преобразовать).
+    """
+    try:
+        return np.array(values, dtype=np.float64), []
+    except ValueError:
+        pass
+    # Десятичная запятая: замена во всём блоке сразу, значения с переводом строки сюда не подходят
+    replaced = "\n".join(values).replace(",", ".").split("\n")
+    if len(replaced) == len(values):
+        try:
+            return np.array(replaced, dtype=np.float64), []
+        except ValueError:
+            pass
+
+    # Медленный путь только для блоков с ошибочными значениями
+    result = np.empty(len(values))
+    bad = []
+    for i, value in enumerate(values):
+        try:
+            result[i] = float(value.replace(",", "."))
+        except ValueError:
+            result[i] = np.nan
+            bad.append(i)
+    return result, bad
+
+
+def as_list(values):
+    """
+    Значения блока в виде списка строк: вытесненные на диск блоки хранятся в SpilledStrings.
+    """
+    return values.tolist() if isinstance(values, SpilledStrings) else values
+
+
+def file_fingerprint(file_path):
+    """
+    Отпечаток файла для проверки актуальности кэша.
+
+    :param file_path: Путь к файлу.
+    :return: Кортеж (размер, время изменения).
+    """
+    stat = os.stat(file_path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class Dataset:
+    """
+    Разобранный CSV-файл в виде столбцов.
+
+    Может наполняться блоками из фонового потока, пока интерфейс уже читает
+    готовую часть. Числовые представления столбцов считаются по блокам и
+    кэшируются. Память набора учитывается в MemoryBudget: полностью разобранный
+    набор может вытеснить блоки строк и числовые столбцы во временные файлы.
+    """
+
+    def __init__(self, file_path, encoding=None, delimiter=None, on_error=ON_ERROR_NAN, errors=None,
+                 row_filter=None):
+        """
+        :param file_path: Путь к файлу.
+        :param encoding: Кодировка файла.
+        :param delimiter: Разделитель полей.
+        :param on_error: Политика обработки ошибок (см. Reader), нечисловые значения
+            при любой политике, кроме 'raise', заменяются на NaN.
+        :param errors: Индекс ошибок ридера, в который дописываются ошибки преобразования.
+        :param row_filter: Фильтр строк (RowFilter), с которым разбирается файл, None - все строки.
+        """
+        self.file_path = file_path
+        self.row_filter = row_filter
+        self.fingerprint = self._fingerprint()
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.on_error = on_error
+        self.errors = errors if errors is not None else ParseErrorIndex()
+        self.headers = []
+        self.row_count = 0
+        self.complete = False
+        # Номер версии растёт с каждым добавленным блоком
+        self.version = 0
+
+        self._lock = threading.Lock()
+        self._chunks = []
+        self._chunk_starts = []
+        # Ожидаемое количество строк для выделения буферов с запасом
+        self.expected_rows = None
+        # Числовые столбцы: (буфер, длина, количество преобразованных блоков)
+        self._float_columns = {}
+        # Производные столбцы: название -> Expression, и их значения: (буфер, длина, версия)
+        self._derived = {}
+        self._derived_values = {}
+        # Упорядоченность столбцов: название -> ColumnOrder
+        self._orders = {}
+        # Оценка памяти строк блоков, ещё не вытесненных на диск
+        self._chunk_bytes = 0
+        MemoryBudget.register(self)
+
+    def _fingerprint(self):
+        return file_fingerprint(self.file_path)
+
+    def is_current(self):
+        """
+        Проверка, что файл не изменился на диске после разбора.
+        """
+        try:
+            return self.fingerprint == self._fingerprint()
+        except OSError:
+            return False
+
+    def append_chunk(self, chunk):
+        """
+        Добавление блока строк.
+
+        :param chunk: Словарь {название столбца: список значений}.
+        :return:
+        """
+        with self._lock:
+            if not self.headers:
+                self.headers = list(chunk)
+            self._chunks.append(chunk)
+            self._chunk_starts.append(self.row_count)
+            rows = len(next(iter(chunk.values()), []))
+            self.row_count += rows
+            self.version += 1
+            self._chunk_bytes += self._estimate_chunk_bytes(chunk, rows)
+
+    @staticmethod
+    def _estimate_chunk_bytes(chunk, rows):
+        # Ссылка в списке и объект str с заголовком 49 байт на значение, длина - по первым значениям
+        total = 0
+        for values in chunk.values():
+            sample = values[:64]
+            length = sum(map(len, sample)) / len(sample) if len(sample) else 0
+            total += int(rows * (57 + length))
+        return total
+
+    @property
+    def columns(self):
+        """
+        Названия столбцов файла и производных столбцов.
+        """
+        return self.headers + [name for name in self._derived if name not in self.headers]
+
+    def add_derived(self, text):
+        """
+        Добавление производного столбца, название столбца совпадает с текстом выражения.
+
+        :param text: Текст выражения (см. Expression).
+        :return: Название столбца.
+        """
+        with self._lock:
+            if text not in self._derived:
+                self._derived[text] = Expression(text)
+        return text
+
+    def raw_column(self, name, start=0):
+        """
+        Значения столбца в виде строк.
+
+        :param name: Название столбца.
+        :param start: Первая строка, блоки до неё не просматриваются.
+        :return: Список строк.
+        """
+        self.last_used = time.monotonic()
+        with self._lock:
+            first = max(bisect.bisect_right(self._chunk_starts, start) - 1, 0)
+            chunks = self._chunks[first:]
+            offset = start - self._chunk_starts[first] if chunks else 0
+        values = []
+        for chunk in chunks:
+            values.extend(as_list(chunk[name][offset:]))
+            offset = 0
+        return values
+
+    def float_column(self, name):
+        """
+        Значения столбца в виде чисел. Уже преобразованные блоки не преобразуются повторно.
+        Ошибки преобразования записываются в self.errors.
+
+        Числа хранятся в буфере с запасом (по expected_rows или с удвоением),
+        поэтому дозагрузка блоков не копирует уже преобразованные данные,
+        а ранее выданные массивы остаются действительными.
+
+        :param name: Название столбца или производного столбца.
+        :return: Массив float64.
+        """
+        self.last_used = time.monotonic()
+        if name in self._derived and name not in self.headers:
+            return self._derived_column(name)
+
+        with self._lock:
+            if name not in self._float_columns and self.row_count and not self._chunks:
+                raise KeyError(f"столбец {name!r} не сохранён в кэше разбора")
+            buffer, length, converted = self._float_columns.get(name, (np.empty(0), 0, 0))
+            if converted == len(self._chunks):
+                return buffer[:length]
+
+            for index in range(converted, len(self._chunks)):
+                chunk = self._chunks[index]
+                part, bad = to_float(as_list(chunk[name]))
+                if bad:
+                    self._record_bad_values(name, chunk, self._chunk_starts[index], bad)
+
+                if length + len(part) > len(buffer):
+                    capacity = max(length + len(part), 2 * len(buffer), self.expected_rows or 0)
+                    grown = np.empty(capacity)
+                    grown[:length] = buffer[:length]
+                    buffer = grown
+                buffer[length:length + len(part)] = part
+                length += len(part)
+
+            self._float_columns[name] = (buffer, length, len(self._chunks))
+            return buffer[:length]
+
+    def _derived_column(self, name):
+        """
+        Значения производного столбца, кэшируются до следующего блока данных.
+        Поэлементные выражения при дозагрузке досчитываются только для новых строк.
+        """
+        expression = self._derived[name]
+        with self._lock:
+            version = self.version
+            buffer, length, cached_version = self._derived_values.get(name, (np.empty(0), 0, None))
+        if cached_version == version:
+            return buffer[:length]
+
+        columns = {column: self.float_column(column) for column in expression.columns
+                   if column not in expression.text_columns}
+        rows = min((len(values) for values in columns.values()), default=self.row_count)
+        if not expression.is_elementwise:
+            # Агрегаты изменились - пересчёт в новый буфер, ранее выданные массивы не меняются
+            buffer, length = np.empty(0), 0
+        if rows > len(buffer):
+            grown = np.empty(max(rows, 2 * len(buffer), self.expected_rows or 0))
+            grown[:length] = buffer[:length]
+            buffer = grown
+        # Столбцы передаются начиная с первой непосчитанной строки
+        columns = {column: values[length:rows] for column, values in columns.items()}
+        for column in expression.text_columns:
+            columns[column] = np.array(self.raw_column(column, length)[:rows - length], dtype=str)
+        expression.evaluate(columns, 0, rows - length, out=buffer[length:rows])
+
+        with self._lock:
+            self._derived_values[name] = (buffer, rows, version)
+        return buffer[:rows]
+
+    def set_float_columns(self, columns, rows):
+        """
+        Заполнение набора готовыми числовыми столбцами, например, из кэша разбора (см. ParseCache).
+        Строковых значений у такого набора нет.
+
+        :param columns: Словарь {название столбца: массив float64}.
+        :param rows: Количество строк.
+        :return:
+        """
+        with self._lock:
+            for name, values in columns.items():
+                self._float_columns[name] = (values, rows, 0)
+            self.row_count = rows
+            self.version += 1
+        self.complete = True
+
+    def column_order(self, name):
+        """
+        Упорядоченность числового столбца (см. ColumnOrder).
+        При дозагрузке просматриваются только новые строки.
+
+        :param name: Название столбца или производного столбца.
+        :return: ColumnOrder.
+        """
+        values = self.float_column(name)
+        with self._lock:
+            order = self._orders.get(name)
+        # Агрегаты производного столбца меняют и уже посчитанные значения
+        derived = self._derived.get(name) if name not in self.headers else None
+        if order is None or order.length > len(values) or (derived is not None and not derived.is_elementwise):
+            order = ColumnOrder.detect(values)
+        else:
+            order = order.extend(values)
+        with self._lock:
+            self._orders[name] = order
+        return order
+
+    def memory_arrays(self):
+        """
+        Числовые буферы и вытесненные блоки строк (см. MemoryBudget).
+        """
+        with self._lock:
+            arrays = [buffer for buffer, _, _ in self._float_columns.values()]
+            arrays += [buffer for buffer, _, _ in self._derived_values.values()]
+            arrays += [array for chunk in self._chunks for values in chunk.values()
+                       if isinstance(values, SpilledStrings) for array in (values.offsets, values.data)]
+        return arrays
+
+    def memory_overhead(self):
+        return self._chunk_bytes
+
+    def spillable(self):
+        """
+        Вытеснять можно только полностью разобранный набор, который ещё держит данные в памяти.
+        """
+        return self.complete and (self._chunk_bytes > 0 or any(map(array_bytes, self.memory_arrays())))
+
+    def spill(self):
+        """
+        Вытеснение блоков строк и числовых столбцов во временные файлы.
+        Блоки строк хранятся в SpilledStrings, столбцы - массивами numpy.memmap.
+        Файлы пишутся без блокировки набора, поэтому чтение столбцов в это время не ждёт;
+        столбец, изменившийся за время записи, остаётся в памяти.
+        """
+        with self._lock:
+            chunks = list(self._chunks)
+            columns = [(columns, dict(columns)) for columns in (self._float_columns, self._derived_values)]
+        chunks = [{name: values if isinstance(values, SpilledStrings) else SpilledStrings(values)
+                   for name, values in chunk.items()} for chunk in chunks]
+        spilled = [(columns, name, entry, (MemoryBudget.spill_array(entry[0][:entry[1]]), *entry[1:]))
+                   for columns, entries in columns for name, entry in entries.items()]
+        with self._lock:
+            self._chunks[:len(chunks)] = chunks
+            self._chunk_bytes = sum(self._estimate_chunk_bytes(chunk, len(next(iter(chunk.values()), [])))
+                                    for chunk in self._chunks[len(chunks):])
+            for columns, name, entry, spilled_entry in spilled:
+                if columns.get(name) is entry:
+                    columns[name] = spilled_entry
+
+    def _record_bad_values(self, name, chunk, chunk_start, bad):
+        for i in bad:
+            line = self.errors.row_to_line(chunk_start + i)
+            value = chunk[name][i]
+            if self.on_error == ON_ERROR_RAISE:
+                raise ValueError(f"строка {line}, столбец {name}: не число {value!r}")
+
+            reason = REASON_EMPTY_VALUE if not value.strip() else REASON_NOT_A_NUMBER
+            raw = None
+            if self.on_error == ON_ERROR_QUARANTINE:
+                raw = (self.delimiter or ",").join(column[i] for column in chunk.values())
+            self.errors.add(line, reason, column=name, raw=raw)
+
+    @property
+    def filter_key(self):
+        """
+        Ключ фильтра строк для кэша, () - без фильтра.
+        """
+        return self.row_filter.key if self.row_filter else ()
+
+    def filtered(self, row_filter):
+        """
+        Новый набор данных из строк этого набора, прошедших дополнительный фильтр.
+        Файл при этом не перечитывается.
+
+        :param row_filter: Дополнительный фильтр строк.
+        :return: Dataset с объединённым фильтром.
+        """
+        with self._lock:
+            chunks = list(self._chunks)
+            starts = list(self._chunk_starts)
+        combined = self.row_filter & row_filter if self.row_filter else row_filter
+        kept_rows = []
+        dataset = type(self)(self.file_path, self.encoding, self.delimiter, on_error=self.on_error,
+                             row_filter=combined)
+        dataset.fingerprint = self.fingerprint
+        dataset.headers = list(self.headers)
+        for chunk, start in zip(chunks, starts):
+            chunk, kept = row_filter.apply({name: as_list(values) for name, values in chunk.items()})
+            kept_rows.extend((kept + start).tolist())
+            dataset.append_chunk(chunk)
+        dataset.errors = self.errors.subset(kept_rows)
+        for name in self._derived:
+            dataset.add_derived(name)
+        dataset.complete = self.complete
+        return dataset
+
+    def rows(self, n=None):
+        """
+        Первые n строк в виде списков значений.
+
+        :param n: Количество строк, None - все.
+        :return: Список строк.
+        """
+        with self._lock:
+            chunks = list(self._chunks)
+        rows = []
+        for chunk in chunks:
+            rows.extend(map(list, zip(*map(as_list, chunk.values()))))
+            if n is not None and len(rows) >= n:
+                return rows[:n]
+        return rows
+
+
+class DatasetCache:
+    """
+    Общий для приложения кэш разобранных файлов.
+    Запись считается устаревшей, если файл изменился на диске.
+    """
+
+    _datasets = {}
+    _lock = threading.Lock()
+
+    @classmethod
+    def get(cls, file_path, row_filter=None):
+        """
+        Получение разобранного файла из кэша.
+
+        Если файл с таким фильтром не разбирался, но в кэше есть полностью
+        разобранный набор с частью его условий (или без фильтра), оставшиеся
+        условия применяются к нему в памяти без чтения файла.
+
+        :param file_path: Путь к файлу.
+        :param row_filter: Фильтр строк (RowFilter) или None.
+        :return: Dataset или None.
+        """
+        path = os.path.abspath(file_path)
+        key = row_filter.key if row_filter else ()
+        with cls._lock:
+            dataset = cls._datasets.get((path, key))
+            # Наборы с меньшим числом условий, начиная с самых узких
+            bases = sorted((dataset for (base_path, base_key), dataset in cls._datasets.items()
+                            if base_path == path and len(base_key) < len(key) and set(base_key) <= set(key)),
+                           key=lambda dataset: dataset.row_count)
+        if dataset is not None:
+            if dataset.is_current():
+                return dataset
+            cls.discard(dataset)
+
+        for base in bases:
+            if not base.is_current():
+                cls.discard(base)
+            elif base.complete:
+                dataset = base.filtered(row_filter.without(base.filter_key))
+                cls.put(dataset)
+                return dataset
+        return None
+
+    @classmethod
+    def put(cls, dataset):
+        with cls._lock:
+            cls._datasets[os.path.abspath(dataset.file_path), dataset.filter_key] = dataset
+
+    @classmethod
+    def discard(cls, dataset):
+        """
+        Удаление записи, если в кэше лежит именно этот набор данных.
+        """
+        key = (os.path.abspath(dataset.file_path), dataset.filter_key)
+        with cls._lock:
+            if cls._datasets.get(key) is dataset:
+                del cls._datasets[key]
@@ -0,0 +1,269 @@
+import ast
+import re
+
+import numpy as np
+
+
+class ExpressionError(ValueError):
+    """
+    Ошибка разбора или вычисления выражения производного столбца.
+    """
+
+
+# Поэлементные функции
+FUNCTIONS = {
+    "abs": np.abs,
+    "sqrt": np.sqrt,
+    "exp": np.exp,
+    "log": np.log,
+    "log10": np.log10,
+    "log2": np.log2,
+    "sin": np.sin,
+    "cos": np.cos,
+    "tan": np.tan,
+    "arcsin": np.arcsin,
+    "arccos": np.arccos,
+    "arctan": np.arctan,
+    "floor": np.floor,
+    "ceil": np.ceil,
+    "round": np.round,
+    "minimum": np.fmin,
+    "maximum": np.fmax,
+    "where": np.where,
+}
+
+# Агрегаты по всему столбцу, NaN пропускаются
+REDUCTIONS = {
+    "mean": np.nanmean,
+    "std": np.nanstd,
+    "min": np.nanmin,
+    "max": np.nanmax,
+    "sum": np.nansum,
+    "median": np.nanmedian,
+}
+
+CONSTANTS = {
+    "pi": np.pi,
+    "e": np.e,
+}
+
+_BINARY = {
+    ast.Add: np.add,
+    ast.Sub: np.subtract,
+    ast.Mult: np.multiply,
+    ast.Div: np.true_divide,
+    ast.FloorDiv: np.floor_divide,
+    ast.Mod: np.mod,
+    ast.Pow: np.power,
+}
+
+_UNARY = {
+    ast.USub: np.negative,
+    ast.UAdd: np.positive,
+    ast.Not: np.logical_not,
+}
+
+_COMPARE = {
+    ast.Lt: np.less,
+    ast.LtE: np.less_equal,
+    ast.Gt: np.greater,
+    ast.GtE: np.greater_equal,
+    ast.Eq: np.equal,
+    ast.NotEq: np.not_equal,
+}
+
+_BOOL = {
+    ast.And: np.logical_and,
+    ast.Or: np.logical_or,
+}
+
+_QUOTED = re.compile(r"`([^`]*)`")
+
+
+class Expression:
+    """
+    Выражение производного столбца над числовыми столбцами набора данных.
+
+    Поддерживаются числа, арифметика, сравнения, функции из FUNCTIONS и
+    агрегаты из REDUCTIONS. Столбцы с пробелами и прочими символами в
+    названии записываются в обратных кавычках: `Время, с` / 60.
+    Столбец, сравниваемый со строкой (status == "OK"), считается текстовым:
+    его значения передаются в evaluate строками, а не числами.
+    Выражение разбирается модулем ast и никогда не выполняется как код Python.
+
+    Вычисление идёт блоками по chunk_size строк, поэтому промежуточные
+    массивы занимают размер блока, а не всего столбца. Агрегаты считаются
+    заранее по всему столбцу и подставляются как числа.
+    """
+
+    def __init__(self, text):
+        """
+        :param text: Текст выражения.
+        """
+        self.text = text
+        self._names = {}
+
+        def quote(match):
+            alias = f"__column_{len(self._names)}"
+            self._names[alias] = match.group(1)
+            return alias
+
+        try:
+            tree = ast.parse(_QUOTED.sub(quote, text.strip()), mode='eval')
+        except SyntaxError as e:
+            raise ExpressionError(f"ошибка в выражении {text!r}: {e.msg}") from None
+
+        self.columns = []
+        # Столбцы, сравниваемые со строками
+        self.text_columns = []
+        self._numeric_columns = []
+        self._reductions = []
+        self._root = self._check(tree.body)
+        mixed = [name for name in self.text_columns if name in self._numeric_columns]
+        if mixed:
+            raise ExpressionError(f"столбец {mixed[0]!r} сравнивается со строкой и используется как число")
+        # Поэлементное выражение можно досчитывать только для новых строк
+        self.is_elementwise = not self._reductions
+
+    def __repr__(self):
+        return f"Expression({self.text!r})"
+
+    def _check(self, node):
+        """
+        Проверка узла дерева: допускаются только известные операции, функции и столбцы.
+        """
+        if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                and not isinstance(node.value, bool):
+            return node
+        if isinstance(node, ast.Name):
+            name = self._names.get(node.id, node.id)
+            if node.id not in self._names and name in CONSTANTS:
+                return node
+            self._add_column(node, self._numeric_columns)
+            return node
+        if isinstance(node, ast.BinOp) and type(node.op) in _BINARY:
+            self._check(node.left)
+            self._check(node.right)
+            return node
+        if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY:
+            self._check(node.operand)
+            return node
+        if isinstance(node, ast.Compare) and all(type(op) in _COMPARE for op in node.ops):
+            operands = [node.left] + node.comparators
+            if any(self._is_text(child) for child in operands):
+                return self._check_text_compare(node, operands)
+            for child in operands:
+                self._check(child)
+            return node
+        if isinstance(node, ast.BoolOp) and type(node.op) in _BOOL:
+            for child in node.values:
+                self._check(child)
+            return node
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and not node.keywords:
+            name = node.func.id
+            if name in REDUCTIONS:
+                if len(node.args) != 1:
+                    raise ExpressionError(f"{name}() принимает один аргумент")
+                self._check(node.args[0])
+                self._reductions.append(node)
+                return node
+            if name in FUNCTIONS:
+                for child in node.args:
+                    self._check(child)
+                return node
+            raise ExpressionError(f"неизвестная функция {name}()")
+        raise ExpressionError(f"недопустимая конструкция в выражении {self.text!r}")
+
+    def _add_column(self, node, kind):
+        name = self._names.get(node.id, node.id)
+        if name not in self.columns:
+            self.columns.append(name)
+        if name not in kind:
+            kind.append(name)
+        node.id = name
+
+    @staticmethod
+    def _is_text(node):
+        return isinstance(node, ast.Constant) and isinstance(node.value, str)
+
+    def _check_text_compare(self, node, operands):
+        """
+        Сравнение со строкой: операндами могут быть только столбцы и строки.
+        """
+        for child in operands:
+            if isinstance(child, ast.Name) and (child.id in self._names or child.id not in CONSTANTS):
+                self._add_column(child, self.text_columns)
+            elif not self._is_text(child):
+                raise ExpressionError(f"со строкой можно сравнивать только столбец в выражении {self.text!r}")
+        return node
+
+    def evaluate(self, columns, start=0, stop=None, chunk_size=1 << 14, out=None):
+        """
+        Вычисление выражения для строк [start, stop).
+
+        :param columns: Словарь {название столбца: массив float64, для text_columns - массив строк}.
+        :param start: Первая строка.
+        :param stop: Строка после последней, по умолчанию длина столбцов.
+        :param chunk_size: Размер блока вычисления.
+        :param out: Массив для результата длиной stop - start.
+        :return: Массив float64.
+        """
+        missing = [name for name in self.columns if name not in columns]
+        if missing:
+            raise ExpressionError(f"нет столбца {missing[0]!r} для выражения {self.text!r}")
+        if stop is None:
+            stop = min((len(columns[name]) for name in self.columns), default=0)
+        if out is None:
+            out = np.empty(stop - start)
+
+        with np.errstate(all='ignore'):
+            reduced = {id(node): self._reduce(node, columns, stop, chunk_size) for node in self._reductions}
+            for chunk_start in range(start, stop, chunk_size):
+                chunk_stop = min(chunk_start + chunk_size, stop)
+                env = {name: columns[name][chunk_start:chunk_stop] for name in self.columns}
+                out[chunk_start - start:chunk_stop - start] = self._eval(self._root, env, reduced)
+        return out
+
+    def _reduce(self, node, columns, stop, chunk_size):
+        # Аргумент агрегата - самостоятельное выражение над всем столбцом
+        argument = Expression.__new__(Expression)
+        argument.text = self.text
+        argument.columns = self.columns
+        argument.text_columns = self.text_columns
+        argument._reductions = [child for child in self._reductions
+                                if child is not node and self._contains(node.args[0], child)]
+        argument._root = node.args[0]
+        values = argument.evaluate(columns, 0, stop, chunk_size)
+        return float(REDUCTIONS[node.func.id](values)) if len(values) else np.nan
+
+    @staticmethod
+    def _contains(tree, node):
+        return any(child is node for child in ast.walk(tree))
+
+    def _eval(self, node, env, reduced):
+        if isinstance(node, ast.Constant):
+            return node.value if isinstance(node.value, str) else float(node.value)
+        if isinstance(node, ast.Name):
+            return env[node.id] if node.id in env else CONSTANTS[node.id]
+        if isinstance(node, ast.BinOp):
+            return _BINARY[type(node.op)](self._eval(node.left, env, reduced),
+                                          self._eval(node.right, env, reduced))
+        if isinstance(node, ast.UnaryOp):
+            return _UNARY[type(node.op)](self._eval(node.operand, env, reduced))
+        if isinstance(node, ast.Compare):
+            left = self._eval(node.left, env, reduced)
+            result = True
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._eval(comparator, env, reduced)
+                result = np.logical_and(result, _COMPARE[type(op)](left, right))
+                left = right
+            return result
+        if isinstance(node, ast.BoolOp):
+            values = [self._eval(child, env, reduced) for child in node.values]
+            result = values[0]
+            for value in values[1:]:
+                result = _BOOL[type(node.op)](result, value)
+            return result
+        if id(node) in reduced:
+            return reduced[id(node)]
+        return FUNCTIONS[node.func.id](*(self._eval(child, env, reduced) for child in node.args))
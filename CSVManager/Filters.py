@@ -0,0 +1,86 @@
+import numpy as np
+
+from CSVManager.Dataset import to_float
+from CSVManager.Expressions import Expression, ExpressionError
+
+
+class RowFilter:
+    """
+    Фильтр строк: условия-выражения (см. Expression), объединённые через «и».
+
+    Условия вычисляются по блоку строк на массивах нужных столбцов: числовые
+    столбцы преобразуются в float64, текстовые (сравниваемые со строкой)
+    остаются строками. Каждое следующее условие вычисляется только для строк,
+    прошедших предыдущие. Строка проходит условие, если его значение не 0 и не NaN.
+    """
+
+    def __init__(self, conditions=()):
+        """
+        :param conditions: Тексты условий, например 't > 1000', 'status == "OK"'.
+        """
+        self.conditions = tuple(dict.fromkeys(text.strip() for text in conditions if text.strip()))
+        self._expressions = [Expression(text) for text in self.conditions]
+        for expression in self._expressions:
+            if not expression.is_elementwise:
+                raise ExpressionError(f"в фильтре нельзя использовать агрегаты: {expression.text!r}")
+        self.columns = list(dict.fromkeys(name for expression in self._expressions for name in expression.columns))
+
+    def __repr__(self):
+        return f"RowFilter({list(self.conditions)!r})"
+
+    def __bool__(self):
+        return bool(self.conditions)
+
+    def __and__(self, other):
+        return RowFilter(self.conditions + other.conditions)
+
+    @property
+    def key(self):
+        """
+        Ключ фильтра для кэша: порядок условий на результат не влияет.
+        """
+        return tuple(sorted(self.conditions))
+
+    def without(self, conditions):
+        """
+        Фильтр из условий, которых нет в conditions (доуточнение уже отфильтрованных данных).
+        """
+        return RowFilter(text for text in self.conditions if text not in conditions)
+
+    def mask(self, chunk):
+        """
+        Строки блока, прошедшие все условия.
+
+        :param chunk: Словарь {название столбца: список значений}, нужны столбцы self.columns.
+        :return: Массив bool.
+        """
+        rows = len(next(iter(chunk.values()), []))
+        selected = np.arange(rows)
+        typed = {}
+        for expression in self._expressions:
+            columns = {}
+            for name in expression.columns:
+                kind = name in expression.text_columns
+                if (name, kind) not in typed:
+                    typed[name, kind] = np.array(chunk[name], dtype=str) if kind else to_float(chunk[name])[0]
+                values = typed[name, kind]
+                columns[name] = values if len(selected) == rows else values[selected]
+            with np.errstate(invalid='ignore'):
+                values = expression.evaluate(columns, 0, len(selected))
+            selected = selected[np.nan_to_num(values) != 0]
+            if not len(selected):
+                break
+
+        mask = np.zeros(rows, dtype=bool)
+        mask[selected] = True
+        return mask
+
+    def apply(self, chunk):
+        """
+        Строки блока, прошедшие фильтр.
+
+        :param chunk: Словарь {название столбца: список значений}.
+        :return: Кортеж (отфильтрованный блок, номера оставленных строк блока).
+        """
+        kept = np.flatnonzero(self.mask(chunk))
+        return {name: [values[i] for i in kept] for name, values in chunk.items()}, kept
@@ -0,0 +1,233 @@
+import itertools
+import threading
+
+from PySide6.QtCore import QObject, QRunnable, QThread, QThreadPool, Signal
+
+# Приоритеты задач: предпросмотр нужен пользователю сразу, полная загрузка - по запросу,
+# упреждающий разбор - пока пользователь выбирает столбцы
+PRIORITY_PREFETCH = 0
+PRIORITY_LOAD = 1
+PRIORITY_PREVIEW = 2
+
+
+class Job(QObject):
+    """
+    Задача планировщика: функция, выполняемая в общем пуле потоков.
+
+    Функция получает задачу первым аргументом: через is_cancelled() она
+    проверяет отмену, через report() сообщает промежуточный результат.
+    Сигналы задачи доставляются в поток получателя, поэтому результат
+    приходит в тот виджет, который подключился к задаче, а закрытый виджет
+    автоматически перестаёт их получать.
+    """
+    progress = Signal(object)
+    finished = Signal(object)
+    failed = Signal(str)
+    # Задача завершилась любым способом, в том числе отменой
+    done = Signal()
+
+    _ids = itertools.count(1)
+
+    def __init__(self, function=None, *args, priority=PRIORITY_LOAD, **kwargs):
+        """
+        :param function: Функция function(job, *args, **kwargs), её результат передаётся в finished.
+            Подклассы вместо неё могут переопределить run().
+        :param priority: Приоритет PRIORITY_*.
+        """
+        super().__init__()
+        self.id = next(self._ids)
+        self.priority = priority
+        self.function = function
+        self.args = args
+        self.kwargs = kwargs
+        self._cancelled = threading.Event()
+        self._started = threading.Event()
+        self._done = threading.Event()
+        # Обёртка QRunnable в очереди пула: после запуска её удаляет пул, поэтому
+        # забирать её из очереди можно только под блокировкой, пока задача не началась
+        self._runnable = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"{type(self).__name__}(id={self.id}, priority={self.priority})"
+
+    def run(self):
+        """
+        Работа задачи в потоке пула.
+
+        :return: Результат для сигнала finished.
+        """
+        return self.function(self, *self.args, **self.kwargs)
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def cancel(self):
+        """
+        Отмена: задача из очереди не запустится, выполняющаяся увидит is_cancelled().
+        Сигналы finished и failed после отмены не отправляются.
+        """
+        self._cancelled.set()
+
+    def report(self, value):
+        """
+        Промежуточный результат задачи (сигнал progress).
+        """
+        if not self.is_cancelled():
+            self.progress.emit(value)
+
+    def sleep(self, seconds):
+        """
+        Пауза, прерываемая отменой.
+
+        :return: True, если задача отменена.
+        """
+        return self._cancelled.wait(seconds)
+
+    def is_running(self):
+        return self._started.is_set() and not self._done.is_set()
+
+    def is_done(self):
+        return self._done.is_set()
+
+    def wait(self, timeout=None):
+        """
+        Ожидание завершения задачи, например, отменённой перед закрытием окна.
+        Задача, которая ещё стоит в очереди, ждать не нужно: см. JobScheduler.cancel.
+
+        :param timeout: Время ожидания в секундах, None - без ограничения.
+        :return: True, если задача завершилась.
+        """
+        return self._done.wait(timeout)
+
+    def _execute(self):
+        with self._lock:
+            self._started.set()
+        try:
+            if self.is_cancelled():
+                return
+            try:
+                result = self.run()
+            except Exception as e:
+                if not self.is_cancelled():
+                    self.failed.emit(str(e))
+                return
+            if not self.is_cancelled():
+                self.finished.emit(result)
+        finally:
+            self._done.set()
+            self.done.emit()
+
+
+class _JobRunnable(QRunnable):
+    def __init__(self, job):
+        super().__init__()
+        self.job = job
+
+    def run(self):
+        self.job._execute()
+
+
+class JobScheduler(QObject):
+    """
+    Общий планировщик фоновых задач на QThreadPool с фиксированным числом потоков.
+
+    Задачи из очереди запускаются по приоритету, у каждой есть номер.
+    Количество потоков не растёт с числом открытых файлов: лишние задачи
+    ждут в очереди, а отменённые удаляются из неё, не начав работу.
+    """
+
+    _shared = None
+
+    def __init__(self, workers=None, parent=None):
+        """
+        :param workers: Количество потоков, по умолчанию по числу ядер, но не меньше 4:
+            долгий разбор не должен занимать все потоки, пока ждёт предпросмотр.
+        :param parent: Родительский объект.
+        """
+        super().__init__(parent)
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(workers or max(QThread.idealThreadCount(), 4))
+        # Номер задачи -> задача, пока она не завершилась
+        self._jobs = {}
+
+    @classmethod
+    def shared(cls):
+        """
+        Планировщик приложения. Создаётся при первом обращении из потока интерфейса.
+        """
+        if cls._shared is None:
+            cls._shared = JobScheduler()
+        return cls._shared
+
+    @property
+    def workers(self):
+        return self.pool.maxThreadCount()
+
+    def submit(self, job):
+        """
+        Постановка задачи в очередь. Сигналы задачи нужно подключить до вызова.
+
+        :param job: Job.
+        :return: Номер задачи.
+        """
+        self._jobs[job.id] = job
+        job.done.connect(self._on_done)
+        job._runnable = _JobRunnable(job)
+        self.pool.start(job._runnable, job.priority)
+        return job.id
+
+    def job(self, job_id):
+        """
+        Незавершённая задача по номеру или None.
+        """
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        return list(self._jobs.values())
+
+    def cancel(self, job):
+        """
+        Отмена задачи (или её номера). Задача из очереди удаляется сразу.
+
+        :return: True, если задача ещё не начала работу.
+        """
+        job = self._jobs.get(job) if isinstance(job, int) else job
+        if job is None:
+            return False
+        job.cancel()
+        with job._lock:
+            if job._started.is_set() or not self.pool.tryTake(job._runnable):
+                return False
+            job._runnable = None
+        self._forget(job)
+        job._done.set()
+        # Задача из очереди не запустится и сама не сообщит о завершении
+        job.done.emit()
+        return True
+
+    def set_priority(self, job, priority):
+        """
+        Изменение приоритета задачи, которая ещё ждёт в очереди.
+        Выполняющаяся задача уже получила поток и продолжает работу.
+        """
+        job.priority = priority
+        with job._lock:
+            if job._started.is_set() or job.is_cancelled() or not self.pool.tryTake(job._runnable):
+                return
+            job._runnable = _JobRunnable(job)
+            self.pool.start(job._runnable, priority)
+
+    def wait_all(self, timeout_ms=-1):
+        """
+        Ожидание всех задач пула, например, при завершении приложения.
+        """
+        return self.pool.waitForDone(timeout_ms)
+
+    def _on_done(self):
+        job = self.sender()
+        if job is not None:
+            self._forget(job)
+
+    def _forget(self, job):
+        self._jobs.pop(job.id, None)
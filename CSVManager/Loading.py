@@ -0,0 +1,95 @@
+import os
+
+from CSVManager.Dataset import Dataset, DatasetCache
+from CSVManager.ParseErrors import ON_ERROR_NAN
+from CSVManager.Reader import Reader
+from CSVManager.Shards import ShardedDataset, is_shard_source
+
+
+def load_dataset(file_path, delimiter=None, encoding=None, on_error=ON_ERROR_NAN, row_filter=None,
+                 chunk_rows=100000, first_chunk_rows=None, on_start=None, on_chunk=None, is_cancelled=None):
+    """
+    Разбор файла или набора файлов-частей в общий кэш наборов данных.
+
+    Готовый набор берётся из DatasetCache. Новый набор кладётся в кэш сразу,
+    чтобы другие потребители видели уже разобранную часть, и удаляется из
+    кэша при ошибке или отмене.
+
+    :param file_path: Путь к файлу, папке или шаблон glob.
+    :param delimiter: Разделитель полей.
+    :param encoding: Кодировка файла.
+    :param on_error: Политика обработки ошибок (см. Reader).
+    :param row_filter: Фильтр строк (RowFilter) или None.
+    :param chunk_rows: Размер блока в строках.
+    :param first_chunk_rows: Размер первого блока, чтобы первые данные были готовы быстрее.
+    :param on_start: Вызывается с набором данных до разбора первого блока.
+    :param on_chunk: Вызывается с набором данных после каждого непустого блока.
+    :param is_cancelled: Функция без аргументов, True - прервать разбор.
+    :return: Dataset или None, если разбор прерван.
+    """
+    is_cancelled = is_cancelled or (lambda: False)
+    cached = DatasetCache.get(file_path, row_filter)
+    if cached is not None and cached.complete and cached.on_error == on_error:
+        if on_start is not None:
+            on_start(cached)
+        return cached
+
+    def chunk_loaded(dataset):
+        # Пока фильтр не пропустил ни одной строки, показывать нечего
+        if dataset.row_count and on_chunk is not None:
+            on_chunk(dataset)
+
+    if is_shard_source(file_path):
+        dataset = ShardedDataset(file_path, encoding, delimiter, on_error, row_filter)
+        if on_start is not None:
+            on_start(dataset)
+        DatasetCache.put(dataset)
+        try:
+            if not dataset.load(chunk_rows, on_chunk=chunk_loaded, is_cancelled=is_cancelled):
+                DatasetCache.discard(dataset)
+                return None
+        except Exception:
+            DatasetCache.discard(dataset)
+            raise
+        return dataset
+
+    reader = Reader(file_path, delimiter, encoding, on_error)
+    dataset = Dataset(file_path, on_error=on_error, errors=reader.errors, row_filter=row_filter)
+    if on_start is not None:
+        on_start(dataset)
+    DatasetCache.put(dataset)
+    try:
+        for chunk in reader.iter_chunks(chunk_rows, first_chunk_rows, row_filter=row_filter):
+            if is_cancelled():
+                DatasetCache.discard(dataset)
+                return None
+            if dataset.encoding is None:
+                dataset.encoding = reader._detected_encoding
+                dataset.delimiter = reader._detected_delimiter
+                # С фильтром число строк по размеру файла не оценить, буферы растут удвоением
+                if not row_filter:
+                    dataset.expected_rows = _estimate_rows(file_path, chunk)
+            dataset.append_chunk(chunk)
+            chunk_loaded(dataset)
+
+        if not dataset.headers:
+            dataset.headers = reader.headers
+        if len(reader.errors):
+            reader.errors.resolve_offsets(file_path, reader.compression)
+        dataset.complete = True
+        return dataset
+    except Exception:
+        DatasetCache.discard(dataset)
+        raise
+
+
+def _estimate_rows(file_path, chunk):
+    """
+    Оценка количества строк файла по среднему размеру строки первого блока.
+    Для сжатых файлов оценка занижена, буферы тогда растут удвоением.
+    """
+    rows = len(next(iter(chunk.values()), []))
+    if not rows:
+        return None
+    chars = sum(len(value) + 1 for values in chunk.values() for value in values)
+    return int(os.path.getsize(file_path) / (chars / rows) * 1.1)
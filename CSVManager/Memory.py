@@ -0,0 +1,248 @@
+import os
+import tempfile
+import threading
+import time
+import weakref
+
+import numpy as np
+
+# Переменная окружения с бюджетом памяти в мегабайтах
+BUDGET_ENV = "GRAPHBUILDER_MEMORY_MB"
+
+
+def default_budget():
+    """
+    Бюджет памяти по умолчанию: переменная окружения GRAPHBUILDER_MEMORY_MB
+    или четверть физической памяти (2 ГБ, если её размер неизвестен).
+
+    :return: Бюджет в байтах.
+    """
+    if os.environ.get(BUDGET_ENV):
+        return int(float(os.environ[BUDGET_ENV]) * 2 ** 20)
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // 4
+    except (AttributeError, ValueError, OSError):
+        return 2 * 2 ** 30
+
+
+def root_array(array):
+    """
+    Массив, которому принадлежат данные представления.
+    """
+    while isinstance(array.base, np.ndarray):
+        array = array.base
+    return array
+
+
+def is_spilled(array):
+    """
+    Лежат ли данные массива в файле на диске.
+    """
+    return isinstance(root_array(array), np.memmap)
+
+
+def array_bytes(array):
+    """
+    Объём памяти массива, не считая данных, вытесненных на диск.
+    """
+    return 0 if array is None or is_spilled(array) else root_array(array).nbytes
+
+
+class MemoryBudget:
+    """
+    Общий для приложения учёт памяти наборов данных и серий.
+
+    Владельцы буферов (Dataset, Series) регистрируются при создании и
+    отмечают время последнего обращения. При превышении бюджета самые давно
+    использованные владельцы вытесняют массивы в отображаемые в память
+    временные файлы: данные остаются доступны как обычные массивы, а
+    страницы, к которым не обращаются, система может не держать в памяти.
+    Один и тот же буфер (например, общий X нескольких серий) вытесняется
+    в один файл.
+
+    Владелец реализует memory_arrays() - массивы, которые он держит,
+    memory_overhead() - оценку памяти объектов вне массивов numpy,
+    spillable() - можно ли его сейчас вытеснять, и spill().
+    """
+
+    budget = default_budget()
+    # Каталог временных файлов, None - системный
+    directory = None
+
+    _owners = weakref.WeakSet()
+    # id корневого буфера -> (слабая ссылка на буфер, копия его начала на диске, длина копии)
+    _spilled = {}
+    _lock = threading.RLock()
+    # Вытеснение идёт в одном потоке: повторный вызов во время вытеснения ничего не делает
+    _enforce_lock = threading.Lock()
+
+    @classmethod
+    def register(cls, owner):
+        owner.last_used = time.monotonic()
+        with cls._lock:
+            cls._owners.add(owner)
+
+    @classmethod
+    def owners(cls):
+        with cls._lock:
+            return list(cls._owners)
+
+    @classmethod
+    def totals(cls):
+        """
+        Память всех владельцев, общие буферы считаются один раз.
+
+        :return: Кортеж (байт в памяти, байт вытеснено на диск).
+        """
+        roots = {}
+        overhead = 0
+        for owner in cls.owners():
+            overhead += owner.memory_overhead()
+            for array in owner.memory_arrays():
+                if array is not None:
+                    root = root_array(array)
+                    roots[id(root)] = root
+        ram = sum(root.nbytes for root in roots.values() if not isinstance(root, np.memmap))
+        disk = sum(root.nbytes for root in roots.values() if isinstance(root, np.memmap))
+        return ram + overhead, disk
+
+    @classmethod
+    def usage(cls):
+        """
+        Память всех владельцев без учёта вытесненных данных.
+
+        :return: Объём в байтах.
+        """
+        return cls.totals()[0]
+
+    @classmethod
+    def enforce(cls):
+        """
+        Вытеснение самых давно использованных владельцев, пока память больше бюджета.
+        Запись файлов долгая, поэтому приложение вызывает его вне потока интерфейса.
+
+        :return: Количество вытесненных владельцев.
+        """
+        if not cls._enforce_lock.acquire(blocking=False):
+            return 0
+        try:
+            usage = cls.usage()
+            if usage <= cls.budget:
+                return 0
+            spilled = 0
+            for owner in sorted(cls.owners(), key=lambda owner: owner.last_used):
+                if not owner.spillable():
+                    continue
+                owner.spill()
+                spilled += 1
+                usage = cls.usage()
+                if usage <= cls.budget:
+                    break
+            return spilled
+        finally:
+            cls._enforce_lock.release()
+
+    @classmethod
+    def spill_array(cls, array):
+        """
+        Копия массива в отображаемом в память временном файле.
+
+        Представление буфера превращается в такое же представление вытесненного
+        буфера, поэтому все владельцы представлений одного буфера делят один файл.
+        Буфер с запасом может дописываться после вытеснения (набор данных ещё
+        загружается): на диск копируется только начало буфера до конца
+        представления, и представление, выходящее за копию, копируется заново.
+
+        :param array: Массив numpy.
+        :return: Массив numpy.memmap или его представление.
+        """
+        if array is None or is_spilled(array):
+            return array
+        root = root_array(array)
+        contiguous = array.ndim == 1 and root.ndim == 1 and array.strides == (array.itemsize,) \
+            and array.dtype == root.dtype
+        if not contiguous:
+            return cls._to_file(array)
+
+        start = (array.__array_interface__["data"][0] - root.__array_interface__["data"][0]) // root.itemsize
+        stop = start + len(array)
+        with cls._lock:
+            ref, spilled, length = cls._spilled.get(id(root), (None, None, 0))
+            if ref is None or ref() is not root or length < stop:
+                spilled = cls._to_file(root[:stop])
+                key = id(root)
+                cls._spilled[key] = (weakref.ref(root, lambda _, key=key: cls._forget(key)), spilled, stop)
+        return spilled[start:stop]
+
+    @classmethod
+    def _forget(cls, key):
+        # Исходный буфер освобождён: его файл живёт, пока на него ссылаются владельцы
+        with cls._lock:
+            cls._spilled.pop(key, None)
+
+    @classmethod
+    def _to_file(cls, array):
+        if not array.size:
+            return array
+        # Файл удаляется системой при закрытии, отображение держит его открытым
+        spilled = np.memmap(tempfile.TemporaryFile(prefix="graphbuilder-", dir=cls.directory),
+                            dtype=array.dtype, mode="w+", shape=array.shape)
+        spilled[...] = array
+        spilled.flush()
+        return spilled
+
+
+class SpilledStrings:
+    """
+    Строки, вытесненные на диск: байты UTF-8 подряд и смещения начала каждой строки.
+
+    В отличие от массива строк numpy, где каждая строка занимает 4 байта на
+    символ самой длинной строки, здесь строка занимает свою длину в UTF-8.
+    Поддерживает len(), получение строки по номеру, срез (список строк) и tolist().
+    """
+
+    def __init__(self, values):
+        """
+        :param values: Список строк.
+        """
+        encoded = [value.encode("utf-8", "surrogatepass") for value in values]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum(np.fromiter(map(len, encoded), dtype=np.int64, count=len(encoded)), out=offsets[1:])
+        self.offsets = MemoryBudget.spill_array(offsets)
+        self.data = MemoryBudget.spill_array(np.frombuffer(b"".join(encoded), dtype=np.uint8))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self._decode(*index.indices(len(self))[:2]) if index.step in (None, 1) \
+                else self.tolist()[index]
+        index = range(len(self))[index]
+        return bytes(self.data[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8", "surrogatepass")
+
+    def __iter__(self):
+        return iter(self.tolist())
+
+    def _decode(self, start, stop):
+        if start >= stop:
+            return []
+        offsets = self.offsets[start:stop + 1].tolist()
+        base = offsets[0]
+        blob = bytes(self.data[base:offsets[-1]])
+        return [blob[begin - base:end - base].decode("utf-8", "surrogatepass")
+                for begin, end in zip(offsets, offsets[1:])]
+
+    def tolist(self):
+        return self._decode(0, len(self))
+
+
+def format_bytes(size):
+    """
+    Объём в удобных единицах: «512 КБ», «1.5 МБ».
+    """
+    for unit in ("Б", "КБ", "МБ"):
+        if size < 1024:
+            return f"{size:.0f} {unit}" if unit == "Б" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.2f} ГБ"
@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+
+import numpy as np
+
+from CSVManager.Dataset import Dataset, file_fingerprint
+from CSVManager.Shards import ShardedDataset, expand_shards, is_shard_source
+
+# Переменная окружения с каталогом кэша разбора
+CACHE_DIR_ENV = "GRAPHBUILDER_CACHE_DIR"
+# Переменная окружения с наибольшим размером кэша разбора в мегабайтах
+CACHE_SIZE_ENV = "GRAPHBUILDER_CACHE_MB"
+
+
+def default_cache_dir():
+    """
+    Каталог кэша: GRAPHBUILDER_CACHE_DIR или graphbuilder/parse в пользовательском каталоге кэшей.
+    """
+    if os.environ.get(CACHE_DIR_ENV):
+        return os.environ[CACHE_DIR_ENV]
+    base = os.environ.get("XDG_CACHE_HOME") or os.environ.get("LOCALAPPDATA") or \
+        os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "graphbuilder", "parse")
+
+
+def default_max_bytes():
+    """
+    Наибольший размер кэша: GRAPHBUILDER_CACHE_MB или 4 ГБ.
+    """
+    if os.environ.get(CACHE_SIZE_ENV):
+        return int(float(os.environ[CACHE_SIZE_ENV]) * 2 ** 20)
+    return 4 * 2 ** 30
+
+
+def content_fingerprint(source):
+    """
+    Отпечаток файла или набора файлов-частей по размерам и времени изменения.
+    """
+    paths = expand_shards(source) if is_shard_source(source) else [source]
+    return [[os.path.basename(path), *file_fingerprint(path)] for path in paths]
+
+
+def content_hash(source, block_size=1 << 22):
+    """
+    Хэш содержимого файла или набора файлов-частей (BLAKE2b).
+
+    :param source: Путь к файлу, папке или шаблон glob.
+    :param block_size: Размер читаемого блока.
+    :return: Строка hex.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    paths = expand_shards(source) if is_shard_source(source) else [source]
+    for path in paths:
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            while block := f.read(block_size):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+class ParseCache:
+    """
+    Кэш разобранных числовых столбцов на диске.
+
+    Запись определяется хэшем содержимого файла и параметрами разбора
+    (диалект, политика ошибок, фильтр строк) и хранит столбцы файлами .npy,
+    которые при чтении отображаются в память. Хэш большого файла считается
+    долго, поэтому в записи запоминается и отпечаток файла (размеры и время
+    изменения): пока он совпадает, файл не перечитывается.
+
+    Суммарный размер записей ограничен max_bytes: после сохранения удаляются
+    записи, к которым дольше всего не обращались (по времени изменения каталога
+    записи, оно обновляется при каждом сохранении и чтении).
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        """
+        :param directory: Каталог кэша, по умолчанию default_cache_dir().
+        :param max_bytes: Наибольший размер кэша, по умолчанию default_max_bytes().
+        """
+        self.directory = directory or default_cache_dir()
+        self.max_bytes = default_max_bytes() if max_bytes is None else max_bytes
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(file_hash, encoding, delimiter, on_error, filter_key=()):
+        """
+        Ключ записи: хэш содержимого и параметров разбора.
+        """
+        text = json.dumps([file_hash, encoding, delimiter, on_error, list(filter_key)])
+        return hashlib.blake2b(text.encode(), digest_size=16).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key)
+
+    def _meta(self, key):
+        try:
+            with open(os.path.join(self._path(key), "meta.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def file_hash(self, source, known_hash=None):
+        """
+        Хэш содержимого с проверкой по отпечатку: если файл не менялся с момента,
+        когда его хэш был посчитан (и совпадает с known_hash), он возвращается без чтения файла.
+
+        :param source: Путь к файлу, папке или шаблон glob.
+        :param known_hash: Ранее посчитанный хэш (например, из файла сессии), None - любой запомненный.
+        :return: Строка hex.
+        """
+        fingerprint = content_fingerprint(source)
+        remembered = self._fingerprints().get(os.path.abspath(source))
+        if remembered is not None and remembered[1] == fingerprint and known_hash in (None, remembered[0]):
+            return remembered[0]
+        file_hash = content_hash(source)
+        self._remember_fingerprint(source, file_hash, fingerprint)
+        return file_hash
+
+    def _fingerprints(self):
+        try:
+            with open(os.path.join(self.directory, "fingerprints.json"), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _remember_fingerprint(self, source, file_hash, fingerprint):
+        with self._lock:
+            fingerprints = self._fingerprints()
+            fingerprints[os.path.abspath(source)] = [file_hash, fingerprint]
+            self._write_json(os.path.join(self.directory, "fingerprints.json"), fingerprints)
+
+    def _write_json(self, path, data):
+        # Запись через временный файл: параллельные читатели не увидят половину файла
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(temp, path)
+
+    def columns(self, key):
+        """
+        Названия столбцов, сохранённых в записи.
+        """
+        meta = self._meta(key)
+        return list(meta["columns"]) if meta else []
+
+    def store(self, key, dataset, columns):
+        """
+        Сохранение числовых столбцов полностью разобранного набора данных.
+        Уже сохранённые столбцы записи не перезаписываются. После сохранения
+        давно не использованные записи сверх max_bytes удаляются.
+
+        :param key: Ключ записи (см. key).
+        :param dataset: Dataset.
+        :param columns: Названия столбцов файла.
+        :return:
+        """
+        path = self._path(key)
+        with self._lock:
+            meta = self._meta(key) or {"headers": dataset.headers, "rows": dataset.row_count,
+                                       "encoding": dataset.encoding, "delimiter": dataset.delimiter,
+                                       "shard_starts": getattr(dataset, "shard_starts", None), "columns": {}}
+            os.makedirs(path, exist_ok=True)
+            for name in columns:
+                if name in meta["columns"] or name not in dataset.headers:
+                    continue
+                # Имя файла зависит только от столбца: другой процесс, сохраняющий ту же запись,
+                # пишет в тот же файл те же данные, а не занимает чужой номер
+                file_name = hashlib.blake2b(name.encode(), digest_size=8).hexdigest() + ".npy"
+                fd, temp = tempfile.mkstemp(dir=path, suffix=".tmp")
+                with os.fdopen(fd, "wb") as f:
+                    np.save(f, np.ascontiguousarray(dataset.float_column(name)))
+                os.replace(temp, os.path.join(path, file_name))
+                meta["columns"][name] = file_name
+            self._write_json(os.path.join(path, "meta.json"), meta)
+            os.utime(path)
+            self._evict(keep=key)
+
+    def entries(self):
+        """
+        Записи кэша.
+
+        :return: Список кортежей (ключ, размер в байтах, время последнего использования).
+        """
+        entries = []
+        try:
+            items = list(os.scandir(self.directory))
+        except OSError:
+            return entries
+        for item in items:
+            if not item.is_dir():
+                continue
+            try:
+                size = sum(file.stat().st_size for file in os.scandir(item.path) if file.is_file())
+                entries.append((item.name, size, item.stat().st_mtime))
+            except OSError:
+                continue
+        return entries
+
+    def size(self):
+        """
+        Суммарный размер записей в байтах.
+        """
+        return sum(size for _, size, _ in self.entries())
+
+    def _evict(self, keep=None):
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        for key, size, _ in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            shutil.rmtree(self._path(key), ignore_errors=True)
+            total -= size
+
+    def load(self, key, file_path, on_error, row_filter=None, columns=()):
+        """
+        Набор данных из записи кэша: столбцы отображаются в память с диска.
+        Строковых значений в нём нет, поэтому в DatasetCache он не кладётся.
+
+        :param key: Ключ записи.
+        :param file_path: Путь к файлу, папке или шаблон glob.
+        :param on_error: Политика обработки ошибок.
+        :param row_filter: Фильтр строк (RowFilter) или None.
+        :param columns: Нужные столбцы.
+        :return: Dataset или None, если записи нет или в ней нет нужных столбцов.
+        """
+        meta = self._meta(key)
+        if meta is None or not set(columns) <= set(meta["columns"]):
+            return None
+        try:
+            arrays = {name: np.load(os.path.join(self._path(key), file_name), mmap_mode="r")
+                      for name, file_name in meta["columns"].items()}
+        except (OSError, ValueError):
+            return None
+        if any(len(values) != meta["rows"] for values in arrays.values()):
+            return None
+        try:
+            # Время использования записи для вытеснения давно не использованных
+            os.utime(self._path(key))
+        except OSError:
+            pass
+
+        if is_shard_source(file_path):
+            dataset = ShardedDataset(file_path, meta["encoding"], meta["delimiter"], on_error, row_filter)
+            dataset.shard_starts = meta["shard_starts"] or []
+        else:
+            dataset = Dataset(file_path, meta["encoding"], meta["delimiter"], on_error, row_filter=row_filter)
+        dataset.headers = meta["headers"]
+        dataset.set_float_columns(arrays, meta["rows"])
+        return dataset
+
+    def clear(self):
+        """
+        Удаление всех записей кэша.
+        """
+        with self._lock:
+            shutil.rmtree(self.directory, ignore_errors=True)
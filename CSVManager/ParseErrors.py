@@ -0,0 +1,249 @@
+import bisect
+import copy
+import threading
+from array import array
+
+from CSVManager import Compression
+
+# Политики обработки ошибочных строк
+ON_ERROR_RAISE = 'raise'
+ON_ERROR_SKIP = 'skip'
+ON_ERROR_NAN = 'nan'
+ON_ERROR_QUARANTINE = 'quarantine'
+
+ON_ERROR_POLICIES = (ON_ERROR_RAISE, ON_ERROR_SKIP, ON_ERROR_NAN, ON_ERROR_QUARANTINE)
+
+# Причины ошибок
+REASON_FIELD_COUNT = 0
+REASON_NOT_A_NUMBER = 1
+REASON_EMPTY_VALUE = 2
+
+REASONS = {
+    REASON_FIELD_COUNT: "неверное количество полей",
+    REASON_NOT_A_NUMBER: "не число",
+    REASON_EMPTY_VALUE: "пустое значение",
+}
+
+
+class ParseErrorIndex:
+    """
+    Компактный индекс ошибочных строк файла.
+
+    Хранит номера строк, байтовые смещения, коды причин и номера столбцов в
+    массивах array, поэтому миллионы ошибок занимают десятки мегабайт, а не
+    гигабайты объектов. Смещения вычисляются отдельным проходом по файлу
+    только при наличии ошибок, чтобы не замедлять разбор.
+
+    Индекс набора из нескольких файлов (см. ShardedDataset) хранит и файл
+    каждой ошибки: номера строк и смещения в нём относятся к этому файлу.
+    """
+
+    def __init__(self, quarantine_limit=100000):
+        """
+        :param quarantine_limit: Максимальное количество сохраняемых ошибочных строк.
+        """
+        self.lines = array('q')
+        self.offsets = array('q')
+        self.reasons = array('b')
+        self.columns = array('h')
+        self.column_names = []
+        # Файлы ошибок из других файлов: номер в files, -1 - ошибка в основном файле
+        self.file_ids = array('h')
+        self.files = []
+        self.quarantine = []
+        self.quarantine_limit = quarantine_limit
+        # Номер строки файла с первой строкой данных
+        self.first_data_line = 2
+
+        self._skipped_lines = array('q')
+        # Номера строк данных файла, прошедших фильтр строк (None - фильтра нет)
+        self.kept_rows = None
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.lines)
+
+    def __getstate__(self):
+        # Индекс передаётся между процессами без блокировки
+        state = dict(self.__dict__)
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _name_index(names, name):
+        if name is None:
+            return -1
+        if name not in names:
+            names.append(name)
+        return names.index(name)
+
+    def add(self, line, reason, column=None, raw=None, skipped=False, file=None):
+        """
+        Запись ошибки.
+
+        :param line: Номер строки файла (с единицы).
+        :param reason: Код причины.
+        :param column: Название столбца, если ошибка в конкретном значении.
+        :param raw: Текст строки для карантина.
+        :param skipped: Строка исключена из данных.
+        :param file: Путь к файлу, если ошибка не в основном файле индекса.
+        :return:
+        """
+        with self._lock:
+            self.lines.append(line)
+            self.offsets.append(-1)
+            self.reasons.append(reason)
+            self.columns.append(self._name_index(self.column_names, column))
+            self.file_ids.append(self._name_index(self.files, file))
+            if skipped:
+                self._skipped_lines.append(line)
+            if raw is not None and len(self.quarantine) < self.quarantine_limit:
+                self.quarantine.append((line, raw))
+
+    def merge(self, other, file):
+        """
+        Добавление ошибок индекса другого файла, например, части набора.
+
+        :param other: ParseErrorIndex файла.
+        :param file: Путь к файлу.
+        :return:
+        """
+        with self._lock:
+            file_id = self._name_index(self.files, file)
+            self.lines.extend(other.lines)
+            self.offsets.extend(other.offsets)
+            self.reasons.extend(other.reasons)
+            self.columns.extend(self._name_index(self.column_names, other.column_names[column])
+                                if column >= 0 else -1 for column in other.columns)
+            self.file_ids.extend([file_id] * len(other))
+            room = max(self.quarantine_limit - len(self.quarantine), 0)
+            self.quarantine.extend(other.quarantine[:room])
+
+    def skip_line(self, line):
+        """
+        Учёт строки файла без данных (например, пустой) для сопоставления строк данных и файла.
+        """
+        with self._lock:
+            self._skipped_lines.append(line)
+
+    def keep_rows(self, rows):
+        """
+        Учёт строк данных, прошедших фильтр: строки набора данных нумеруются только по ним.
+
+        :param rows: Номера строк данных файла (с нуля) по возрастанию.
+        """
+        with self._lock:
+            if self.kept_rows is None:
+                self.kept_rows = array('q')
+            self.kept_rows.extend(rows)
+
+    def subset(self, rows):
+        """
+        Копия индекса для набора из части строк (например, при уточнении фильтра).
+
+        :param rows: Номера оставляемых строк данных текущей нумерации.
+        :return: ParseErrorIndex.
+        """
+        with self._lock:
+            subset = copy.deepcopy(self)
+        kept = self.kept_rows
+        subset.kept_rows = array('q', (kept[row] for row in rows) if kept is not None else rows)
+        return subset
+
+    def row_to_line(self, row):
+        """
+        Номер строки файла для строки данных с учётом исключённых строк.
+        Для записей, занимающих несколько строк файла, номер приблизительный.
+
+        :param row: Номер строки данных (с нуля).
+        :return: Номер строки файла.
+        """
+        if self.kept_rows is not None:
+            row = self.kept_rows[row]
+        line = self.first_data_line + row
+        # Каждая исключённая строка до искомой сдвигает номер на единицу
+        skipped = 0
+        while True:
+            shifted = bisect.bisect_right(self._skipped_lines, line + skipped)
+            if shifted == skipped:
+                return line + skipped
+            skipped = shifted
+
+    def entry(self, i):
+        """
+        Запись индекса.
+
+        :param i: Номер записи.
+        :return: Кортеж (строка, смещение, причина, столбец, файл).
+        """
+        column, file = self.columns[i], self.file_ids[i]
+        return (self.lines[i], self.offsets[i], REASONS[self.reasons[i]],
+                self.column_names[column] if column >= 0 else "", self.files[file] if file >= 0 else "")
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.entry(i)
+
+    def summary(self):
+        """
+        Количество ошибок по причинам.
+
+        :return: Словарь {причина: количество}.
+        """
+        counts = {}
+        for reason in self.reasons:
+            counts[REASONS[reason]] = counts.get(REASONS[reason], 0) + 1
+        return counts
+
+    def resolve_offsets(self, file_path, compression=None, block_size=1 << 22):
+        """
+        Вычисление байтовых смещений начала ошибочных строк одним проходом по каждому файлу.
+        Для сжатых файлов смещения считаются в распакованных данных.
+
+        :param file_path: Путь к основному файлу, None - только ошибки других файлов (см. merge).
+        :param compression: Формат сжатия основного файла.
+        :param block_size: Размер читаемого блока.
+        :return:
+        """
+        if file_path is not None:
+            self._resolve_file_offsets(-1, file_path, compression, block_size)
+        for file_id, path in enumerate(list(self.files)):
+            self._resolve_file_offsets(file_id, path, None, block_size)
+
+    def _resolve_file_offsets(self, file_id, file_path, compression, block_size):
+        with self._lock:
+            pending = sorted((line, i) for i, line in enumerate(self.lines)
+                             if self.offsets[i] < 0 and self.file_ids[i] == file_id)
+        if not pending:
+            return
+
+        line, offset, position = 1, 0, 0
+        with Compression.open_binary(file_path, compression) as file:
+            while position < len(pending):
+                block = file.read(block_size)
+                if not block:
+                    break
+                # Блок без искомых строк пропускаем целиком
+                newlines = block.count(b'\n')
+                if pending[position][0] > line + newlines:
+                    line += newlines
+                    offset += len(block)
+                    continue
+
+                start = 0
+                while position < len(pending):
+                    target, i = pending[position]
+                    if target == line:
+                        self.offsets[i] = offset + start
+                        position += 1
+                        continue
+                    newline = block.find(b'\n', start)
+                    if newline < 0:
+                        break
+                    start = newline + 1
+                    line += 1
+                offset += len(block)
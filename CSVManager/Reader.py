@@ -1,21 +1,43 @@
+import codecs
 import csv
 import os
+from itertools import chain, compress, islice, repeat
+
+import numpy as np
+
+from CSVManager import Compression, Tokenizer
+from CSVManager.ParseErrors import (ParseErrorIndex, ON_ERROR_RAISE, ON_ERROR_SKIP, ON_ERROR_QUARANTINE,
+                                    ON_ERROR_POLICIES, REASON_FIELD_COUNT)
 
 class Reader:
-    def __init__(self, file_path, delimiter=None, encoding=None):
+    # Разбор файлов без кавычек разбиением блоков строк по разделителю (см. Tokenizer)
+    fast_tokenizer = True
+
+    def __init__(self, file_path, delimiter=None, encoding=None, on_error=ON_ERROR_RAISE):
         """
         Конструктор ридера CSV файлов.
 
         :param file_path: Путь к файлу.
         :param delimiter:  Разделитель полей, для автоматического определения оставить None.
         :param encoding: Кодировка файла, для автоматического определения оставить None.
+        :param on_error: Обработка ошибочных строк в iter_chunks: 'raise' - остановить чтение,
+            'skip' - пропустить, 'nan' - дополнить пустыми значениями, 'quarantine' - пропустить
+            и сохранить текст строки. Ошибки записываются в self.errors.
         """
+        if on_error not in ON_ERROR_POLICIES:
+            raise ValueError(f"Неизвестная политика обработки ошибок: {on_error}")
         self.file_path = file_path
         self.delimiter = delimiter
         self.encoding = encoding
         self._detected_encoding = None
         self._detected_delimiter = None
         self._has_sep_line = False
+        # В образце файла нет кавычек: строки разбираются без модуля csv
+        self.quote_free = False
+        self.compression = None
+        self.headers = []
+        self.on_error = on_error
+        self.errors = ParseErrorIndex()
 
     def detect_encoding(self, sample):
         """
@@ -26,7 +48,9 @@ class Reader:
         encodings_to_try = ['utf-8', 'cp1251', 'latin1', 'iso-8859-1', 'utf-16', 'utf-16le', 'utf-16be']
         for encoding in encodings_to_try:
             try:
-                sample.decode(encoding)
+                # Образец обрезан и может заканчиваться на середине многобайтного символа:
+                # неполный хвост декодер без final=True не считает ошибкой
+                codecs.getincrementaldecoder(encoding)().decode(sample)
                 return encoding
             except (UnicodeDecodeError, LookupError):
                 continue
@@ -51,9 +75,9 @@ class Reader:
         """
         Автоматически определяет кодировку и разделитель
         """
-        # Читаем первые 1024 байт файла
-        with open(self.file_path, 'rb') as file:
-            sample_bytes = file.read(1024)
+        # Читаем первые 1024 байт файла (для сжатых файлов - распакованных)
+        self.compression = Compression.detect_file_compression(self.file_path)
+        sample_bytes = Compression.read_head(self.file_path, 1024, self.compression)
 
         # Определяем кодировку
         if not self.encoding:
@@ -69,6 +93,7 @@ class Reader:
 
         lines = sample_text.splitlines()
         self._has_sep_line = False  # Сбрасываем флаг
+        self.quote_free = not Tokenizer.has_quotes([sample_text])
 
         # Проверяем наличие строки с sep=
         if lines:
@@ -93,6 +118,12 @@ class Reader:
             else:
                 self._detected_delimiter = ','
 
+    def _open_text(self):
+        """
+        Открывает файл как текст с учётом определённых кодировки и сжатия.
+        """
+        return Compression.open_text(self.file_path, self._detected_encoding, self.compression)
+
     def read(self):
         """
         Считывает CSV-файл и возвращает данные
@@ -104,7 +135,7 @@ class Reader:
         self.auto_detect_parameters()
 
         try:
-            with open(self.file_path, 'r', encoding=self._detected_encoding) as file:
+            with self._open_text() as file:
                 # Пропускаем строку с sep= при ее наличии
                 if self._has_sep_line:
                     next(file)
@@ -129,7 +160,7 @@ class Reader:
         self.auto_detect_parameters()
 
         try:
-            with open(self.file_path, 'r', encoding=self._detected_encoding) as file:
+            with self._open_text() as file:
                 # Пропускаем строку с sep= при ее наличии
                 if self._has_sep_line:
                     next(file)
@@ -148,6 +179,168 @@ class Reader:
         except Exception as e:
             raise RuntimeError(f"Ошибка при чтении CSV: {str(e)}")
 
+    def iter_chunks(self, chunk_rows=100000, first_chunk_rows=None, columns=None, row_filter=None):
+        """
+        Считывает CSV-файл блоками строк в виде столбцов.
+        Не загружает весь файл в память.
+
+        :param chunk_rows: Количество строк в блоке.
+        :param first_chunk_rows: Количество строк в первом блоке, чтобы первые данные были готовы быстрее.
+        :param columns: Считываемые столбцы, None - все.
+        :param row_filter: Фильтр строк (RowFilter): условия вычисляются по каждому блоку,
+            в столбцы попадают только прошедшие строки. Блоки считаются до фильтрации,
+            поэтому могут быть меньше chunk_rows и даже пустыми.
+        :return: Генератор словарей {название столбца: список значений}.
+        """
+        if not os.path.exists(self.file_path):
+            raise FileNotFoundError(f"Файл не найден: {self.file_path}")
+
+        # Автоматическое определение параметров
+        self.auto_detect_parameters()
+
+        try:
+            with self._open_text() as file:
+                # Пропускаем строку с sep= при ее наличии
+                if self._has_sep_line:
+                    next(file)
+
+                header = file.readline()
+                quote_free = self.fast_tokenizer and self.quote_free and not Tokenizer.has_quotes([header])
+                if quote_free:
+                    header = header.rstrip('\r\n')
+                    self.headers = header.split(self._detected_delimiter) if header else []
+                    header_lines = 1 if header else 0
+                else:
+                    reader = csv.reader(chain([header], file), delimiter=self._detected_delimiter)
+                    self.headers = next(reader, [])
+                    header_lines = reader.line_num
+                names = self.headers if columns is None else list(columns)
+                indexes = [self.headers.index(name) for name in names]
+                width = len(self.headers)
+                wanted = set(indexes)
+                if row_filter:
+                    missing = [name for name in row_filter.columns if name not in self.headers]
+                    if missing:
+                        raise ValueError(f"нет столбца {missing[0]!r} для фильтра строк")
+                    wanted.update(self.headers.index(name) for name in row_filter.columns)
+                    # Количество строк данных, прочитанных до фильтрации
+                    self._data_rows = 0
+
+                line = header_lines + int(self._has_sep_line)
+                self.errors.first_data_line = line + 1
+
+                limits = chain([first_chunk_rows or chunk_rows], repeat(chunk_rows))
+                if quote_free:
+                    blocks = self._split_blocks(file, width, wanted, limits, line)
+                else:
+                    blocks = self._csv_blocks(file, width, limits, line)
+                for rows, fields in blocks:
+                    if row_filter:
+                        fields = self._filter_fields(rows, fields, row_filter)
+                    yield {name: fields[index] for name, index in zip(names, indexes)}
+
+        except Exception as e:
+            raise RuntimeError(f"Ошибка при чтении CSV: {str(e)}")
+
+    def _bad_row(self, row, width, line):
+        """
+        Обработка строки с неверным количеством полей согласно политике on_error.
+
+        :return: Исправленная строка или None, если строка исключается.
+        """
+        if self.on_error == ON_ERROR_RAISE:
+            raise ValueError(f"строка {line}: ожидалось полей {width}, найдено {len(row)}")
+
+        skipped = self.on_error in (ON_ERROR_SKIP, ON_ERROR_QUARANTINE)
+        raw = self._detected_delimiter.join(row) if self.on_error == ON_ERROR_QUARANTINE else None
+        self.errors.add(line, REASON_FIELD_COUNT, raw=raw, skipped=skipped)
+        if skipped:
+            return None
+        # Недостающие поля пустые, лишние отбрасываются
+        return (row + [''] * width)[:width]
+
+    def _csv_rows(self, lines, width, line):
+        """
+        Разбор строк модулем csv с обработкой ошибочных строк.
+
+        :param lines: Итератор строк текста.
+        :param width: Количество полей в строке.
+        :param line: Номер строки файла, предшествующей первой строке lines.
+        :return: Генератор списков полей.
+        """
+        reader = csv.reader(lines, delimiter=self._detected_delimiter)
+        for row in reader:
+            if not row:
+                # Пустые строки пропускаются, как в DictReader
+                self.errors.skip_line(line + reader.line_num)
+                continue
+            if len(row) != width:
+                row = self._bad_row(row, width, line + reader.line_num)
+                if row is None:
+                    continue
+            yield row
+
+    def _csv_blocks(self, lines, width, limits, line):
+        """
+        Блоки строк, разобранные модулем csv.
+
+        :param limits: Итератор количества строк в блоках.
+        :return: Генератор кортежей (количество строк, список столбцов).
+        """
+        limit = next(limits)
+        rows = []
+        for row in self._csv_rows(lines, width, line):
+            rows.append(row)
+            if len(rows) >= limit:
+                yield len(rows), self._transpose(rows, width)
+                rows = []
+                limit = next(limits)
+        if rows:
+            yield len(rows), self._transpose(rows, width)
+
+    def _split_blocks(self, file, width, wanted, limits, line):
+        """
+        Блоки строк файла без кавычек, разбитые по разделителю целиком (см. Tokenizer.split_lines).
+        Блок с ошибочными строками разбирается модулем csv, а с первых кавычек
+        весь остаток файла.
+
+        :return: Генератор кортежей (количество строк, список столбцов).
+        """
+        for limit in limits:
+            lines = list(islice(file, limit))
+            if not lines:
+                return
+            if Tokenizer.has_quotes(lines):
+                yield from self._csv_blocks(chain(lines, file), width, chain([limit], limits), line)
+                return
+            fields = Tokenizer.split_lines(lines, self._detected_delimiter, width, wanted)
+            if fields is not None:
+                yield len(lines), fields
+            else:
+                rows = list(self._csv_rows(lines, width, line))
+                if rows:
+                    yield len(rows), self._transpose(rows, width)
+            line += len(lines)
+
+    def _filter_fields(self, rows, fields, row_filter):
+        """
+        Отбор строк блока по фильтру: условия вычисляются по столбцам блока.
+
+        :return: Список столбцов из прошедших строк.
+        """
+        conditions = {name: fields[self.headers.index(name)] for name in row_filter.columns}
+        mask = row_filter.mask(conditions)
+        self.errors.keep_rows((np.flatnonzero(mask) + self._data_rows).tolist())
+        self._data_rows += rows
+        mask = mask.tolist()
+        return [None if values is None else list(compress(values, mask)) for values in fields]
+
+    @staticmethod
+    def _transpose(rows, width):
+        if not rows:
+            return [[] for _ in range(width)]
+        return [list(values) for values in zip(*rows)]
+
     # Пример использования
 
 if __name__ == "__main__":
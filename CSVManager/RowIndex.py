@@ -0,0 +1,156 @@
+import csv
+import io
+import threading
+from array import array
+from collections import OrderedDict
+
+import numpy as np
+
+
+class SparseRowIndex:
+    """
+    Разреженный индекс строк файла: байтовое смещение каждой step-й строки данных.
+
+    Строится одним проходом по файлу блоками, поэтому для файла в 10 ГБ и
+    шаге 1024 занимает сотни килобайт. Строкой считается физическая строка
+    файла: значения в кавычках с переводами строк индекс не различает.
+    """
+
+    def __init__(self, file_path, step=1024, skip_lines=1):
+        """
+        :param file_path: Путь к несжатому файлу.
+        :param step: Шаг индекса в строках.
+        :param skip_lines: Количество строк перед данными (заголовок, строка sep=).
+        """
+        self.file_path = file_path
+        self.step = step
+        self.skip_lines = skip_lines
+        self.offsets = array('q')
+        self.row_count = 0
+        self.file_size = 0
+        self.complete = False
+        self._lock = threading.Lock()
+
+    def build(self, block_size=1 << 22, on_progress=None, is_cancelled=None):
+        """
+        Построение индекса.
+
+        :param block_size: Размер читаемого блока.
+        :param on_progress: Вызывается с количеством проиндексированных строк после каждого блока.
+        :param is_cancelled: Функция без аргументов, True - прервать построение.
+        :return: False, если построение прервано.
+        """
+        with open(self.file_path, 'rb') as file:
+            # Начало данных - после строк заголовка
+            for _ in range(self.skip_lines):
+                file.readline()
+            position = file.tell()
+            # Номер строки, которой начинается следующий блок, и начало текущей строки
+            rows = 0
+            line_start = position
+
+            while True:
+                if is_cancelled is not None and is_cancelled():
+                    return False
+                block = file.read(block_size)
+                if not block:
+                    break
+                newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 10)
+                # Начала строк блока: текущая незаконченная строка и строки после каждого перевода
+                starts = np.concatenate(([line_start], position + newlines + 1))
+                # Последнее начало - начало ещё не прочитанной строки
+                first = (-rows) % self.step
+                indexed = starts[:-1][first::self.step]
+                with self._lock:
+                    self.offsets.extend(indexed.tolist())
+                    rows += len(newlines)
+                    self.row_count = rows
+                line_start = int(starts[-1])
+                position += len(block)
+                if on_progress is not None:
+                    on_progress(rows)
+
+            # Последняя строка без перевода строки в конце файла
+            if position > line_start:
+                with self._lock:
+                    if rows % self.step == 0:
+                        self.offsets.append(line_start)
+                    rows += 1
+                    self.row_count = rows
+            self.file_size = position
+        self.complete = True
+        return True
+
+    def block_range(self, block):
+        """
+        Байтовые границы блока строк.
+
+        :param block: Номер блока (строки [block * step, (block + 1) * step)).
+        :return: Кортеж (начало, конец), конец None - до конца файла.
+        """
+        with self._lock:
+            start = self.offsets[block]
+            stop = self.offsets[block + 1] if block + 1 < len(self.offsets) else None
+        if stop is None and self.complete:
+            stop = self.file_size
+        return start, stop
+
+
+class RowBlockCache:
+    """
+    Чтение произвольных строк файла по разреженному индексу с LRU-кэшем
+    разобранных блоков. Память ограничена cache_blocks * step строк.
+    """
+
+    def __init__(self, index, encoding='utf-8', delimiter=',', cache_blocks=64):
+        """
+        :param index: SparseRowIndex.
+        :param encoding: Кодировка файла.
+        :param delimiter: Разделитель полей.
+        :param cache_blocks: Количество хранимых блоков.
+        """
+        self.index = index
+        self.encoding = encoding
+        self.delimiter = delimiter
+        self.cache_blocks = cache_blocks
+        self._blocks = OrderedDict()
+        self._file = None
+
+    def row(self, row):
+        """
+        Строка данных файла.
+
+        :param row: Номер строки данных (с нуля).
+        :return: Список значений.
+        """
+        block_number, offset = divmod(row, self.index.step)
+        block = self._blocks.get(block_number)
+        if block is None:
+            block = self._read_block(block_number)
+        else:
+            self._blocks.move_to_end(block_number)
+        return block[offset] if offset < len(block) else []
+
+    def _read_block(self, block_number):
+        start, stop = self.index.block_range(block_number)
+        if self._file is None:
+            self._file = open(self.index.file_path, 'rb')
+        self._file.seek(start)
+        if stop is None:
+            # Конец блока ещё не проиндексирован - читаем ровно step строк
+            data = b"".join(self._file.readline() for _ in range(self.index.step))
+        else:
+            data = self._file.read(stop - start)
+
+        text = data.decode(self.encoding, errors='replace')
+        block = list(csv.reader(io.StringIO(text, newline=''), delimiter=self.delimiter))
+        self._blocks[block_number] = block
+        if len(self._blocks) > self.cache_blocks:
+            self._blocks.popitem(last=False)
+        return block
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._blocks.clear()
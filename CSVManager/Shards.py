@@ -0,0 +1,204 @@
+import bisect
+import glob
+import os
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+from CSVManager.Dataset import Dataset, file_fingerprint
+from CSVManager.Filters import RowFilter
+from CSVManager.ParseErrors import ON_ERROR_NAN, ON_ERROR_QUARANTINE, ON_ERROR_RAISE, REASON_EMPTY_VALUE, \
+    REASON_NOT_A_NUMBER
+from CSVManager.Reader import Reader
+
+# Расширения файлов-частей при открытии папки
+SHARD_EXTENSIONS = ('.csv', '.csv.gz', '.csv.bz2', '.csv.xz', '.csv.zst')
+
+
+def is_shard_source(source):
+    """
+    Проверка, что путь задаёт набор файлов: папку или шаблон glob.
+    """
+    return os.path.isdir(source) or glob.has_magic(source)
+
+
+def expand_shards(source):
+    """
+    Список файлов-частей в порядке имён.
+
+    :param source: Папка (берутся файлы с расширениями SHARD_EXTENSIONS) или шаблон glob.
+    :return: Список путей.
+    """
+    if os.path.isdir(source):
+        paths = [os.path.join(source, name) for name in os.listdir(source)
+                 if name.lower().endswith(SHARD_EXTENSIONS)]
+    else:
+        paths = glob.glob(source)
+    paths = sorted(path for path in paths if os.path.isfile(path))
+    if not paths:
+        raise FileNotFoundError(f"Нет CSV файлов: {source}")
+    return paths
+
+
+def preview_path(source):
+    """
+    Файл для предпросмотра: сам файл или первая часть набора.
+    """
+    return expand_shards(source)[0] if is_shard_source(source) else source
+
+
+def _parse_shard(path, delimiter, encoding, on_error, chunk_rows, conditions=()):
+    """
+    Разбор одной части в процессе пула.
+
+    :param conditions: Условия фильтра строк (в процесс передаются тексты, а не RowFilter).
+    :return: Кортеж (заголовки, блоки, индекс ошибок).
+    """
+    reader = Reader(path, delimiter, encoding, on_error)
+    chunks = list(reader.iter_chunks(chunk_rows, row_filter=RowFilter(conditions)))
+    return reader.headers, chunks, reader.errors
+
+
+class ShardedDataset(Dataset):
+    """
+    Набор файлов с одинаковыми заголовками (например, суточные части) как одна таблица.
+
+    Параметры разбора определяются один раз по первой части, части разбираются
+    параллельно и добавляются блоками в порядке имён: столбцы склеиваются
+    списком блоков, без промежуточных копий. Ошибки разбора частей и ошибки
+    значений попадают в общий индекс errors с путём части и номером строки в ней,
+    индексы частей - в shard_errors.
+    """
+
+    def __init__(self, source, encoding=None, delimiter=None, on_error=ON_ERROR_NAN, row_filter=None):
+        """
+        :param source: Папка или шаблон glob.
+        :param encoding: Кодировка файлов.
+        :param delimiter: Разделитель полей.
+        :param on_error: Политика обработки ошибок (см. Reader).
+        :param row_filter: Фильтр строк (RowFilter), применяется при разборе каждой части.
+        """
+        self.shards = expand_shards(source)
+        super().__init__(source, encoding, delimiter, on_error, row_filter=row_filter)
+        # Номер первой строки каждой части в общей таблице
+        self.shard_starts = []
+        # Части и индексы их ошибок в порядке разбора, по ним строки таблицы сопоставляются строкам частей
+        self.shard_errors = []
+        self._parsed_starts = self.shard_starts
+
+    def _fingerprint(self):
+        # Набор считается изменённым и при появлении новых частей
+        return tuple((path, file_fingerprint(path)) for path in expand_shards(self.file_path))
+
+    def load(self, chunk_rows=100000, workers=None, on_chunk=None, is_cancelled=None):
+        """
+        Разбор всех частей.
+
+        Разбор CSV упирается в GIL, поэтому при нескольких ядрах части
+        разбираются в пуле процессов, а на одном ядре - по очереди в текущем потоке.
+
+        :param chunk_rows: Размер блока в строках.
+        :param workers: Количество процессов, по умолчанию по числу ядер.
+        :param on_chunk: Вызывается после добавления каждого блока.
+        :param is_cancelled: Функция без аргументов, True - прервать разбор.
+        :return: False, если разбор прерван.
+        """
+        is_cancelled = is_cancelled or (lambda: False)
+        first = Reader(self.shards[0], self.delimiter, self.encoding, self.on_error)
+        first.auto_detect_parameters()
+        self.encoding = first._detected_encoding
+        self.delimiter = first._detected_delimiter
+        total_size = sum(os.path.getsize(path) for path in self.shards)
+        conditions = self.row_filter.conditions if self.row_filter else ()
+        args = (self.delimiter, self.encoding, self.on_error, chunk_rows, conditions)
+
+        workers = min(workers or os.cpu_count() or 1, len(self.shards))
+        executor = None
+        if workers > 1:
+            # forkserver: дочерние процессы не наследуют потоки Qt; в Windows его нет, там - spawn
+            method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            executor = ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context(method))
+            results = [executor.submit(_parse_shard, path, *args) for path in self.shards]
+        else:
+            results = self.shards
+
+        try:
+            for path, result in zip(self.shards, results):
+                if is_cancelled():
+                    return False
+                headers, chunks, errors = result.result() if executor else _parse_shard(path, *args)
+                if self.headers and headers != self.headers:
+                    raise ValueError(f"заголовки {os.path.basename(path)} не совпадают с первой частью")
+                self.headers = headers
+                self.shard_starts.append(self.row_count)
+                self.shard_errors.append((path, errors))
+                self.errors.merge(errors, path)
+                for chunk in chunks:
+                    # С фильтром число строк по размеру файлов не оценить, буферы растут удвоением
+                    if self.expected_rows is None and not self.row_filter:
+                        self.expected_rows = self._estimate_rows(chunk, total_size)
+                    self.append_chunk(chunk)
+                    if on_chunk is not None:
+                        on_chunk(self)
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+        self.complete = True
+        return True
+
+    def filtered(self, row_filter):
+        dataset = super().filtered(row_filter)
+        # Части начинаются с границы блока, новые границы - начала тех же блоков
+        with self._lock:
+            first_chunks = [bisect.bisect_left(self._chunk_starts, start) for start in self.shard_starts]
+        starts = dataset._chunk_starts + [dataset.row_count]
+        dataset.shard_starts = [starts[min(index, len(starts) - 1)] for index in first_chunks]
+        dataset.shard_errors = list(self.shard_errors)
+        dataset._parsed_starts = self._parsed_starts
+        return dataset
+
+    def _shard_line(self, row):
+        """
+        Часть и номер строки в ней для строки таблицы.
+
+        :param row: Номер строки (с нуля).
+        :return: Кортеж (путь или None, если части не разбирались, номер строки файла).
+        """
+        # Строки уточнённого фильтром набора нумеруются через строки разобранного
+        kept = self.errors.kept_rows
+        if kept is not None:
+            row = kept[row]
+        if not self.shard_errors:
+            return None, row + 2
+        index = max(bisect.bisect_right(self._parsed_starts, row) - 1, 0)
+        path, errors = self.shard_errors[index]
+        return path, errors.row_to_line(row - self._parsed_starts[index])
+
+    def _record_bad_values(self, name, chunk, chunk_start, bad):
+        for i in bad:
+            path, line = self._shard_line(chunk_start + i)
+            value = chunk[name][i]
+            if self.on_error == ON_ERROR_RAISE:
+                raise ValueError(f"{os.path.basename(path or self.file_path)}, строка {line}, "
+                                 f"столбец {name}: не число {value!r}")
+
+            reason = REASON_EMPTY_VALUE if not value.strip() else REASON_NOT_A_NUMBER
+            raw = None
+            if self.on_error == ON_ERROR_QUARANTINE:
+                raw = (self.delimiter or ",").join(column[i] for column in chunk.values())
+            self.errors.add(line, reason, column=name, raw=raw, file=path)
+
+    @staticmethod
+    def _estimate_rows(chunk, total_size):
+        rows = len(next(iter(chunk.values()), []))
+        chars = sum(len(value) + 1 for values in chunk.values() for value in values)
+        return int(total_size / (chars / rows) * 1.1) if rows else None
+
+    def shard_of_row(self, row):
+        """
+        Файл-часть, в которой находится строка общей таблицы.
+
+        :param row: Номер строки (с нуля).
+        :return: Кортеж (путь, номер строки данных в части).
+        """
+        index = max(bisect.bisect_right(self.shard_starts, row) - 1, 0)
+        return self.shards[index], row - self.shard_starts[index]
@@ -0,0 +1,49 @@
+from itertools import repeat
+from operator import methodcaller
+
+# Символ кавычек CSV: строки с ним разбираются модулем csv
+QUOTE = '"'
+
+
+def has_quotes(lines):
+    """
+    Есть ли в строках кавычки, при которых нужен полный разбор CSV.
+    """
+    return any(map(str.__contains__, lines, repeat(QUOTE)))
+
+
+def split_lines(lines, delimiter, width, wanted=None):
+    """
+    Разбиение строк без кавычек на столбцы одним разбиением всего блока.
+
+    Строки склеиваются, концы строк заменяются разделителем, и весь блок
+    разбивается одним вызовом str.split; столбцы - срезы с шагом width.
+    Подходит только для блока, где в каждой строке ровно width полей:
+    количество разделителей проверяется для всех строк сразу.
+
+    :param lines: Строки текста с символами конца строки, без кавычек.
+    :param delimiter: Разделитель полей.
+    :param width: Количество полей в строке.
+    :param wanted: Номера нужных столбцов, None - все.
+    :return: Список столбцов (списки строк, None для ненужных) или None, если в блоке
+        есть пустые строки, строки с другим количеством полей или одиночный '\\r'.
+    """
+    if not lines or width < 1:
+        return None
+    counts = list(map(str.count, lines, repeat(delimiter)))
+    if counts.count(width - 1) != len(counts):
+        return None
+    # Пустая строка при одном столбце проходит проверку количества разделителей, в том числе последняя
+    if width == 1 and not all(map(methodcaller('strip', '\r\n'), lines)):
+        return None
+
+    text = ''.join(lines)
+    if '\r' in text:
+        text = text.replace('\r\n', '\n')
+        if '\r' in text:
+            return None
+    if text.endswith('\n'):
+        text = text[:-1]
+
+    fields = text.replace('\n', delimiter).split(delimiter)
+    return [fields[index::width] if wanted is None or index in wanted else None for index in range(width)]
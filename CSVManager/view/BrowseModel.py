@@ -0,0 +1,90 @@
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt, QThread, Signal
+
+from CSVManager.RowIndex import SparseRowIndex, RowBlockCache
+
+
+class RowIndexThread(QThread):
+    """
+    Поток построения разреженного индекса строк.
+    Прерывается через requestInterruption().
+    """
+    progress = Signal(int)
+    index_built = Signal()
+    error_occurred = Signal(str)
+
+    def __init__(self, index):
+        super().__init__()
+        self.index = index
+
+    def run(self):
+        try:
+            if self.index.build(on_progress=self.progress.emit, is_cancelled=self.isInterruptionRequested):
+                self.progress.emit(self.index.row_count)
+                self.index_built.emit()
+        except OSError as e:
+            self.error_occurred.emit(str(e))
+
+
+class BrowseTableModel(QAbstractTableModel):
+    """
+    Модель таблицы всего файла без его загрузки.
+
+    Строки читаются блоками по разреженному индексу при прокрутке к ним,
+    разобранные блоки хранятся в LRU-кэше. Количество строк растёт по мере
+    построения индекса.
+    """
+
+    def __init__(self, file_path, headers, encoding, delimiter, skip_lines=1, parent=None):
+        """
+        :param file_path: Путь к несжатому файлу.
+        :param headers: Заголовки столбцов.
+        :param encoding: Кодировка файла.
+        :param delimiter: Разделитель полей.
+        :param skip_lines: Количество строк перед данными.
+        :param parent: Родительский объект.
+        """
+        super().__init__(parent)
+        self.headers = headers
+        # Не index: это имя метода QAbstractItemModel
+        self.row_index = SparseRowIndex(file_path, skip_lines=skip_lines)
+        self.cache = RowBlockCache(self.row_index, encoding, delimiter)
+        self._rows = 0
+
+        self.index_thread = RowIndexThread(self.row_index)
+        self.index_thread.progress.connect(self._on_progress)
+
+    def start(self):
+        self.index_thread.start(QThread.LowPriority)
+
+    def close(self):
+        """
+        Остановка построения индекса и освобождение файла.
+        """
+        self.index_thread.requestInterruption()
+        self.index_thread.wait()
+        self.cache.close()
+
+    def _on_progress(self, rows):
+        if rows > self._rows:
+            self.beginInsertRows(QModelIndex(), self._rows, rows - 1)
+            self._rows = rows
+            self.endInsertRows()
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self._rows
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        row = self.cache.row(index.row())
+        return row[index.column()] if index.column() < len(row) else None
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.headers[section] if section < len(self.headers) else None
+        return str(section + 1)
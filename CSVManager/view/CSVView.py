@@ -1,44 +1,84 @@
+import os
 import sys
 from PySide6.QtWidgets import (QApplication, QMainWindow, QTableView, QHeaderView,
                                QFileDialog, QMessageBox, QMenu, QProgressBar, QStatusBar,
                                QVBoxLayout, QWidget, QLabel, QHBoxLayout, QScrollArea)
 from PySide6.QtGui import QAction, QStandardItemModel, QStandardItem
-from PySide6.QtCore import QSettings, QThread, Signal
+from PySide6.QtCore import QSettings
 
+from CSVManager import Compression
+from CSVManager.Jobs import Job, JobScheduler, PRIORITY_PREFETCH, PRIORITY_PREVIEW
+from CSVManager.Loading import load_dataset
+from CSVManager.ParseErrors import ON_ERROR_NAN
 from CSVManager.Reader import Reader as CSVReader
-
-
-class CSVLoaderThread(QThread):
-    """Поток для загрузки CSV данных с использованием Reader класса"""
-    data_loaded = Signal(list, list)
-    solid_data_loaded = Signal(list)
-    error_occurred = Signal(str)
-
-    def __init__(self, file_path, delimiter=None, encoding=None):
-        super().__init__()
+from CSVManager.Shards import is_shard_source
+from CSVManager.view.BrowseModel import BrowseTableModel
+
+
+def read_table(job, file_path, encoding=None, rows=None):
+    """
+    Задача чтения таблицы для предпросмотра с использованием Reader класса.
+
+    :param job: Задача планировщика (Job).
+    :param file_path: Путь к файлу.
+    :param encoding: Кодировка, None - определить.
+    :param rows: Количество строк, None - весь файл.
+    :return: Словарь: headers, rows, data, encoding, delimiter. Кодировка и разделитель
+        передаются вместе с данными, чтобы окно показывало параметры именно этого файла.
+    """
+    reader = CSVReader(file_path, encoding=encoding)
+    data = reader.read() if rows is None else reader.read_n(rows)
+    # Заголовки из первого элемента, строки - списки значений для таблицы
+    headers = list(data[0].keys()) if data else []
+    return {
+        "headers": headers,
+        "rows": [list(row.values()) for row in data],
+        "data": data,
+        "encoding": reader._detected_encoding,
+        "delimiter": reader._detected_delimiter,
+    }
+
+
+class CSVPrefetchJob(Job):
+    """
+    Задача фонового разбора всего файла в кэш наборов данных.
+
+    Ставится с приоритетом упреждающего разбора сразу после предпросмотра, пока
+    пользователь выбирает столбцы. Блоки передаются через progress, готовый
+    набор данных - через finished.
+    """
+
+    def __init__(self, file_path, delimiter=None, encoding=None, on_error=ON_ERROR_NAN,
+                 chunk_rows=100000, first_chunk_rows=10000, row_filter=None, priority=PRIORITY_PREFETCH):
+        super().__init__(priority=priority)
         self.file_path = file_path
         self.delimiter = delimiter
         self.encoding = encoding
+        self.on_error = on_error
+        # Фильтр строк (RowFilter), применяемый при разборе
+        self.row_filter = row_filter
+        self.chunk_rows = chunk_rows
+        self.first_chunk_rows = first_chunk_rows
+        self.dataset = None
+        # Столбцы, которые преобразуются в числа прямо в задаче по мере загрузки
+        self.float_columns = []
+        # Выражения производных столбцов, регистрируемые в наборе данных
+        self.derived_columns = []
 
     def run(self):
-        try:
-            reader = CSVReader(self.file_path, self.delimiter, self.encoding)
-            self.data = reader.read()
-            self.encoding = reader.encoding
-            self.delimiter = reader.delimiter
-            if self.data:
-                # Извлекаем заголовки из первого элемента
-                headers = list(self.data[0].keys())
-                # Преобразуем данные в список списков для таблицы
-                rows = [list(row.values()) for row in self.data]
-                self.data_loaded.emit(headers, rows)
-                self.solid_data_loaded.emit(self.data)
-            else:
-                self.data_loaded.emit([], [])
-                self.solid_data_loaded.emit([])
-
-        except Exception as e:
-            self.error_occurred.emit(str(e))
+        return load_dataset(self.file_path, self.delimiter, self.encoding, self.on_error, self.row_filter,
+                            self.chunk_rows, self.first_chunk_rows, on_start=self._on_start,
+                            on_chunk=self._on_chunk, is_cancelled=self.is_cancelled)
+
+    def _on_start(self, dataset):
+        self.dataset = dataset
+
+    def _on_chunk(self, dataset):
+        for text in list(self.derived_columns):
+            dataset.add_derived(text)
+        for name in list(self.float_columns):
+            dataset.float_column(name)
+        self.report(dataset)
 
 
 class CSVTableViewer(QMainWindow):
@@ -107,6 +147,13 @@ class CSVTableViewer(QMainWindow):
         self._load_settings()
 
         self._solid_data = []
+        self.file_name = None
+        self.browse_model = None
+        # Задача чтения таблицы: результат принимается только от последней из них
+        self.table_job = None
+        # Кодировка и разделитель загруженного файла
+        self.file_encoding = None
+        self.file_delimiter = None
 
     def _create_actions(self):
         """
@@ -128,20 +175,27 @@ class CSVTableViewer(QMainWindow):
         self.resize_columns_action.setShortcut("Ctrl+R")
         self.resize_columns_action.triggered.connect(self._resize_columns_to_contents)
 
+        # Действие для просмотра всего файла без загрузки
+        self.browse_action = QAction("Просмотр всего файла", self)
+        self.browse_action.setShortcut("Ctrl+B")
+        self.browse_action.setCheckable(True)
+        self.browse_action.toggled.connect(self._set_browse_mode)
+
     def _create_menus(self):
         """
         Создание панели меню.
         :return:
         """
         # Меню Файл
-        file_menu = self.menuBar().addMenu("Файл")
-        file_menu.addAction(self.open_action)
-        file_menu.addSeparator()
-        file_menu.addAction(self.exit_action)
+        self.file_menu = self.menuBar().addMenu("Файл")
+        self.file_menu.addAction(self.open_action)
+        self.file_menu.addSeparator()
+        self.file_menu.addAction(self.exit_action)
 
         # Меню Вид
         view_menu = self.menuBar().addMenu("Вид")
         view_menu.addAction(self.resize_columns_action)
+        view_menu.addAction(self.browse_action)
 
 
     def _create_status_bar(self):
@@ -174,7 +228,7 @@ class CSVTableViewer(QMainWindow):
         """
         file_name, _ = QFileDialog.getOpenFileName(
             self, "Открыть CSV файл", "",
-            "CSV Files (*.csv);;All Files (*)"
+            "CSV Files (*.csv *.csv.gz *.csv.bz2 *.csv.xz *.csv.zst);;All Files (*)"
         )
 
         if file_name:
@@ -191,12 +245,41 @@ class CSVTableViewer(QMainWindow):
         self.progress_bar.setVisible(True)
         self.status_bar.showMessage(f"Загрузка файла: {file_name}")
 
-        # Создать и запустить поток для загрузки CSV
-        self.loader_thread = CSVLoaderThread(file_name, encoding=self.encoding)
-        self.loader_thread.data_loaded.connect(self._on_data_loaded)
-        self.loader_thread.error_occurred.connect(self._on_load_error)
-        self.loader_thread.solid_data_loaded.connect(self.set_solid_data)
-        self.loader_thread.start()
+        self.file_name = file_name
+        self._submit_table_job(Job(read_table, file_name, self.encoding, priority=PRIORITY_PREVIEW))
+
+    def _submit_table_job(self, job):
+        """
+        Постановка задачи чтения таблицы вместо предыдущей, которая отменяется.
+        :param job: Задача с результатом read_table.
+        :return:
+        """
+        self._cancel_table_job()
+        self.table_job = job
+        job.finished.connect(self._on_table_loaded)
+        job.failed.connect(self._on_table_error)
+        JobScheduler.shared().submit(job)
+
+    def _cancel_table_job(self):
+        if self.table_job is not None:
+            JobScheduler.shared().cancel(self.table_job)
+            self.table_job = None
+
+    def _on_table_loaded(self, result):
+        # Результат файла, открытого раньше последнего, не показывается
+        if self.sender() is not self.table_job:
+            return
+        self.table_job = None
+        self.file_encoding = result["encoding"]
+        self.file_delimiter = result["delimiter"]
+        self.set_solid_data(result["data"])
+        self._on_data_loaded(result["headers"], result["rows"])
+
+    def _on_table_error(self, error_msg):
+        if self.sender() is not self.table_job:
+            return
+        self.table_job = None
+        self._on_load_error(error_msg)
 
     @property
     def solid_data(self):
@@ -213,6 +296,7 @@ class CSVTableViewer(QMainWindow):
         :param data: Данные
         :return:
         """
+        self.browse_action.setChecked(False)
         self.model.clear()
 
         # Установка заголовков
@@ -243,8 +327,8 @@ class CSVTableViewer(QMainWindow):
         :return:
         """
         # Обновляем информацию о файле
-        self.encoding_label.setText(f"Кодировка: {self.loader_thread.encoding}")
-        self.delimiter_label.setText(f"Разделитель: {self.loader_thread.delimiter}")
+        self.encoding_label.setText(f"Кодировка: {self.file_encoding}")
+        self.delimiter_label.setText(f"Разделитель: {self.file_delimiter}")
         self.dimensions_label.setText(f"Строк: {row_count}, Столбцов: {col_count}")
 
     def _resize_columns_to_contents(self):
@@ -260,6 +344,65 @@ class CSVTableViewer(QMainWindow):
             # Устанавливаем режим, при котором столбцы можно прокручивать
             self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.Interactive)
 
+    def _set_browse_mode(self, enabled):
+        """
+        Переключение таблицы между загруженными строками и просмотром всего файла.
+        В режиме просмотра строки читаются блоками по мере прокрутки.
+        :param enabled: Включить просмотр.
+        :return:
+        """
+        if self.browse_model is not None:
+            self.browse_model.close()
+            self.browse_model = None
+            self.table_view.setModel(self.model)
+        if not enabled:
+            return
+
+        file_name = self.file_name
+        reason = self._browse_unavailable(file_name)
+        if reason:
+            self.status_bar.showMessage(reason)
+            self.browse_action.setChecked(False)
+            return
+
+        # Ошибочные строки не мешают просмотру: достаточно прочитать заголовок
+        reader = CSVReader(file_name, encoding=self.encoding, on_error=ON_ERROR_NAN)
+        try:
+            chunks = reader.iter_chunks(1)
+            headers = list(next(chunks, {})) or reader.headers
+            chunks.close()
+        except (OSError, RuntimeError, ValueError) as e:
+            self.status_bar.showMessage(f"Не удалось открыть файл для просмотра: {e}")
+            self.browse_action.setChecked(False)
+            return
+
+        self.browse_model = BrowseTableModel(file_name, headers, reader._detected_encoding,
+                                             reader._detected_delimiter,
+                                             skip_lines=1 + int(reader._has_sep_line), parent=self)
+        self.browse_model.index_thread.progress.connect(
+            lambda rows: self.status_bar.showMessage(f"Проиндексировано строк: {rows}")
+        )
+        self.table_view.setModel(self.browse_model)
+        self.browse_model.start()
+
+    @staticmethod
+    def _browse_unavailable(file_name):
+        """
+        Причина, по которой файл нельзя просматривать целиком.
+        :param file_name: Путь к файлу, папке или шаблон glob.
+        :return: Сообщение для строки состояния или None.
+        """
+        if not file_name:
+            return "Просмотр всего файла: файл не открыт"
+        if is_shard_source(file_name):
+            return "Просмотр всего файла недоступен для набора файлов (папки или шаблона): откройте один из файлов"
+        if not os.path.isfile(file_name):
+            return f"Просмотр всего файла: файл не найден: {file_name}"
+        compression = Compression.detect_file_compression(file_name)
+        if compression:
+            return f"Просмотр всего файла недоступен для сжатого файла ({compression}): откройте распакованный файл"
+        return None
+
     def _on_load_error(self, error_msg):
         """
         Обработка ошибок загрузки.
@@ -308,6 +451,10 @@ class CSVTableViewer(QMainWindow):
     def closeEvent(self, event):
         # Сохранение настроек при закрытии
         self._save_settings()
+        self._cancel_table_job()
+        self.browse_action.setChecked(False)
+        # Данные файла целиком нужны только, пока окно открыто
+        self._solid_data = []
         event.accept()
 
 
@@ -0,0 +1,63 @@
+from PySide6.QtCore import Qt, Signal, QEvent
+from PySide6.QtGui import QStandardItemModel, QStandardItem
+from PySide6.QtWidgets import QComboBox, QStylePainter, QStyleOptionComboBox, QStyle
+
+
+class CheckableComboBox(QComboBox):
+    """
+    Выпадающий список с множественным выбором элементов флажками.
+    В поле списка отображаются выбранные элементы через запятую.
+    """
+
+    # Набор отмеченных элементов изменился
+    checked_changed = Signal()
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self.setModel(QStandardItemModel(self))
+        self.model().itemChanged.connect(self._on_item_changed)
+        # Щелчок по элементу переключает флажок, а не закрывает список
+        self.view().viewport().installEventFilter(self)
+
+    def addItems(self, texts):
+        for text in texts:
+            item = QStandardItem(text)
+            item.setFlags(Qt.ItemIsEnabled | Qt.ItemIsUserCheckable)
+            item.setData(Qt.Unchecked, Qt.CheckStateRole)
+            self.model().appendRow(item)
+
+    def checked_items(self):
+        """
+        Отмеченные элементы в порядке списка.
+
+        :return: Список текстов элементов.
+        """
+        model = self.model()
+        return [model.item(row).text() for row in range(model.rowCount())
+                if model.item(row).checkState() == Qt.Checked]
+
+    def set_checked_items(self, texts):
+        model = self.model()
+        for row in range(model.rowCount()):
+            item = model.item(row)
+            item.setCheckState(Qt.Checked if item.text() in texts else Qt.Unchecked)
+
+    def eventFilter(self, obj, event):
+        if obj is self.view().viewport() and event.type() == QEvent.MouseButtonRelease:
+            item = self.model().itemFromIndex(self.view().indexAt(event.position().toPoint()))
+            if item is not None:
+                item.setCheckState(Qt.Unchecked if item.checkState() == Qt.Checked else Qt.Checked)
+            return True
+        return super().eventFilter(obj, event)
+
+    def _on_item_changed(self, _item):
+        self.update()
+        self.checked_changed.emit()
+
+    def paintEvent(self, event):
+        painter = QStylePainter(self)
+        option = QStyleOptionComboBox()
+        self.initStyleOption(option)
+        option.currentText = ", ".join(self.checked_items()) or self.placeholderText()
+        painter.drawComplexControl(QStyle.CC_ComboBox, option)
+        painter.drawControl(QStyle.CE_ComboBoxLabel, option)
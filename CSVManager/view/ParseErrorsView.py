@@ -0,0 +1,90 @@
+import os
+
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtWidgets import (QDialog, QTableView, QVBoxLayout, QHBoxLayout, QLabel, QPushButton,
+                               QFileDialog, QHeaderView)
+
+
+class ParseErrorsModel(QAbstractTableModel):
+    """
+    Модель таблицы поверх индекса ошибок без копирования записей.
+    Для набора из нескольких файлов добавляется столбец с именем файла.
+    """
+
+    headers = ["Строка", "Смещение", "Причина", "Столбец", "Файл"]
+
+    def __init__(self, errors, parent=None):
+        super().__init__(parent)
+        self._errors = errors
+        self.headers = self.headers if errors.files else self.headers[:-1]
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self._errors)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role != Qt.DisplayRole:
+            return None
+        value = self._errors.entry(index.row())[index.column()]
+        if index.column() == 1 and value < 0:
+            return ""
+        if index.column() == 4:
+            return os.path.basename(value)
+        return str(value)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role == Qt.DisplayRole and orientation == Qt.Horizontal:
+            return self.headers[section]
+        return super().headerData(section, orientation, role)
+
+
+class ParseErrorsDialog(QDialog):
+    """
+    Панель ошибочных строк после загрузки файла.
+    """
+
+    def __init__(self, errors, encoding="utf-8", parent=None):
+        """
+        :param errors: Индекс ошибок ParseErrorIndex.
+        :param encoding: Кодировка для сохранения карантина.
+        :param parent: Родительский виджет.
+        """
+        super().__init__(parent)
+        self.setWindowTitle("Ошибки разбора")
+        self.resize(600, 400)
+        self._errors = errors
+        self._encoding = encoding
+
+        summary = ", ".join(f"{reason}: {count}" for reason, count in errors.summary().items())
+        layout = QVBoxLayout(self)
+        layout.addWidget(QLabel(f"Всего ошибок: {len(errors)} ({summary})"))
+
+        self.table_view = QTableView()
+        self.table_view.setModel(ParseErrorsModel(errors, self))
+        self.table_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.table_view)
+
+        buttons = QHBoxLayout()
+        buttons.addStretch()
+        if errors.quarantine:
+            save_btn = QPushButton(f"Сохранить карантин ({len(errors.quarantine)})")
+            save_btn.clicked.connect(self._save_quarantine)
+            buttons.addWidget(save_btn)
+        close_btn = QPushButton("Закрыть")
+        close_btn.clicked.connect(self.accept)
+        buttons.addWidget(close_btn)
+        layout.addLayout(buttons)
+
+    def _save_quarantine(self):
+        """
+        Сохранение исключённых строк в отдельный файл.
+        """
+        file_name, _ = QFileDialog.getSaveFileName(self, "Сохранить карантин", "",
+                                                   "CSV Files (*.csv);;All Files (*)")
+        if not file_name:
+            return
+        with open(file_name, 'w', encoding=self._encoding, newline='') as file:
+            for _, raw in self._errors.quarantine:
+                file.write(raw + "\n")
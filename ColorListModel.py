@@ -1,5 +1,4 @@
 import sys
-from tkinter.font import names
 
 from PySide6.QtCore import QAbstractListModel, QModelIndex, Qt, QSize
 from PySide6.QtGui import QPixmap, QPainter, QColor
@@ -14,6 +13,14 @@ class ColorListModel(QAbstractListModel):
             self._colors = colors
         else:
             self._colors = [(color.name(), color) for color in colors]
+        # Образцы цветов рисуются один раз, а не при каждом запросе представления
+        self._pixmaps = [self._swatch(color) for _, color in self._colors]
+
+    @staticmethod
+    def _swatch(color, size=20):
+        pixmap = QPixmap(size, size)
+        pixmap.fill(color)
+        return pixmap
 
     def rowCount(self, parent = QModelIndex()):
         return len(self._colors)
@@ -27,9 +34,7 @@ class ColorListModel(QAbstractListModel):
         if role == Qt.DisplayRole or role == Qt.EditRole:
             return name
         elif role == Qt.DecorationRole:
-            pixmap = QPixmap(20, 20)
-            pixmap.fill(color)
-            return pixmap
+            return self._pixmaps[index.row()]
         elif role == Qt.UserRole:
             return color
 
@@ -0,0 +1,107 @@
+import numpy as np
+
+from CSVManager.ColumnOrder import ColumnOrder
+
+# Способы выравнивания серий по оси X
+ALIGN_INTERP = 'interp'
+ALIGN_MERGE = 'merge'
+
+
+def sorted_by_x(x, y, order=None):
+    """
+    Точки серии, упорядоченные по X, без точек с NaN и бесконечностями в X.
+    Уже отсортированные данные не копируются, перестановка несортированных
+    берётся из кэша order.
+
+    :param order: Упорядоченность X (ColumnOrder), если уже известна.
+    :return: Кортеж (x, y, ColumnOrder результата).
+    """
+    if order is None:
+        order = ColumnOrder.detect(x)
+    permutation, x, order = order.sorted_view(x)
+    if permutation is not None:
+        y = y[permutation]
+    # После сортировки бесконечности оказываются по краям
+    start, stop = order.locate(x, [-np.inf, np.finfo(np.float64).max]) + 1
+    if (start, stop) != (0, len(x)):
+        x, y = x[start:stop], y[start:stop]
+        order = ColumnOrder.detect(x)
+    return x, y, order
+
+
+def merge_grids(grids):
+    """
+    Объединение отсортированных сеток X без повторов.
+    Устойчивая сортировка (timsort) склеивает готовые отсортированные отрезки
+    за линейное время.
+
+    :param grids: Список отсортированных массивов.
+    :return: Отсортированный массив уникальных значений.
+    """
+    merged = np.sort(np.concatenate(grids), kind='stable')
+    if not len(merged):
+        return merged
+    keep = np.empty(len(merged), dtype=bool)
+    keep[0] = True
+    np.not_equal(merged[1:], merged[:-1], out=keep[1:])
+    return merged[keep]
+
+
+def interp_to(grid, x, y):
+    """
+    Значения серии в точках сетки линейной интерполяцией,
+    вне диапазона серии - NaN.
+
+    :param grid: Отсортированная сетка X.
+    :param x: Отсортированные значения X серии.
+    :param y: Значения Y серии.
+    :return: Массив значений на сетке.
+    """
+    if not len(x):
+        return np.full(len(grid), np.nan)
+    return np.interp(grid, x, y, left=np.nan, right=np.nan)
+
+
+def asof_to(grid, x, y, order=None):
+    """
+    Значения серии в точках сетки по последней известной точке (x <= точки сетки),
+    до первой точки серии - NaN.
+
+    :param grid: Отсортированная сетка X.
+    :param x: Отсортированные значения X серии.
+    :param y: Значения Y серии.
+    :param order: Упорядоченность x (ColumnOrder): для равномерной сетки поиск арифметический.
+    :return: Массив значений на сетке.
+    """
+    index = order.locate(x, grid) if order is not None else np.searchsorted(x, grid, side='right') - 1
+    result = y[np.maximum(index, 0)] if len(y) else np.empty(len(grid))
+    result = np.array(result, dtype=np.float64)
+    result[index < 0] = np.nan
+    return result
+
+
+def align(series_data, method=ALIGN_INTERP, orders=None):
+    """
+    Выравнивание серий на общую сетку X.
+
+    'interp' - сетка первой серии, остальные интерполируются линейно;
+    'merge' - объединение сеток всех серий, значения берутся по последней
+    известной точке каждой серии.
+
+    :param series_data: Список пар (x, y).
+    :param method: ALIGN_INTERP или ALIGN_MERGE.
+    :param orders: Упорядоченность X каждой серии (ColumnOrder или None), если уже известна.
+    :return: Кортеж (общая сетка X, список массивов Y).
+    """
+    orders = orders or [None] * len(series_data)
+    ordered = [sorted_by_x(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), order)
+               for (x, y), order in zip(series_data, orders)]
+    if not ordered:
+        return np.empty(0), []
+    if method == ALIGN_INTERP:
+        grid = ordered[0][0]
+        return grid, [ordered[0][1]] + [interp_to(grid, x, y) for x, y, _ in ordered[1:]]
+    if method == ALIGN_MERGE:
+        grid = merge_grids([x for x, _, _ in ordered])
+        return grid, [asof_to(grid, x, y, order) for x, y, order in ordered]
+    raise ValueError(f"неизвестный способ выравнивания {method!r}")
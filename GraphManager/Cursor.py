@@ -0,0 +1,231 @@
+import heapq
+import math
+
+import numpy as np
+import pyqtgraph as pg
+from PySide6 import QtCore
+
+from CSVManager.ColumnOrder import ColumnOrder
+
+
+class SortedXIndex:
+    """
+    Индекс ближайшей по X точки на основе отсортированного массива X.
+    Поиск выполняется бинарным поиском за O(log n), для равномерной сетки - арифметикой.
+    """
+
+    def __init__(self, x, order=None):
+        """
+        :param x: Значения по оси X.
+        :param order: Упорядоченность X (ColumnOrder), если уже известна.
+        """
+        if order is None:
+            order = ColumnOrder.detect(x)
+        # Несортированные данные сортируются один раз, перестановка кэшируется в order
+        self.permutation, self.x, self.order = order.sorted_view(x)
+
+    def nearest(self, x0):
+        """
+        Поиск ближайшей по X точки.
+
+        :param x0: Значение X.
+        :return: Индекс точки в исходных массивах или None для пустой серии.
+        """
+        i = self.order.nearest(self.x, x0)
+        if i is None or self.permutation is None:
+            return i
+        return int(self.permutation[i])
+
+
+class KDTreeIndex:
+    """
+    Индекс ближайшей точки на плоскости для точечных графиков: k-d дерево.
+
+    Узел делит свои точки медианой по оси с большим разбросом, у каждого узла
+    хранится ограничивающий прямоугольник его точек. Поиск обходит узлы по
+    возрастанию расстояния от курсора до прямоугольника и заканчивается, когда
+    ближайший необойдённый узел дальше найденной точки, поэтому время поиска
+    не зависит от того, как точки распределены по плоскости.
+    """
+
+    def __init__(self, x, y, leaf_size=256):
+        """
+        :param x: Значения по оси X.
+        :param y: Значения по оси Y.
+        :param leaf_size: Наибольшее количество точек в листе.
+        """
+        points = np.flatnonzero(np.isfinite(x) & np.isfinite(y))
+        # Координаты в порядке листьев: точки листа проверяются одним срезом
+        px, py = x[points], y[points]
+        self._x = x
+        self._y = y
+
+        # Узлы: границы точек, прямоугольник, номер левого потомка (правый - следующий), -1 у листа
+        self._start, self._stop = [0], [len(points)]
+        self._x_lo, self._x_hi, self._y_lo, self._y_hi = [], [], [], []
+        self._left = []
+        node = 0
+        while node < len(self._start):
+            start, stop = self._start[node], self._stop[node]
+            x_lo, x_hi = (float(px[start:stop].min()), float(px[start:stop].max())) if stop > start else (0.0, 0.0)
+            y_lo, y_hi = (float(py[start:stop].min()), float(py[start:stop].max())) if stop > start else (0.0, 0.0)
+            self._x_lo.append(x_lo)
+            self._x_hi.append(x_hi)
+            self._y_lo.append(y_lo)
+            self._y_hi.append(y_hi)
+            if stop - start <= leaf_size or (x_lo == x_hi and y_lo == y_hi):
+                self._left.append(-1)
+            else:
+                middle = (start + stop) // 2
+                axis = px if x_hi - x_lo >= y_hi - y_lo else py
+                part = np.argpartition(axis[start:stop], middle - start)
+                for values in (points, px, py):
+                    values[start:stop] = values[start:stop][part]
+                self._left.append(len(self._start))
+                self._start += [start, middle]
+                self._stop += [middle, stop]
+            node += 1
+        self._points, self._px, self._py = points, px, py
+
+    def _box_distance(self, node, x0, y0, x_scale, y_scale):
+        dx = max(self._x_lo[node] - x0, 0.0, x0 - self._x_hi[node]) / x_scale
+        dy = max(self._y_lo[node] - y0, 0.0, y0 - self._y_hi[node]) / y_scale
+        return math.hypot(dx, dy)
+
+    def nearest(self, x0, y0, x_scale=1.0, y_scale=1.0):
+        """
+        Поиск ближайшей точки.
+
+        :param x0: Координата X курсора.
+        :param y0: Координата Y курсора.
+        :param x_scale: Единиц данных X на пиксель, чтобы расстояние считалось в пикселях.
+        :param y_scale: Единиц данных Y на пиксель.
+        :return: Индекс точки в исходных массивах или None для пустой серии.
+        """
+        if not len(self._points):
+            return None
+
+        best, best_dist = None, np.inf
+        queue = [(0.0, 0)]
+        while queue:
+            dist, node = heapq.heappop(queue)
+            if dist >= best_dist:
+                break
+            left = self._left[node]
+            if left >= 0:
+                for child in (left, left + 1):
+                    child_dist = self._box_distance(child, x0, y0, x_scale, y_scale)
+                    if child_dist < best_dist:
+                        heapq.heappush(queue, (child_dist, child))
+                continue
+            start, stop = self._start[node], self._stop[node]
+            dist = np.hypot((self._px[start:stop] - x0) / x_scale, (self._py[start:stop] - y0) / y_scale)
+            i = int(np.argmin(dist))
+            if dist[i] < best_dist:
+                best, best_dist = int(self._points[start + i]), float(dist[i])
+        return best
+
+
+class CrosshairTool(QtCore.QObject):
+    """
+    Перекрестие с отображением значений всех видимых серий под курсором.
+    """
+
+    # HTML-текст со значениями под курсором
+    values_changed = QtCore.Signal(str)
+
+    def __init__(self, plot_grid, rate_limit=60, parent=None):
+        """
+        :param plot_grid: Сетка графиков PlotGrid.
+        :param rate_limit: Максимальная частота обработки движения мыши.
+        :param parent: Родительский объект.
+        """
+        super().__init__(parent)
+        self.plot_grid = plot_grid
+        self.rate_limit = rate_limit
+        self._indexes = {}
+        self._lines = []
+        self._proxy = None
+
+    def attach(self):
+        """
+        Включение перекрестия на всех графиках сетки.
+        """
+        if self._proxy is None:
+            self._proxy = pg.SignalProxy(self.plot_grid.graph_widget.scene().sigMouseMoved,
+                                         rateLimit=self.rate_limit, slot=self._on_mouse_moved)
+            self.plot_grid.layout_changed.connect(self._add_lines)
+        self._add_lines()
+
+    def detach(self):
+        """
+        Отключение перекрестия.
+        """
+        if self._proxy is not None:
+            self.plot_grid.layout_changed.disconnect(self._add_lines)
+            self._proxy.disconnect()
+            self._proxy = None
+        self._remove_lines()
+        self._indexes = {}
+        self.values_changed.emit("")
+
+    def _add_lines(self):
+        self._remove_lines()
+        for plot in self.plot_grid.plots:
+            v_line = pg.InfiniteLine(angle=90, movable=False)
+            h_line = pg.InfiniteLine(angle=0, movable=False)
+            plot.addItem(v_line, ignoreBounds=True)
+            plot.addItem(h_line, ignoreBounds=True)
+            self._lines.append((plot, v_line, h_line))
+
+        # Индексы удалённых серий больше не нужны
+        current = {series for _, _, series in self.plot_grid.items()}
+        self._indexes = {series: index for series, index in self._indexes.items() if series in current}
+
+    def _remove_lines(self):
+        for plot, v_line, h_line in self._lines:
+            plot.removeItem(v_line)
+            plot.removeItem(h_line)
+        self._lines = []
+
+    def _index(self, series):
+        version, index = self._indexes.get(series, (None, None))
+        if version != series.version:
+            if series.is_line:
+                index = SortedXIndex(series.x, series.order)
+            else:
+                index = KDTreeIndex(series.x, series.y)
+            self._indexes[series] = (series.version, index)
+        return index
+
+    def _on_mouse_moved(self, event):
+        pos = event[0]
+        for plot, v_line, h_line in self._lines:
+            if plot.sceneBoundingRect().contains(pos):
+                point = plot.vb.mapSceneToView(pos)
+                break
+        else:
+            return
+
+        x0, y0 = point.x(), point.y()
+        for line_plot, v_line, h_line in self._lines:
+            v_line.setPos(x0)
+            h_line.setVisible(line_plot is plot)
+            if line_plot is plot:
+                h_line.setPos(y0)
+
+        values = [f"X: {x0:.4g}"]
+        for line_plot, curve, series in self.plot_grid.items():
+            if not curve.isVisible():
+                continue
+            index = self._index(series)
+            if isinstance(index, SortedXIndex):
+                i = index.nearest(x0)
+            else:
+                x_scale, y_scale = line_plot.vb.viewPixelSize()
+                i = index.nearest(x0, y0, x_scale or 1.0, y_scale or 1.0)
+            if i is None:
+                continue
+            values.append(f"<span style='color: {series.color}'>{series.name}: "
+                          f"{series.x[i]:.4g}; {series.y[i]:.4g}</span>")
+        self.values_changed.emit(", ".join(values))
@@ -0,0 +1,339 @@
+import csv
+import math
+import os
+
+import numpy as np
+import pyqtgraph as pg
+from PySide6 import QtCore, QtGui
+from PySide6.QtSvg import QSvgGenerator
+
+from GraphManager import Styles
+
+EXPORT_PNG = "png"
+EXPORT_SVG = "svg"
+EXPORT_CSV = "csv"
+EXPORT_NPZ = "npz"
+IMAGE_FORMATS = (EXPORT_PNG, EXPORT_SVG)
+DATA_FORMATS = (EXPORT_CSV, EXPORT_NPZ)
+
+# Количество строк в одном блоке записи CSV
+CSV_CHUNK_ROWS = 1 << 16
+# Цвета как у графиков pyqtgraph по умолчанию: фон, оси и подписи, сетка
+BACKGROUND = QtGui.QColor("black")
+FOREGROUND = QtGui.QColor(150, 150, 150)
+GRID = QtGui.QColor(150, 150, 150, 77)
+# Размер точки серии, как у symbol='o' в pyqtgraph
+SYMBOL_SIZE = 10
+
+
+def export_format(path):
+    """
+    Формат экспорта по расширению файла.
+
+    :return: Один из EXPORT_* или None.
+    """
+    suffix = os.path.splitext(path)[1].lower().lstrip(".")
+    return suffix if suffix in IMAGE_FORMATS + DATA_FORMATS else None
+
+
+def visible_data(x, y, order, x_min=None, x_max=None):
+    """
+    Точки серии в диапазоне X. Для отсортированного X - срез без копирования.
+
+    :param order: Упорядоченность X (ColumnOrder).
+    :param x_min: Левая граница, None - все точки.
+    :param x_max: Правая граница.
+    :return: Кортеж массивов (x, y).
+    """
+    if x_min is None:
+        return x, y
+    if order.is_sorted and order.length == len(x):
+        start, stop = order.index_range(x, x_min, x_max)
+        return x[start:stop], y[start:stop]
+    mask = (x >= x_min) & (x <= x_max)
+    return x[mask], y[mask]
+
+
+def _same_array(a, b):
+    return a is b or (a.shape == b.shape and a.strides == b.strides and
+                      a.__array_interface__["data"][0] == b.__array_interface__["data"][0])
+
+
+def _format_columns(columns, delimiter):
+    """
+    Текст блока строк CSV из столбцов: числа форматируются и склеиваются векторно.
+    """
+    text = columns[0] if columns[0].dtype.kind == "U" else columns[0].astype(str)
+    for values in columns[1:]:
+        text = np.char.add(np.char.add(text, delimiter), values if values.dtype.kind == "U" else values.astype(str))
+    return "\n".join(text.tolist()) + "\n"
+
+
+def _quote(value, delimiter):
+    if any(char in value for char in (delimiter, '"', "\n", "\r")):
+        return '"' + value.replace('"', '""') + '"'
+    return value
+
+
+def write_csv(path, x_name, series, encoding="utf-8", delimiter=",", chunk_rows=CSV_CHUNK_ROWS, is_cancelled=None):
+    """
+    Запись данных серий в CSV блоками строк.
+
+    Если у всех серий общий X, получается широкая таблица: X и по столбцу
+    на серию. Иначе - длинная: название серии, X, Y.
+
+    :param path: Путь к файлу.
+    :param x_name: Название столбца X.
+    :param series: Список кортежей (название, x, y).
+    :param encoding: Кодировка файла.
+    :param delimiter: Разделитель полей.
+    :param chunk_rows: Количество строк в блоке.
+    :param is_cancelled: Функция без аргументов, True - прервать запись.
+    :return: Количество записанных строк или None, если запись прервана.
+    """
+    is_cancelled = is_cancelled or (lambda: False)
+    shared = all(_same_array(series[0][1], x) for _, x, _ in series[1:])
+    with open(path, "w", encoding=encoding, errors="replace", newline="") as file:
+        header = [x_name] + [name for name, _, _ in series] if shared else ["series", x_name, "y"]
+        csv.writer(file, delimiter=delimiter, lineterminator="\n").writerow(header)
+        if shared:
+            tables = [(None, series[0][1], [y for _, _, y in series])]
+        else:
+            tables = [(np.array([_quote(name, delimiter)]), x, [y]) for name, x, y in series]
+
+        rows = 0
+        for name, x, columns in tables:
+            for start in range(0, len(x), chunk_rows):
+                if is_cancelled():
+                    return None
+                stop = min(start + chunk_rows, len(x))
+                block = [x[start:stop]] + [values[start:stop] for values in columns]
+                if name is not None:
+                    block.insert(0, np.repeat(name, stop - start))
+                file.write(_format_columns(block, delimiter))
+                rows += stop - start
+    return rows
+
+
+def write_npz(path, x_name, series):
+    """
+    Запись данных серий в NPZ: массивы пишутся в архив блоками без копирования в память.
+
+    В архиве: names - названия серий, x_name - название X, y0, y1, ... - значения серий;
+    x - общий X, если он у всех серий один, иначе x0, x1, ...
+
+    :param path: Путь к файлу.
+    :param x_name: Название столбца X.
+    :param series: Список кортежей (название, x, y).
+    :return: Количество записанных точек.
+    """
+    arrays = {"names": np.array([name for name, _, _ in series]), "x_name": np.array(x_name)}
+    shared = all(_same_array(series[0][1], x) for _, x, _ in series[1:])
+    for i, (_, x, y) in enumerate(series):
+        if shared:
+            arrays["x"] = x
+        else:
+            arrays[f"x{i}"] = x
+        arrays[f"y{i}"] = y
+    with open(path, "wb") as file:
+        np.savez(file, **arrays)
+    return sum(len(y) for _, _, y in series)
+
+
+def nice_ticks(low, high, count=6):
+    """
+    Деления оси с шагом 1, 2 или 5 на степень десяти, не больше count делений.
+    """
+    span = high - low
+    if not span > 0 or not np.isfinite(span):
+        return np.array([low])
+    raw = span / count
+    magnitude = 10 ** math.floor(math.log10(raw))
+    step = next(m * magnitude for m in (1, 2, 5, 10) if m * magnitude >= raw)
+    return np.arange(math.ceil(low / step), math.floor(high / step) + 1) * step
+
+
+def _tick_text(value, step):
+    if value == 0:
+        return "0"
+    # Знаков после запятой столько, сколько нужно для шага делений
+    digits = max(0, -math.floor(math.log10(step)) if step else 0)
+    if abs(value) >= 1e6 or abs(value) < 1e-4:
+        return f"{value:.3g}"
+    return f"{value:.{digits}f}"
+
+
+def plot_snapshot(plot, curves, max_points):
+    """
+    Снимок графика для отрисовки в фоне: диапазоны осей и прореженные данные серий.
+    Вызывается в потоке интерфейса.
+
+    :param plot: PlotItem.
+    :param curves: Серии графика.
+    :param max_points: Количество точек прореживания.
+    :return: Словарь: x_range, y_range, series - список (название, цвет, линия, x, y, подписи X).
+    """
+    (x_min, x_max), y_range = plot.vb.viewRange()
+    series = []
+    for item in curves:
+        x, y = item.downsample(x_min, x_max, max_points)
+        labels = dict(zip(item.x.tolist(), item.x_labels)) if item.x_labels is not None else None
+        series.append((item.name, item.color, item.is_line, x, y, labels))
+    return {"x_range": (x_min, x_max), "y_range": tuple(y_range), "series": series}
+
+
+def _paint_plot(painter, rect, snapshot, scale):
+    """
+    Отрисовка одного графика: сетка, оси с подписями, серии и легенда.
+    """
+    font = QtGui.QFont()
+    font.setPixelSize(max(int(11 * scale), 1))
+    painter.setFont(font)
+    metrics = QtGui.QFontMetricsF(font)
+    area = QtCore.QRectF(rect).adjusted(60 * scale, 10 * scale, -10 * scale, -30 * scale)
+    (x0, x1), (y0, y1) = snapshot["x_range"], snapshot["y_range"]
+    x_span = (x1 - x0) or 1.0
+    y_span = (y1 - y0) or 1.0
+
+    def to_px(x, y):
+        return area.left() + (x - x0) / x_span * area.width(), area.bottom() - (y - y0) / y_span * area.height()
+
+    labels = {}
+    for *_, series_labels in snapshot["series"]:
+        labels.update(series_labels or {})
+    x_ticks = nice_ticks(x0, x1)
+    if labels:
+        x_ticks = np.array([value for value in sorted(labels) if x0 <= value <= x1])
+        x_ticks = x_ticks[::max(len(x_ticks) // 10, 1)]
+    y_ticks = nice_ticks(y0, y1)
+    x_step = x_ticks[1] - x_ticks[0] if len(x_ticks) > 1 else 0
+    y_step = y_ticks[1] - y_ticks[0] if len(y_ticks) > 1 else 0
+
+    painter.setPen(QtGui.QPen(GRID, scale))
+    for value in x_ticks:
+        px, _ = to_px(value, y0)
+        painter.drawLine(QtCore.QPointF(px, area.top()), QtCore.QPointF(px, area.bottom()))
+    for value in y_ticks:
+        _, py = to_px(x0, value)
+        painter.drawLine(QtCore.QPointF(area.left(), py), QtCore.QPointF(area.right(), py))
+
+    painter.setPen(QtGui.QPen(FOREGROUND, scale))
+    painter.drawRect(area)
+    for value in x_ticks:
+        px, _ = to_px(value, y0)
+        text = labels.get(value, "") if labels else _tick_text(value, x_step)
+        width = metrics.horizontalAdvance(text)
+        if px + width / 2 > rect.right():
+            continue
+        painter.drawText(QtCore.QPointF(px - width / 2, area.bottom() + 5 * scale + metrics.ascent()), text)
+    for value in y_ticks:
+        _, py = to_px(x0, value)
+        text = _tick_text(value, y_step)
+        width = metrics.horizontalAdvance(text)
+        painter.drawText(QtCore.QPointF(area.left() - 5 * scale - width, py + metrics.ascent() / 2), text)
+
+    painter.save()
+    painter.setClipRect(area)
+    for name, color, is_line, x, y, _ in snapshot["series"]:
+        px, py = to_px(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64))
+        if is_line:
+            painter.setPen(QtGui.QPen(QtGui.QColor(color), 2 * scale))
+            painter.drawPath(pg.arrayToQPath(px, py, connect="finite"))
+        finite = np.isfinite(px) & np.isfinite(py)
+        points = pg.functions.arrayToQPolygonF(px[finite], py[finite])
+        # Точка - круг цвета серии с обводкой, как символ 'o'
+        for point_color, size in ((QtGui.QColor(*Styles.SYMBOL_OUTLINE), SYMBOL_SIZE + 1),
+                                  (QtGui.QColor(color), SYMBOL_SIZE - 1)):
+            pen = QtGui.QPen(point_color, size * scale)
+            pen.setCapStyle(QtCore.Qt.RoundCap)
+            painter.setPen(pen)
+            painter.drawPoints(points)
+    painter.restore()
+
+    # Легенда в левом верхнем углу, как у pyqtgraph
+    if snapshot["series"]:
+        line_height = metrics.height() * 1.3
+        width = max(metrics.horizontalAdvance(name) for name, *_ in snapshot["series"]) + 40 * scale
+        box = QtCore.QRectF(area.left() + 30 * scale, area.top() + 30 * scale, width,
+                            line_height * len(snapshot["series"]) + 10 * scale)
+        painter.setPen(QtGui.QPen(FOREGROUND, scale))
+        painter.setBrush(QtGui.QColor(100, 100, 100, 50))
+        painter.drawRect(box)
+        painter.setBrush(QtCore.Qt.NoBrush)
+        for i, (name, color, *_) in enumerate(snapshot["series"]):
+            top = box.top() + 5 * scale + i * line_height
+            painter.setPen(QtGui.QPen(QtGui.QColor(color), 2 * scale))
+            middle = top + line_height / 2
+            painter.drawLine(QtCore.QPointF(box.left() + 5 * scale, middle),
+                             QtCore.QPointF(box.left() + 25 * scale, middle))
+            painter.setPen(QtGui.QPen(FOREGROUND, scale))
+            painter.drawText(QtCore.QPointF(box.left() + 32 * scale, middle + metrics.ascent() / 2 - 1), name)
+
+
+def render_image(path, snapshots, width, height, scale=1.0, image_format=EXPORT_PNG):
+    """
+    Отрисовка графиков друг под другом в PNG или SVG без виджетов: можно вызывать не из потока интерфейса.
+
+    :param path: Путь к файлу.
+    :param snapshots: Снимки графиков (см. plot_snapshot).
+    :param width: Ширина изображения в пикселях.
+    :param height: Высота изображения в пикселях.
+    :param scale: Множитель толщины линий, размеров точек и шрифта.
+    :param image_format: EXPORT_PNG или EXPORT_SVG.
+    :return:
+    """
+    if image_format == EXPORT_SVG:
+        device = QSvgGenerator()
+        device.setFileName(path)
+        device.setSize(QtCore.QSize(width, height))
+        device.setViewBox(QtCore.QRect(0, 0, width, height))
+        device.setTitle("GraphBuilder")
+    else:
+        device = QtGui.QImage(width, height, QtGui.QImage.Format_ARGB32)
+        if device.isNull():
+            raise MemoryError(f"не хватает памяти для изображения {width}x{height}")
+
+    painter = QtGui.QPainter(device)
+    painter.setRenderHint(QtGui.QPainter.Antialiasing)
+    painter.fillRect(QtCore.QRectF(0, 0, width, height), BACKGROUND)
+    plot_height = height / max(len(snapshots), 1)
+    for i, snapshot in enumerate(snapshots):
+        _paint_plot(painter, QtCore.QRectF(0, i * plot_height, width, plot_height), snapshot, scale)
+    painter.end()
+
+    if image_format == EXPORT_PNG and not device.save(path, "PNG"):
+        raise OSError(f"не удалось записать {path}")
+
+
+class ExportThread(QtCore.QThread):
+    """
+    Поток экспорта: запись файла не блокирует интерфейс. Прерывается через requestInterruption().
+    """
+    exported = QtCore.Signal(str, str)
+    error_occurred = QtCore.Signal(str)
+
+    def __init__(self, path, export, parent=None):
+        """
+        :param path: Путь к файлу.
+        :param export: Функция export(path, is_cancelled), возвращает описание результата
+            для строки состояния или None, если экспорт прерван.
+        :param parent: Родительский объект.
+        """
+        super().__init__(parent)
+        self.path = path
+        self.export = export
+
+    def run(self):
+        try:
+            result = self.export(self.path, self.isInterruptionRequested)
+        except (OSError, ValueError, MemoryError) as e:
+            self.error_occurred.emit(str(e))
+            return
+        if result is None:
+            # Недописанный файл не оставляем
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            return
+        self.exported.emit(self.path, result)
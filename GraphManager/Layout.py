@@ -0,0 +1,159 @@
+from PySide6 import QtCore
+
+from GraphManager import Styles
+from GraphManager.RenderScheduler import RenderScheduler
+
+
+class PlotGrid(QtCore.QObject):
+    """
+    Сетка графиков со связанной осью X.
+
+    Все графики сетки связаны с первым по оси X. Изменение диапазона на любом
+    из них собирается в одну отложенную перерисовку, в которой каждая серия
+    каждого графика прореживается ровно один раз.
+    """
+
+    # Набор графиков сетки изменился
+    layout_changed = QtCore.Signal()
+
+    def __init__(self, graph_widget, scheduler=None, redraw_delay=30, parent=None):
+        """
+        :param graph_widget: Виджет pg.GraphicsLayoutWidget для размещения графиков.
+        :param scheduler: Планировщик перерисовки, по умолчанию создаётся свой.
+        :param redraw_delay: Задержка перерисовки после изменения диапазона, мс.
+        :param parent: Родительский объект.
+        """
+        super().__init__(parent)
+        self.graph_widget = graph_widget
+        self.scheduler = scheduler or RenderScheduler(parent=self)
+        self.plots = []
+        # Пары (кривая, серия) для каждого графика
+        self._curves = []
+
+        self._redraw_timer = QtCore.QTimer(self)
+        self._redraw_timer.setSingleShot(True)
+        self._redraw_timer.setInterval(redraw_delay)
+        self._redraw_timer.timeout.connect(self.redraw)
+
+    def set_layout(self, groups):
+        """
+        Построение сетки графиков: по одному графику на каждую группу серий.
+
+        :param groups: Список списков серий.
+        :return:
+        """
+        self.clear()
+        with self.scheduler.batch():
+            for group in groups:
+                plot = self.add_plot()
+                for series in group:
+                    self.add_series(series, plot)
+            self.redraw()
+
+    def add_plot(self):
+        """
+        Добавление графика в новую строку сетки.
+
+        :return: Созданный PlotItem.
+        """
+        if self.plots:
+            self.graph_widget.nextRow()
+        plot = self.graph_widget.addPlot()
+        plot.addLegend()
+        plot.showGrid(x=True, y=True)
+        if self.plots:
+            plot.setXLink(self.plots[0])
+        plot.sigXRangeChanged.connect(self._schedule_redraw)
+
+        self.plots.append(plot)
+        self._curves.append([])
+        self.layout_changed.emit()
+        return plot
+
+    def add_series(self, series, plot=None):
+        """
+        Добавление серии на график.
+
+        :param series: Серия данных.
+        :param plot: График, по умолчанию последний (создаётся при отсутствии).
+        :return: Созданная кривая.
+        """
+        if plot is None:
+            plot = self.plots[-1] if self.plots else self.add_plot()
+
+        curve = plot.plot(name=series.name, **Styles.curve_style(series.color, series.is_line))
+        self._curves[self.plots.index(plot)].append((curve, series))
+        self._schedule_redraw()
+        return curve
+
+    def clear(self):
+        """
+        Удаление всех графиков сетки.
+        """
+        self._redraw_timer.stop()
+        for curves in self._curves:
+            for curve, _ in curves:
+                self.scheduler.discard(curve)
+        self.graph_widget.clear()
+        self.plots = []
+        self._curves = []
+        self.layout_changed.emit()
+
+    def items(self):
+        """
+        Перебор всех кривых сетки.
+
+        :return: Генератор кортежей (график, кривая, серия).
+        """
+        for plot, curves in zip(self.plots, self._curves):
+            for curve, series in curves:
+                yield plot, curve, series
+
+    def refresh(self):
+        """
+        Перерисовка после изменения данных серий. Частые вызовы объединяются.
+        """
+        self._schedule_redraw()
+
+    def auto_range(self):
+        """
+        Окончательный автомасштаб всех графиков, например, после завершения загрузки.
+        """
+        for plot in self.plots:
+            plot.enableAutoRange()
+        self._schedule_redraw()
+
+    def _schedule_redraw(self, *args):
+        # Таймер не перезапускается, чтобы непрерывный поток изменений не откладывал перерисовку
+        if not self._redraw_timer.isActive():
+            self._redraw_timer.start()
+
+    def redraw(self):
+        """
+        Прореживание данных всех кривых под текущий диапазон и передача их планировщику.
+        """
+        self._redraw_timer.stop()
+        for plot, curves in zip(self.plots, self._curves):
+            if not curves:
+                continue
+            if plot.vb.autoRangeEnabled()[0]:
+                # При автомасштабе показываем серию целиком
+                x_min, x_max = float('-inf'), float('inf')
+            else:
+                x_min, x_max = plot.vb.viewRange()[0]
+            max_points = max(int(plot.vb.width()) * 2, 500)
+            self._update_ticks(plot, curves)
+            for curve, series in curves:
+                self.scheduler.submit(curve, *series.downsample(x_min, x_max, max_points))
+
+    @staticmethod
+    def _update_ticks(plot, curves):
+        """
+        Подписи оси X по меткам категорий, если на графике есть такие серии.
+        """
+        labels = {}
+        for _, series in curves:
+            if series.x_labels is not None:
+                labels.update(zip(series.x.tolist(), series.x_labels))
+        if labels:
+            plot.getAxis('bottom').setTicks([sorted(labels.items())])
@@ -0,0 +1,233 @@
+import numpy as np
+import pyqtgraph as pg
+from PySide6 import QtCore
+
+from CSVManager.ColumnOrder import ColumnOrder
+
+
+class BlockMinMaxTree:
+    """
+    Дерево отрезков минимумов и максимумов над блоками значений.
+
+    Листья дерева - минимумы и максимумы блоков по block_size точек, поэтому
+    дерево занимает мало памяти, а запрос просматривает не более двух
+    неполных блоков и O(log n) узлов дерева.
+    """
+
+    def __init__(self, values, block_size=32):
+        """
+        :param values: Значения, NaN игнорируются.
+        :param block_size: Размер блока листа.
+        """
+        self.values = values
+        self.block_size = block_size
+        blocks = -(-len(values) // block_size)
+
+        padded = np.full(blocks * block_size, np.nan)
+        padded[:len(values)] = values
+        padded = padded.reshape(blocks, block_size)
+
+        self._blocks = blocks
+        self._min = self._build(np.fmin.reduce(padded, axis=1), np.fmin)
+        self._max = self._build(np.fmax.reduce(padded, axis=1), np.fmax)
+
+    @staticmethod
+    def _build(leaves, op):
+        n = len(leaves)
+        tree = np.full(2 * n, np.nan)
+        tree[n:] = leaves
+        # Узлы строятся уровнями: дети узлов [lo, hi) уже посчитаны, если 2 * lo >= hi
+        hi = n
+        while hi > 1:
+            lo = max((hi + 1) // 2, 1)
+            tree[lo:hi] = op(tree[2 * lo:2 * hi:2], tree[2 * lo + 1:2 * hi:2])
+            hi = lo
+        return tree
+
+    def _tree_query(self, tree, op, left, right):
+        result = np.nan
+        left += self._blocks
+        right += self._blocks
+        while left < right:
+            if left & 1:
+                result = op(result, tree[left])
+                left += 1
+            if right & 1:
+                right -= 1
+                result = op(result, tree[right])
+            left //= 2
+            right //= 2
+        return result
+
+    def query(self, start, stop):
+        """
+        Минимум и максимум значений с индексами [start, stop).
+
+        :return: Кортеж (минимум, максимум), NaN для пустого диапазона.
+        """
+        if start >= stop:
+            return np.nan, np.nan
+        first_block = -(-start // self.block_size)
+        last_block = stop // self.block_size
+
+        if first_block >= last_block:
+            part = self.values[start:stop]
+            return float(np.fmin.reduce(part)), float(np.fmax.reduce(part))
+
+        head = self.values[start:first_block * self.block_size]
+        tail = self.values[last_block * self.block_size:stop]
+        low = self._tree_query(self._min, np.fmin, first_block, last_block)
+        high = self._tree_query(self._max, np.fmax, first_block, last_block)
+        for part in (head, tail):
+            if len(part):
+                low = np.fmin(low, np.fmin.reduce(part))
+                high = np.fmax(high, np.fmax.reduce(part))
+        return float(low), float(high)
+
+
+class PrefixStats:
+    """
+    Статистика серии по произвольному диапазону X за O(log n).
+
+    Строится один раз на серию: префиксные суммы значений и их квадратов
+    (относительно среднего, чтобы не терять точность) и дерево минимумов/максимумов.
+    """
+
+    def __init__(self, x, y, order=None):
+        """
+        :param x: Значения по оси X.
+        :param y: Значения по оси Y.
+        :param order: Упорядоченность X (ColumnOrder), если уже известна.
+        """
+        if order is None:
+            order = ColumnOrder.detect(x)
+        permutation, x, self.order = order.sorted_view(x)
+        if permutation is not None:
+            y = y[permutation]
+        self.x = x
+
+        finite = np.isfinite(y)
+        has_gaps = not finite.all()
+        self._shift = float(np.mean(y[finite])) if finite.any() else 0.0
+        centered = np.where(finite, y - self._shift, 0.0) if has_gaps else y - self._shift
+
+        self._sum = np.concatenate(([0.0], np.cumsum(centered)))
+        self._sum_sq = np.concatenate(([0.0], np.cumsum(centered * centered)))
+        # Префикс количества нужен только при наличии пропусков
+        self._count = np.concatenate(([0], np.cumsum(finite, dtype=np.int64))) if has_gaps else None
+        self._tree = BlockMinMaxTree(y)
+
+    def query(self, x_min, x_max):
+        """
+        Статистика точек с x_min <= x <= x_max.
+
+        :return: Словарь: count, sum, mean, std (по генеральной совокупности), min, max.
+        """
+        start, stop = self.order.index_range(self.x, x_min, x_max)
+
+        count = int(self._count[stop] - self._count[start]) if self._count is not None else stop - start
+        if not count:
+            return {"count": 0, "sum": 0.0, "mean": np.nan, "std": np.nan, "min": np.nan, "max": np.nan}
+
+        centered_sum = self._sum[stop] - self._sum[start]
+        centered_sq = self._sum_sq[stop] - self._sum_sq[start]
+        centered_mean = centered_sum / count
+        low, high = self._tree.query(start, stop)
+        return {
+            "count": count,
+            "sum": centered_sum + count * self._shift,
+            "mean": centered_mean + self._shift,
+            "std": float(np.sqrt(max(centered_sq / count - centered_mean * centered_mean, 0.0))),
+            "min": low,
+            "max": high,
+        }
+
+
+class RegionStatsTool(QtCore.QObject):
+    """
+    Выделение диапазона по X с отображением статистики всех серий в нём.
+    """
+
+    # HTML-текст со статистикой выделенного диапазона
+    stats_changed = QtCore.Signal(str)
+
+    def __init__(self, plot_grid, parent=None):
+        """
+        :param plot_grid: Сетка графиков PlotGrid.
+        :param parent: Родительский объект.
+        """
+        super().__init__(parent)
+        self.plot_grid = plot_grid
+        self.region = None
+        self._enabled = False
+        self._stats = {}
+
+    def attach(self):
+        """
+        Включение области выделения на первом графике сетки.
+        """
+        if not self._enabled:
+            self._enabled = True
+            self.plot_grid.layout_changed.connect(self._place_region)
+        self._place_region()
+
+    def detach(self):
+        """
+        Удаление области выделения.
+        """
+        if self._enabled:
+            self._enabled = False
+            self.plot_grid.layout_changed.disconnect(self._place_region)
+        self._remove_region()
+        self._stats = {}
+        self.stats_changed.emit("")
+
+    def _place_region(self):
+        self._remove_region()
+        if not self.plot_grid.plots:
+            return
+        plot = self.plot_grid.plots[0]
+        x_min, x_max = plot.vb.viewRange()[0]
+        width = x_max - x_min
+
+        self.region = pg.LinearRegionItem((x_min + width / 3, x_max - width / 3))
+        self.region.setZValue(10)
+        plot.addItem(self.region, ignoreBounds=True)
+        self.region.sigRegionChanged.connect(self.update_stats)
+
+        # Статистика удалённых серий больше не нужна
+        current = {series for _, _, series in self.plot_grid.items()}
+        self._stats = {series: stats for series, stats in self._stats.items() if series in current}
+        self.update_stats()
+
+    def _remove_region(self):
+        if self.region is None:
+            return
+        scene = self.region.scene()
+        if scene is not None:
+            scene.removeItem(self.region)
+        self.region = None
+
+    def _series_stats(self, series):
+        version, stats = self._stats.get(series, (None, None))
+        if version != series.version:
+            stats = PrefixStats(series.x, series.y, series.order)
+            self._stats[series] = (series.version, stats)
+        return stats
+
+    def update_stats(self):
+        """
+        Пересчёт статистики для текущего положения области.
+        """
+        if self.region is None:
+            return
+        x_min, x_max = self.region.getRegion()
+        lines = [f"X: [{x_min:.4g}; {x_max:.4g}]"]
+        for _, _, series in self.plot_grid.items():
+            stats = self._series_stats(series).query(x_min, x_max)
+            lines.append(
+                f"<span style='color: {series.color}'>{series.name}: n={stats['count']}, "
+                f"сумма={stats['sum']:.4g}, среднее={stats['mean']:.4g}, СКО={stats['std']:.4g}, "
+                f"мин={stats['min']:.4g}, макс={stats['max']:.4g}</span>"
+            )
+        self.stats_changed.emit("<br>".join(lines))
@@ -0,0 +1,122 @@
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from PySide6 import QtCore
+
+
+class RenderScheduler(QtCore.QObject):
+    """
+    Планировщик перерисовки кривых.
+
+    Накапливает изменения данных кривых и применяет их пачкой не чаще, чем
+    target_fps раз в секунду. Автомасштаб на время применения пачки
+    отключается и пересчитывается один раз на каждую область просмотра.
+    """
+
+    # Длительность применения кадра, мс
+    frame_rendered = QtCore.Signal(float)
+
+    def __init__(self, target_fps=60, history=120, parent=None):
+        """
+        :param target_fps: Максимальная частота кадров.
+        :param history: Количество кадров для статистики.
+        :param parent: Родительский объект.
+        """
+        super().__init__(parent)
+        self._min_interval = 1.0 / target_fps
+        self._pending = {}
+        self._batch_depth = 0
+        self._last_frame = 0.0
+        self._frame_times = deque(maxlen=history)
+        self._frame_starts = deque(maxlen=history)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.timeout.connect(self.flush)
+
+    def submit(self, curve, x, y):
+        """
+        Постановка новых данных кривой в очередь. Более новые данные заменяют ещё не показанные.
+
+        :param curve: Кривая PlotDataItem.
+        :param x: Значения по оси X.
+        :param y: Значения по оси Y.
+        :return:
+        """
+        self._pending[curve] = (x, y)
+        self._schedule()
+
+    def discard(self, curve):
+        """
+        Удаление кривой из очереди, например, перед её удалением с графика.
+        """
+        self._pending.pop(curve, None)
+
+    @contextmanager
+    def batch(self):
+        """
+        Контекст пакетного обновления: кадр строится только после выхода из него.
+        """
+        self._batch_depth += 1
+        try:
+            yield self
+        finally:
+            self._batch_depth -= 1
+            self._schedule()
+
+    def _schedule(self):
+        if self._batch_depth or not self._pending or self._timer.isActive():
+            return
+        wait = self._min_interval - (time.perf_counter() - self._last_frame)
+        self._timer.start(max(int(wait * 1000), 0))
+
+    def flush(self):
+        """
+        Применение всех накопленных изменений в одном кадре.
+        """
+        self._timer.stop()
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+
+        start = time.perf_counter()
+
+        # Отключаем автомасштаб, чтобы он не пересчитывался на каждую кривую
+        view_boxes = {}
+        for curve in pending:
+            view_box = curve.getViewBox()
+            if view_box is not None and view_box not in view_boxes:
+                view_boxes[view_box] = view_box.autoRangeEnabled()
+                view_box.disableAutoRange()
+
+        for curve, (x, y) in pending.items():
+            curve.setData(x, y)
+
+        for view_box, (auto_x, auto_y) in view_boxes.items():
+            if auto_x is not False or auto_y is not False:
+                view_box.enableAutoRange(x=auto_x, y=auto_y)
+
+        finish = time.perf_counter()
+        self._last_frame = finish
+        self._frame_starts.append(start)
+        self._frame_times.append((finish - start) * 1000)
+        self.frame_rendered.emit(self._frame_times[-1])
+
+    def frame_stats(self):
+        """
+        Статистика последних кадров.
+
+        :return: Словарь: количество кадров, среднее и максимальное время кадра в мс, частота кадров.
+        """
+        frames = len(self._frame_times)
+        if not frames:
+            return {"frames": 0, "mean_ms": 0.0, "max_ms": 0.0, "fps": 0.0}
+
+        span = self._frame_starts[-1] - self._frame_starts[0]
+        return {
+            "frames": frames,
+            "mean_ms": sum(self._frame_times) / frames,
+            "max_ms": max(self._frame_times),
+            "fps": (frames - 1) / span if span > 0 else 0.0,
+        }
@@ -0,0 +1,325 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from CSVManager.ColumnOrder import ColumnOrder
+from CSVManager.Memory import MemoryBudget, array_bytes, is_spilled
+
+
+class Series:
+    """
+    Данные одного графика.
+
+    Массивы x и y хранятся в одном экземпляре и разделяются всеми графиками,
+    на которых отображается серия. Прореженные для текущего диапазона данные
+    кэшируются, поэтому связанные по оси X графики прореживают серию один раз.
+
+    При нехватке памяти (см. MemoryBudget) массивы вытесняются во временные
+    файлы, а в памяти остаётся пирамида минимумов и максимумов по блокам:
+    общий вид прореживается по ней, с диска читаются только края диапазона.
+    """
+
+    # Количество запоминаемых прореженных диапазонов
+    cache_size = 16
+    # Размеры блоков уровней пирамиды минимумов/максимумов
+    pyramid_levels = (64, 4096)
+
+    def __init__(self, x, y, name="", color="#ff0000", is_line=False, x_labels=None, order=None):
+        """
+        :param x: Значения по оси X.
+        :param y: Значения по оси Y.
+        :param name: Название серии для легенды.
+        :param color: Цвет линии.
+        :param is_line: Соединять ли точки линией.
+        :param x_labels: Подписи точек по оси X для категорий, X - номера подписей.
+        :param order: Упорядоченность X (ColumnOrder), если уже известна, например, из набора данных.
+        """
+        self.x = np.asarray(x, dtype=np.float64)
+        self.y = np.asarray(y, dtype=np.float64)
+        self.name = name
+        self.color = color
+        self.is_line = is_line
+        self.x_labels = x_labels
+        # Версия растёт при каждом изменении данных, по ней инструменты сбрасывают свои индексы
+        self.version = 0
+        self.order = order if order is not None and order.length == len(self.x) else ColumnOrder.detect(self.x)
+        self._cache = OrderedDict()
+        # Уровни пирамиды: (размер блока, X начала блока, минимумы, максимумы)
+        self._pyramid = None
+        # Серия строится по ещё загружающемуся файлу: её массивы - начало растущих буферов набора данных
+        self.streaming = False
+        # Загрузка файла прервана: серия построена только по части строк
+        self.truncated = False
+        # Вытеснение идёт в фоновом потоке и не должно пересекаться с заменой данных
+        self._lock = threading.RLock()
+        MemoryBudget.register(self)
+
+    def __len__(self):
+        return len(self.x)
+
+    def visible_slice(self, x_min, x_max):
+        """
+        Границы индексов точек, попадающих в диапазон по X.
+        Захватывает по одной соседней точке с каждой стороны, чтобы линия не обрывалась на краях.
+
+        :param x_min: Левая граница.
+        :param x_max: Правая граница.
+        :return: Кортеж (начало, конец).
+        """
+        if not self.order.is_sorted:
+            return 0, len(self.x)
+        start, stop = self.order.index_range(self.x, x_min, x_max)
+        return max(start - 1, 0), min(stop + 1, len(self.x))
+
+    def downsample(self, x_min, x_max, max_points):
+        """
+        Прореживание видимой части серии методом минимума/максимума.
+
+        Линия по отсортированному X прореживается до минимума и максимума каждой
+        корзины в X её начала: вершины внутри вертикального отрезка не видны.
+        Точечные серии и серии с неотсортированным X прореживаются до точек данных -
+        строк с минимумом и максимумом Y каждой корзины, чтобы на графике не
+        появлялись несуществующие точки.
+
+        :param x_min: Левая граница видимого диапазона.
+        :param x_max: Правая граница видимого диапазона.
+        :param max_points: Максимальное количество точек результата.
+        :return: Кортеж массивов (x, y).
+        """
+        self.last_used = time.monotonic()
+        start, stop = self.visible_slice(x_min, x_max)
+        key = (start, stop, max_points)
+        cached = self._cache.get(key)
+        if cached is not None:
+            self._cache.move_to_end(key)
+            return cached
+
+        result = None
+        if self._pyramid is None and is_spilled(self.y):
+            # Данные пришли уже вытесненными (например, столбец вытесненного набора)
+            self._build_pyramid()
+        if self._pyramid:
+            result = self._pyramid_downsample(start, stop, max_points)
+        if result is None:
+            downsample = self._peak_downsample if self._uses_peaks() else self._extreme_points
+            result = downsample(self.x[start:stop], self.y[start:stop], max_points)
+
+        self._cache[key] = result
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return result
+
+    def _uses_peaks(self):
+        return self.is_line and self.order.is_sorted
+
+    @staticmethod
+    def _arg_extremes(view):
+        """
+        Номера минимума и максимума в каждой строке двумерного массива без учёта NaN.
+        """
+        low = view.argmin(axis=1)
+        high = view.argmax(axis=1)
+        rows = np.arange(len(view))
+        # argmin/argmax возвращают первый NaN: тогда NaN заменяются в копии
+        if np.isnan(view[rows, low]).any() or np.isnan(view[rows, high]).any():
+            nan = np.isnan(view)
+            low = np.where(nan, np.inf, view).argmin(axis=1)
+            high = np.where(nan, -np.inf, view).argmax(axis=1)
+        return low, high
+
+    @staticmethod
+    def _pair_index(low, high):
+        # Минимум и максимум корзины в порядке строк данных
+        index = np.empty(len(low) * 2, dtype=np.intp)
+        index[0::2] = np.minimum(low, high)
+        index[1::2] = np.maximum(low, high)
+        return index
+
+    @classmethod
+    def _extreme_points(cls, x, y, max_points):
+        """
+        Прореживание до точек данных: строки с минимумом и максимумом Y каждой корзины.
+        """
+        n = len(x)
+        if n <= max_points or max_points < 2:
+            return x, y
+
+        bucket = int(np.ceil(n / (max_points // 2)))
+        buckets = n // bucket
+        full = buckets * bucket
+
+        low, high = cls._arg_extremes(y[:full].reshape(buckets, bucket))
+        offsets = np.arange(buckets) * bucket
+        index = np.concatenate((cls._pair_index(low + offsets, high + offsets), np.arange(full, n)))
+        return x[index], y[index]
+
+    @staticmethod
+    def _peak_downsample(x, y, max_points):
+        n = len(x)
+        if n <= max_points or max_points < 2:
+            return x, y
+
+        # Каждая корзина даёт две точки: минимум и максимум
+        bucket = int(np.ceil(n / (max_points // 2)))
+        buckets = n // bucket
+        full = buckets * bucket
+
+        y_view = y[:full].reshape(buckets, bucket)
+        x_out = np.repeat(x[:full:bucket], 2)
+        y_out = np.empty(buckets * 2)
+        y_out[0::2] = np.fmin.reduce(y_view, axis=1)
+        y_out[1::2] = np.fmax.reduce(y_view, axis=1)
+
+        if full < n:
+            x_out = np.concatenate((x_out, x[full:]))
+            y_out = np.concatenate((y_out, y[full:]))
+        return x_out, y_out
+
+    def _build_pyramid(self):
+        """
+        Пирамида минимумов и максимумов: каждый уровень строится из предыдущего.
+        Кроме значений уровень хранит номера строк минимумов и максимумов.
+        """
+        pyramid = []
+        x, lows, highs, size = self.x, self.y, self.y, 1
+        low_index = high_index = None
+        for bucket in self.pyramid_levels:
+            factor = bucket // size
+            blocks = len(lows) // factor
+            if blocks < 2:
+                break
+            full = blocks * factor
+            offsets = np.arange(blocks) * factor
+            low_view = lows[:full].reshape(blocks, factor)
+            high_view = highs[:full].reshape(blocks, factor)
+            low, _ = self._arg_extremes(low_view)
+            _, high = self._arg_extremes(high_view)
+            low_index = low + offsets if low_index is None else low_index[low + offsets]
+            high_index = high + offsets if high_index is None else high_index[high + offsets]
+            x = x[:full:factor].copy()
+            lows = np.fmin.reduce(low_view, axis=1)
+            highs = np.fmax.reduce(high_view, axis=1)
+            size = bucket
+            pyramid.append((bucket, x, lows, highs, low_index, high_index))
+        self._pyramid = pyramid
+
+    def _pyramid_downsample(self, start, stop, max_points):
+        """
+        Прореживание по пирамиде: середина диапазона - из самого крупного подходящего уровня,
+        неполные блоки по краям - из исходных массивов.
+
+        :return: Кортеж массивов (x, y) или None, если пирамида не подходит.
+        """
+        n = stop - start
+        if n <= max_points or max_points < 2:
+            return None
+        bucket = int(np.ceil(n / (max_points // 2)))
+        levels = [level for level in self._pyramid if level[0] <= bucket]
+        if not levels:
+            return None
+        size, level_x, lows, highs, low_index, high_index = levels[-1]
+        # Группа блоков уровня не меньше корзины, иначе точек больше max_points
+        factor = -(-bucket // size)
+        first = -(-start // size)
+        groups = (stop // size - first) // factor
+        if groups < 1:
+            return None
+        last = first + groups * factor
+
+        peaks = self._uses_peaks()
+        if peaks:
+            x_mid = np.repeat(level_x[first:last:factor], 2)
+            y_mid = np.empty(groups * 2)
+            y_mid[0::2] = np.fmin.reduce(lows[first:last].reshape(groups, factor), axis=1)
+            y_mid[1::2] = np.fmax.reduce(highs[first:last].reshape(groups, factor), axis=1)
+        else:
+            # Точки данных: с диска читаются только выбранные строки
+            rows = np.arange(groups) * factor + first
+            low, _ = self._arg_extremes(lows[first:last].reshape(groups, factor))
+            _, high = self._arg_extremes(highs[first:last].reshape(groups, factor))
+            index = self._pair_index(low_index[rows + low], high_index[rows + high])
+            x_mid, y_mid = self.x[index], self.y[index]
+
+        # Края прореживаются с той же плотностью точек
+        downsample = self._peak_downsample if peaks else self._extreme_points
+        parts_x, parts_y = [], []
+        for lo, hi in ((start, first * size), (last * size, stop)):
+            if hi > lo:
+                edge = downsample(self.x[lo:hi], self.y[lo:hi], 2 * -(-(hi - lo) // bucket))
+                parts_x.append(edge[0])
+                parts_y.append(edge[1])
+        parts_x.insert(1 if first * size > start else 0, x_mid)
+        parts_y.insert(1 if first * size > start else 0, y_mid)
+        return np.concatenate(parts_x), np.concatenate(parts_y)
+
+    def memory_arrays(self):
+        """
+        Массивы серии и пирамиды (см. MemoryBudget).
+        """
+        arrays = [self.x, self.y]
+        for _, *level in self._pyramid or ():
+            arrays += level
+        return arrays
+
+    def memory_overhead(self):
+        return 0
+
+    def memory_usage(self):
+        """
+        Память серии: общий с другими сериями X учитывается в каждой.
+
+        :return: Кортеж (байт в памяти, байт вытеснено на диск).
+        """
+        ram = sum(array_bytes(array) for array in self.memory_arrays())
+        disk = sum(array.nbytes for array in (self.x, self.y) if not array_bytes(array))
+        return ram, disk
+
+    def spillable(self):
+        # Данные загружающейся серии заменяются с каждым блоком, их вытеснение бесполезно
+        return not self.streaming and bool(array_bytes(self.x) or array_bytes(self.y))
+
+    def spill(self):
+        """
+        Вытеснение X и Y во временные файлы, в памяти остаётся пирамида.
+        Версия меняется, чтобы инструменты отпустили индексы по прежним массивам.
+        """
+        with self._lock:
+            if self._pyramid is None:
+                self._build_pyramid()
+            self.x = MemoryBudget.spill_array(self.x)
+            self.y = MemoryBudget.spill_array(self.y)
+            self.version += 1
+
+    def update(self, x, y, order=None):
+        """
+        Замена данных серии, например, после дозагрузки блока файла.
+        Если новые массивы продолжают старые, упорядоченность проверяется только для новой части.
+
+        :param x: Значения по оси X.
+        :param y: Значения по оси Y.
+        :param order: Упорядоченность нового X (ColumnOrder), если уже известна.
+        :return:
+        """
+        x = np.asarray(x, dtype=np.float64)
+        with self._lock:
+            old = len(self.x)
+            if order is not None and order.length == len(x):
+                self.order = order
+            elif len(x) >= old and np.shares_memory(x[:old], self.x):
+                self.order = self.order.extend(x)
+            else:
+                self.order = ColumnOrder.detect(x)
+
+            self.x = x
+            self.y = np.asarray(y, dtype=np.float64)
+            self.version += 1
+            self.invalidate()
+
+    def invalidate(self):
+        """
+        Сброс кэша прореженных данных после изменения массивов.
+        """
+        self._cache.clear()
+        self._pyramid = None
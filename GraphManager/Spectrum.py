@@ -0,0 +1,423 @@
+import numpy as np
+import pyqtgraph as pg
+from PySide6 import QtCore, QtWidgets
+
+from CSVManager.ColumnOrder import ColumnOrder
+
+# Виды спектрального анализа
+SPECTRUM_FFT = 'fft'
+SPECTRUM_WELCH = 'welch'
+SPECTRUM_SPECTROGRAM = 'spectrogram'
+
+# Количество отсчётов, обрабатываемых за один проход: ограничивает память на временные массивы
+BATCH_SAMPLES = 1 << 20
+
+
+def uniform_samples(x, y, step=None):
+    """
+    Отсчёты Y с постоянным шагом по X.
+
+    Равномерные данные используются как есть, остальные упорядочиваются и
+    интерполируются на сетку с медианным шагом соседних точек.
+
+    :param x: Значения по оси X.
+    :param y: Значения по оси Y.
+    :param step: Шаг равномерной сетки, если уже известен (см. ColumnOrder.step).
+    :return: Кортеж (отсчёты, шаг, X первого отсчёта) или None, если точек меньше двух.
+    """
+    finite = np.isfinite(x)
+    if not finite.all():
+        x, y = x[finite], y[finite]
+    if len(x) < 2:
+        return None
+    if step is not None:
+        return y, step, float(x[0])
+
+    permutation, x, order = ColumnOrder.detect(x).sorted_view(x)
+    if permutation is not None:
+        y = y[permutation]
+    if order.step is not None:
+        return y, order.step, float(x[0])
+
+    # Медиана шагов по равномерной выборке соседних пар
+    pairs = np.linspace(0, len(x) - 2, min(len(x) - 1, 100000)).astype(np.int64)
+    steps = x[pairs + 1] - x[pairs]
+    steps = steps[steps > 0]
+    if not len(steps):
+        return None
+    step = float(np.median(steps))
+    # Сетка не длиннее нескольких исходных длин, даже если шаги сильно различаются
+    count = min(int((x[-1] - x[0]) / step) + 1, 4 * len(x))
+    grid = x[0] + step * np.arange(count)
+    return np.interp(grid, x, y), step, float(x[0])
+
+
+def _segment_starts(n, segment, overlap):
+    return np.arange(0, n - segment + 1, segment - overlap)
+
+
+def _segment_power(y, segment, starts, window, is_cancelled, batch=None):
+    """
+    Мощность спектра сегментов по частям: одновременно в памяти не больше BATCH_SAMPLES отсчётов.
+    Из каждого сегмента вычитается среднее, пропуски (NaN) заменяются нулём.
+
+    :param batch: Количество сегментов в части, по умолчанию по BATCH_SAMPLES.
+    :return: Генератор кортежей (номер первого сегмента части, массив мощностей сегментов × частот).
+    """
+    frames = np.lib.stride_tricks.sliding_window_view(y, segment)
+    batch = batch or max(BATCH_SAMPLES // segment, 1)
+    for first in range(0, len(starts), batch):
+        if is_cancelled():
+            return
+        part = frames[starts[first:first + batch]]
+        part = np.nan_to_num(part - np.nanmean(part, axis=1, keepdims=True)) if np.isnan(part).any() else \
+            part - part.mean(axis=1, keepdims=True)
+        spectrum = np.fft.rfft(part * window, axis=1)
+        yield first, spectrum.real ** 2 + spectrum.imag ** 2
+
+
+def _one_sided(power, segment):
+    # Мощность отрицательных частот переносится на положительные, кроме нулевой и частоты Найквиста
+    power[..., 1:(segment + 1) // 2] *= 2
+    return power
+
+
+def fft_spectrum(y, step, max_segment=1 << 20, is_cancelled=None):
+    """
+    Амплитудный спектр. Ряд длиннее max_segment делится на сегменты без перекрытия,
+    мощности сегментов усредняются (метод Бартлетта).
+
+    :param y: Равномерные отсчёты.
+    :param step: Шаг отсчётов по X.
+    :param max_segment: Наибольшая длина одного преобразования.
+    :param is_cancelled: Функция без аргументов, True - прервать расчёт.
+    :return: Кортеж (частоты, амплитуды) или None, если расчёт прерван.
+    """
+    is_cancelled = is_cancelled or (lambda: False)
+    segment = min(len(y), max_segment)
+    window = np.hanning(segment) if segment > 2 else np.ones(segment)
+    total = np.zeros(segment // 2 + 1)
+    starts = _segment_starts(len(y), segment, 0)
+    for _, power in _segment_power(y, segment, starts, window, is_cancelled):
+        total += power.sum(axis=0)
+    if is_cancelled():
+        return None
+    # Амплитуда синусоиды: модуль гармоники - половина амплитуды, умноженная на сумму окна
+    amplitude = np.sqrt(total / len(starts)) / window.sum()
+    amplitude[1:(segment + 1) // 2] *= 2
+    return np.fft.rfftfreq(segment, step), amplitude
+
+
+def welch_psd(y, step, segment=1024, overlap=None, is_cancelled=None):
+    """
+    Спектральная плотность мощности методом Уэлча: окно Ханна, перекрытие сегментов
+    по умолчанию наполовину.
+
+    :param y: Равномерные отсчёты.
+    :param step: Шаг отсчётов по X.
+    :param segment: Длина сегмента.
+    :param overlap: Перекрытие соседних сегментов в отсчётах.
+    :param is_cancelled: Функция без аргументов, True - прервать расчёт.
+    :return: Кортеж (частоты, плотность мощности) или None, если расчёт прерван.
+    """
+    is_cancelled = is_cancelled or (lambda: False)
+    segment = min(segment, len(y))
+    overlap = segment // 2 if overlap is None else overlap
+    window = np.hanning(segment) if segment > 2 else np.ones(segment)
+    starts = _segment_starts(len(y), segment, overlap)
+    total = np.zeros(segment // 2 + 1)
+    for _, power in _segment_power(y, segment, starts, window, is_cancelled):
+        total += power.sum(axis=0)
+    if is_cancelled():
+        return None
+    psd = _one_sided(total / len(starts), segment) * step / (window * window).sum()
+    return np.fft.rfftfreq(segment, step), psd
+
+
+def spectrogram(y, step, segment=256, overlap=None, max_columns=1000, is_cancelled=None):
+    """
+    Спектрограмма: плотность мощности по сегментам. Если сегментов больше max_columns,
+    соседние сегменты усредняются по группам, так что размер результата ограничен.
+
+    :param y: Равномерные отсчёты.
+    :param step: Шаг отсчётов по X.
+    :param segment: Длина сегмента.
+    :param overlap: Перекрытие соседних сегментов в отсчётах.
+    :param max_columns: Наибольшее количество столбцов результата.
+    :param is_cancelled: Функция без аргументов, True - прервать расчёт.
+    :return: Кортеж (смещения центров столбцов по X от первого отсчёта, частоты,
+        плотность мощности столбцов × частот) или None, если расчёт прерван.
+    """
+    is_cancelled = is_cancelled or (lambda: False)
+    segment = min(segment, len(y))
+    overlap = segment // 2 if overlap is None else overlap
+    window = np.hanning(segment) if segment > 2 else np.ones(segment)
+    starts = _segment_starts(len(y), segment, overlap)
+    group = -(-len(starts) // max_columns)
+    columns = -(-len(starts) // group)
+
+    psd = np.zeros((columns, segment // 2 + 1))
+    # Части начинаются на границе группы, поэтому группа не делится между частями
+    batch = max(BATCH_SAMPLES // segment // group, 1) * group
+    for first, power in _segment_power(y, segment, starts, window, is_cancelled, batch):
+        psd[first // group:first // group + -(-len(power) // group)] = \
+            np.add.reduceat(power, np.arange(0, len(power), group), axis=0)
+    if is_cancelled():
+        return None
+
+    counts = np.full(columns, group)
+    counts[-1] = len(starts) - group * (columns - 1)
+    psd = _one_sided(psd / counts[:, None], segment) * step / (window * window).sum()
+    centers = np.add.reduceat(starts + segment / 2, np.arange(0, len(starts), group)) / counts * step
+    return centers, np.fft.rfftfreq(segment, step), psd
+
+
+def compute_spectrum(mode, x, y, step=None, segment=1024, is_cancelled=None):
+    """
+    Спектральный анализ участка серии.
+
+    :param mode: SPECTRUM_FFT, SPECTRUM_WELCH или SPECTRUM_SPECTROGRAM.
+    :param x: Значения по оси X.
+    :param y: Значения по оси Y.
+    :param step: Шаг равномерной сетки X, если уже известен.
+    :param segment: Длина сегмента для Уэлча и спектрограммы.
+    :param is_cancelled: Функция без аргументов, True - прервать расчёт.
+    :return: Словарь: mode, step, points, freqs, values (для спектрограммы - столбцы × частоты)
+        и для спектрограммы times; None, если точек мало или расчёт прерван.
+    """
+    samples = uniform_samples(np.asarray(x, dtype=np.float64), np.asarray(y, dtype=np.float64), step)
+    if samples is None:
+        return None
+    y, step, x0 = samples
+    result = {"mode": mode, "step": step, "points": len(y)}
+    if mode == SPECTRUM_FFT:
+        computed = fft_spectrum(y, step, is_cancelled=is_cancelled)
+    elif mode == SPECTRUM_WELCH:
+        computed = welch_psd(y, step, segment, is_cancelled=is_cancelled)
+    elif mode == SPECTRUM_SPECTROGRAM:
+        computed = spectrogram(y, step, segment, is_cancelled=is_cancelled)
+        if computed is not None:
+            times, *computed = computed
+            result["times"] = x0 + times
+    else:
+        raise ValueError(f"неизвестный вид спектра {mode!r}")
+    if computed is None:
+        return None
+    result["freqs"], result["values"] = computed
+    return result
+
+
+class SpectrumThread(QtCore.QThread):
+    """
+    Поток расчёта спектра. Прерывается через requestInterruption().
+    """
+    computed = QtCore.Signal(object)
+    error_occurred = QtCore.Signal(str)
+
+    def __init__(self, mode, x, y, step=None, segment=1024, parent=None):
+        super().__init__(parent)
+        self.mode = mode
+        self.x = x
+        self.y = y
+        self.step = step
+        self.segment = segment
+
+    def run(self):
+        try:
+            result = compute_spectrum(self.mode, self.x, self.y, self.step, self.segment,
+                                      is_cancelled=self.isInterruptionRequested)
+        except (ValueError, MemoryError) as e:
+            self.error_occurred.emit(str(e))
+            return
+        if result is not None and not self.isInterruptionRequested():
+            self.computed.emit(result)
+
+
+class SpectrumPanel(QtWidgets.QWidget):
+    """
+    Спектр выбранной серии под сеткой графиков.
+
+    Считается в отдельном потоке по видимому на графиках диапазону X и
+    пересчитывается после изменения масштаба. Новый запрос прерывает ещё
+    не законченный расчёт.
+    """
+
+    modes = ((SPECTRUM_FFT, "Амплитудный спектр (БПФ)"), (SPECTRUM_WELCH, "Плотность мощности (Уэлч)"),
+             (SPECTRUM_SPECTROGRAM, "Спектрограмма"))
+
+    def __init__(self, plot_grid, delay=300, parent=None):
+        """
+        :param plot_grid: Сетка графиков PlotGrid.
+        :param delay: Задержка пересчёта после изменения диапазона или данных, мс.
+        :param parent: Родительский виджет.
+        """
+        super().__init__(parent)
+        self.plot_grid = plot_grid
+        self._enabled = False
+        self._thread = None
+        # Расчёт, ожидающий окончания прерванного
+        self._restart = False
+        self._range_plot = None
+
+        self.series_combobox = QtWidgets.QComboBox()
+        self.mode_combobox = QtWidgets.QComboBox()
+        for mode, title in self.modes:
+            self.mode_combobox.addItem(title, mode)
+        self.segment_combobox = QtWidgets.QComboBox()
+        for size in (256, 1024, 4096, 16384, 65536):
+            self.segment_combobox.addItem(str(size), size)
+        self.segment_combobox.setCurrentIndex(1)
+        self.segment_combobox.setToolTip("Длина сегмента для метода Уэлча и спектрограммы")
+        self.info_label = QtWidgets.QLabel()
+
+        controls = QtWidgets.QHBoxLayout()
+        controls.addWidget(self.series_combobox, 1)
+        controls.addWidget(self.mode_combobox)
+        controls.addWidget(self.segment_combobox)
+        controls.addWidget(self.info_label)
+
+        self.plot_widget = pg.PlotWidget()
+        self.plot_widget.showGrid(x=True, y=True)
+        self.plot_widget.setLabel('bottom', "Частота")
+        self.curve = self.plot_widget.plot(pen=pg.mkPen("#1f77b4"))
+        self.image = pg.ImageItem()
+        self.image.setColorMap(pg.colormap.get("viridis"))
+        self.plot_widget.addItem(self.image)
+
+        layout = QtWidgets.QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+        layout.addLayout(controls)
+        layout.addWidget(self.plot_widget, 1)
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setSingleShot(True)
+        self._timer.setInterval(delay)
+        self._timer.timeout.connect(self.compute)
+
+        self.series_combobox.currentIndexChanged.connect(self.refresh)
+        self.mode_combobox.currentIndexChanged.connect(self.refresh)
+        self.segment_combobox.currentIndexChanged.connect(self.refresh)
+
+    def attach(self):
+        """
+        Включение пересчёта спектра при изменении диапазона и набора графиков.
+        """
+        if not self._enabled:
+            self._enabled = True
+            self.plot_grid.layout_changed.connect(self._on_layout_changed)
+        self._on_layout_changed()
+
+    def detach(self):
+        """
+        Отключение пересчёта и прерывание текущего расчёта.
+        """
+        if self._enabled:
+            self._enabled = False
+            self.plot_grid.layout_changed.disconnect(self._on_layout_changed)
+        self._connect_range(None)
+        self._timer.stop()
+        self._restart = False
+        if self._thread is not None:
+            self._thread.requestInterruption()
+
+    def _connect_range(self, plot):
+        if self._range_plot is not None:
+            self._range_plot.sigXRangeChanged.disconnect(self.refresh)
+        self._range_plot = plot
+        if plot is not None:
+            plot.sigXRangeChanged.connect(self.refresh)
+
+    def _on_layout_changed(self):
+        # Графики связаны по X с первым, его диапазона достаточно
+        self._connect_range(self.plot_grid.plots[0] if self.plot_grid.plots else None)
+        self.refresh()
+
+    def _series(self):
+        return [series for _, _, series in self.plot_grid.items()]
+
+    def _update_series_list(self):
+        names = [series.name for series in self._series()]
+        if names == [self.series_combobox.itemText(i) for i in range(self.series_combobox.count())]:
+            return
+        current = self.series_combobox.currentText()
+        self.series_combobox.blockSignals(True)
+        self.series_combobox.clear()
+        self.series_combobox.addItems(names)
+        if current in names:
+            self.series_combobox.setCurrentIndex(names.index(current))
+        self.series_combobox.blockSignals(False)
+
+    def refresh(self, *args):
+        """
+        Отложенный пересчёт, например, после изменения диапазона или дозагрузки данных.
+        Таймер не перезапускается, чтобы непрерывная прокрутка не откладывала пересчёт.
+        """
+        if self._enabled and not self._timer.isActive():
+            self._timer.start()
+
+    def compute(self):
+        """
+        Запуск расчёта спектра видимой части выбранной серии.
+        """
+        if not self._enabled:
+            return
+        if self._thread is not None and self._thread.isRunning():
+            # Один расчёт за раз: новый запускается по окончании прерванного
+            self._restart = True
+            self._thread.requestInterruption()
+            return
+
+        self._update_series_list()
+        series_list = self._series()
+        index = self.series_combobox.currentIndex()
+        if not 0 <= index < len(series_list):
+            self.curve.setData([], [])
+            self.image.clear()
+            self.info_label.setText("")
+            return
+        series = series_list[index]
+
+        plot = self.plot_grid.plots[0]
+        if plot.vb.autoRangeEnabled()[0]:
+            start, stop = 0, len(series)
+        else:
+            start, stop = series.visible_slice(*plot.vb.viewRange()[0])
+        # Шаг равномерной серии известен заранее и верен для любого её участка
+        step = series.order.step if series.order.length == len(series) else None
+        self._thread = SpectrumThread(self.mode_combobox.currentData(), series.x[start:stop], series.y[start:stop],
+                                      step, self.segment_combobox.currentData(), parent=self)
+        self._thread.computed.connect(self._on_computed)
+        self._thread.error_occurred.connect(self.info_label.setText)
+        self._thread.finished.connect(self._on_finished)
+        self._thread.start(QtCore.QThread.LowPriority)
+
+    def _on_finished(self):
+        thread, self._thread = self._thread, None
+        if thread is not None:
+            thread.deleteLater()
+        if self._restart:
+            self._restart = False
+            self.compute()
+
+    def _on_computed(self, result):
+        freqs, values = result["freqs"], result["values"]
+        is_image = result["mode"] == SPECTRUM_SPECTROGRAM
+        self.curve.setVisible(not is_image)
+        self.image.setVisible(is_image)
+        if is_image:
+            times = result["times"]
+            width = times[-1] - times[0] if len(times) > 1 else result["step"] * result["points"]
+            self.plot_widget.setLogMode(y=False)
+            self.plot_widget.setLabel('bottom', "X")
+            self.plot_widget.setLabel('left', "Частота")
+            self.image.setImage(10 * np.log10(values + np.finfo(np.float64).tiny), autoLevels=True)
+            self.image.setRect(QtCore.QRectF(times[0], 0, width or 1.0, freqs[-1] or 1.0))
+        else:
+            is_psd = result["mode"] == SPECTRUM_WELCH
+            # Плотность мощности - в логарифмическом масштабе, без нулевой частоты
+            self.plot_widget.setLogMode(y=is_psd)
+            self.plot_widget.setLabel('bottom', "Частота")
+            self.plot_widget.setLabel('left', "Плотность мощности" if is_psd else "Амплитуда")
+            self.curve.setData(freqs[1:] if is_psd else freqs, values[1:] if is_psd else values)
+        self.plot_widget.autoRange()
+        self.info_label.setText(f"{result['points']} точек, шаг {result['step']:.4g}")
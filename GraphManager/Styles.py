@@ -0,0 +1,49 @@
+from functools import lru_cache
+
+import pyqtgraph as pg
+
+# Цвет обводки точек по умолчанию (как в pyqtgraph)
+SYMBOL_OUTLINE = (200, 200, 200)
+
+
+@lru_cache(maxsize=None)
+def pen(color, width=1):
+    """
+    Общее перо для цвета и толщины.
+
+    pyqtgraph различает стили точек по объекту пера, поэтому одно и то же перо
+    при каждой перерисовке не заставляет заново рисовать символы.
+
+    :param color: Цвет в формате, понятном pg.mkPen.
+    :param width: Толщина линии.
+    :return: QPen, который нельзя изменять.
+    """
+    return pg.mkPen(color=color, width=width)
+
+
+@lru_cache(maxsize=None)
+def brush(color):
+    """
+    Общая кисть для цвета.
+
+    :param color: Цвет в формате, понятном pg.mkBrush.
+    :return: QBrush, который нельзя изменять.
+    """
+    return pg.mkBrush(color)
+
+
+def curve_style(color, is_line):
+    """
+    Параметры plot() для серии из общих ресурсов.
+
+    :param color: Цвет серии.
+    :param is_line: Соединять ли точки линией.
+    :return: Словарь именованных аргументов.
+    """
+    return {
+        "pen": pen(color, 2) if is_line else None,
+        "symbol": "o",
+        "symbolPen": pen(SYMBOL_OUTLINE),
+        "symbolBrush": brush(color),
+    }
+
@@ -0,0 +1,28 @@
+import importlib.util
+import sys
+
+
+def lazy_import(name):
+    """
+    Отложенный импорт модуля.
+
+    Модуль регистрируется сразу, а выполняется при первом обращении к его
+    атрибуту, поэтому тяжёлые зависимости (pyqtgraph, numpy) не замедляют
+    запуск, пока не понадобятся.
+
+    :param name: Полное имя модуля.
+    :return: Модуль.
+    """
+    module = sys.modules.get(name)
+    if module is not None:
+        return module
+
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named '{name}'", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
@@ -0,0 +1,819 @@
+"""
+Локальный сервис разбора и прореживания CSV файлов.
+
+Сервис держит общий кэш разобранных файлов и отвечает на запросы по
+Unix-сокету (в Windows - по localhost): загрузить файл, получить столбец,
+прореженную серию для диапазона X или PNG с графиком. Данные передаются
+через разделяемую память, поэтому повторный запрос к уже разобранному
+файлу обслуживается из памяти без повторного разбора.
+
+Запуск сервиса: python PlotService.py serve
+Запросы из командной строки: python PlotService.py load|series|render ..., список - python PlotService.py --help.
+GraphBuilder подключается к запущенному сервису сам.
+
+По умолчанию сервис личный: сокет лежит в каталоге, доступном только
+пользователю, а клиенты и сервис проверяют друг друга ключом из файла с
+правами 0600 в том же каталоге. Общий сервис для нескольких пользователей
+запускается с явным адресом и общим ключом (GRAPHBUILDER_SERVICE_KEY).
+"""
+import argparse
+import json
+import os
+import queue
+import secrets
+import stat
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from multiprocessing import connection, shared_memory
+
+import numpy as np
+
+from CSVManager.ColumnOrder import ColumnOrder
+from CSVManager.Filters import RowFilter
+from CSVManager.Dataset import DatasetCache
+from CSVManager.Loading import load_dataset
+from CSVManager.Memory import MemoryBudget
+from CSVManager.ParseErrors import ON_ERROR_NAN, ParseErrorIndex
+from GraphManager.Series import Series
+
+# Адрес сервиса: путь к сокету или host:port
+ADDRESS_ENV = "GRAPHBUILDER_SERVICE"
+# Ключ проверки клиентов и сервиса, по умолчанию - из файла в личном каталоге сервиса
+AUTHKEY_ENV = "GRAPHBUILDER_SERVICE_KEY"
+# Файл ключа в личном каталоге
+KEY_FILE = "service.key"
+
+DEFAULT_PORT = 47653
+
+
+class ServiceError(RuntimeError):
+    """
+    Ошибка, возвращённая сервисом в ответ на запрос.
+    """
+
+
+def _check_private(path):
+    """
+    Проверка, что файл или каталог принадлежит текущему пользователю и недоступен остальным.
+    """
+    if os.name != "posix":
+        return
+    info = os.lstat(path)
+    if info.st_uid != os.getuid():
+        raise PermissionError(f"{path} принадлежит другому пользователю")
+    if info.st_mode & 0o077:
+        if stat.S_ISLNK(info.st_mode):
+            raise PermissionError(f"{path} - символическая ссылка")
+        os.chmod(path, stat.S_IMODE(info.st_mode) & 0o700)
+
+
+def user_directory():
+    """
+    Личный каталог сервиса: сокет и файл ключа. XDG_RUNTIME_DIR/graphbuilder
+    или ~/.graphbuilder, доступный только текущему пользователю.
+
+    :return: Путь к каталогу.
+    """
+    runtime = os.environ.get("XDG_RUNTIME_DIR") if os.name == "posix" else None
+    path = os.path.join(runtime or os.path.expanduser("~"), "graphbuilder" if runtime else ".graphbuilder")
+    os.makedirs(path, mode=0o700, exist_ok=True)
+    _check_private(path)
+    return path
+
+
+def default_address():
+    """
+    Адрес сервиса из переменной окружения GRAPHBUILDER_SERVICE или адрес по умолчанию:
+    сокет в личном каталоге (в Windows - порт localhost).
+
+    :return: Путь к Unix-сокету или кортеж (host, port).
+    """
+    address = os.environ.get(ADDRESS_ENV)
+    if address:
+        return parse_address(address)
+    if os.name == "posix":
+        return os.path.join(user_directory(), "service.sock")
+    return "127.0.0.1", DEFAULT_PORT
+
+
+def parse_address(text):
+    """
+    Адрес из строки: host:port или путь к сокету.
+    """
+    host, _, port = text.rpartition(":")
+    return (host, int(port)) if host and port.isdigit() else text
+
+
+def _authkey(create=False):
+    """
+    Ключ проверки: из переменной окружения или из файла в личном каталоге.
+    Без ключа сервис не запускается и к нему не подключаются.
+
+    :param create: Создать файл ключа, если его нет (при запуске сервиса).
+    :return: Байты ключа.
+    """
+    key = os.environ.get(AUTHKEY_ENV)
+    if key:
+        return key.encode()
+    path = os.path.join(user_directory(), KEY_FILE)
+    if create:
+        try:
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass
+        else:
+            with os.fdopen(fd, "w") as file:
+                file.write(secrets.token_hex(32))
+    _check_private(path)
+    with open(path, "rb") as file:
+        return file.read().strip()
+
+
+def _attach(name):
+    """
+    Подключение к блоку разделяемой памяти сервиса без передачи его трекеру ресурсов
+    клиента: иначе блок удалялся бы при завершении клиента.
+    """
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        block = shared_memory.SharedMemory(name)
+        if os.name == "posix":
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(block._name, "shared_memory")
+        return block
+
+
+class PlotService:
+    """
+    Сервис: общий кэш наборов данных, очередь запросов и блоки разделяемой памяти с ответами.
+
+    Каждое подключение читается своим потоком, а сами запросы выполняются
+    пулом из workers потоков. Файл с одними параметрами разбирается один раз,
+    даже если его одновременно запросили несколько клиентов. Отрисовка PNG
+    выполняется в главном потоке, где создано QApplication.
+
+    Запросы и ответы - JSON (объекты Python не передаются), числовые данные
+    ответа лежат в блоке разделяемой памяти, который сервис хранит, пока
+    суммарный размер блоков не превысит cache_bytes. Разобранными хранятся
+    max_datasets давно запрошенных наборов данных.
+    """
+
+    def __init__(self, address=None, workers=4, cache_bytes=512 << 20, renderer=None, max_datasets=16):
+        """
+        :param address: Адрес сервиса, по умолчанию default_address().
+        :param workers: Количество потоков обработки запросов.
+        :param cache_bytes: Суммарный размер хранимых блоков разделяемой памяти.
+        :param renderer: Функция отрисовки PNG (см. render_png), None - запрос render недоступен.
+        :param max_datasets: Количество хранимых наборов данных.
+        """
+        self.address = address or default_address()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            # Сокет остался от завершившегося сервиса; чужой файл не удаляется
+            if os.name == "posix" and os.lstat(self.address).st_uid != os.getuid():
+                raise PermissionError(f"{self.address} принадлежит другому пользователю")
+            os.unlink(self.address)
+        self.listener = connection.Listener(self.address, authkey=_authkey(create=True))
+        if isinstance(self.address, str) and os.name == "posix":
+            os.chmod(self.address, 0o600)
+        self.cache_bytes = cache_bytes
+        self.renderer = renderer
+        self.max_datasets = max_datasets
+
+        self._executor = ThreadPoolExecutor(workers)
+        self._main_queue = queue.Queue()
+        self._running = True
+        self._lock = threading.Lock()
+        # Загрузки по ключу (файл, фильтр, политика ошибок): Future и набор данных по мере разбора,
+        # в порядке последнего обращения
+        self._loads = OrderedDict()
+        self._partial = {}
+        # Серии с кэшем прореживания и блоки памяти с ответами
+        self._series = OrderedDict()
+        self._blocks = OrderedDict()
+        self._blocks_size = 0
+
+    def serve_forever(self):
+        """
+        Приём подключений в отдельном потоке, отрисовка - в текущем до запроса shutdown.
+        """
+        threading.Thread(target=self._accept, daemon=True).start()
+        while self._running:
+            try:
+                function, future = self._main_queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(function())
+                except Exception as e:
+                    future.set_exception(e)
+        self.close()
+
+    def close(self):
+        self._running = False
+        self.listener.close()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        with self._lock:
+            for block, _ in self._blocks.values():
+                block.close()
+                block.unlink()
+            self._blocks.clear()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+
+    def _accept(self):
+        while self._running:
+            try:
+                conn = self.listener.accept()
+            except (OSError, EOFError, connection.AuthenticationError):
+                continue
+            threading.Thread(target=self._serve_connection, args=(conn,), daemon=True).start()
+
+    def _serve_connection(self, conn):
+        with conn:
+            while self._running:
+                try:
+                    request = json.loads(conn.recv_bytes())
+                except (EOFError, OSError):
+                    return
+                except ValueError:
+                    conn.send_bytes(json.dumps({"ok": False, "error": "запрос не в формате JSON"}).encode())
+                    continue
+                try:
+                    response = self._executor.submit(self.handle, request).result()
+                except Exception as e:
+                    response = {"ok": False, "error": str(e)}
+                conn.send_bytes(json.dumps(response).encode())
+
+    def handle(self, request):
+        """
+        Выполнение одного запроса.
+
+        :param request: Словарь с полем op и параметрами операции.
+        :return: Словарь ответа.
+        """
+        operation = getattr(self, f"_op_{request.get('op')}", None)
+        if operation is None:
+            raise ValueError(f"неизвестная операция {request.get('op')!r}")
+        response = operation(request)
+        response["ok"] = True
+        return response
+
+    def _op_ping(self, request):
+        return {"pid": os.getpid(), "loads": len(self._loads), "blocks": len(self._blocks),
+                "blocks_size": self._blocks_size}
+
+    def _op_shutdown(self, request):
+        self._running = False
+        return {}
+
+    def _op_load(self, request):
+        """
+        Запуск разбора файла, если он ещё не начат, и состояние разбора.
+        С wait=True ответ приходит после окончания разбора.
+        """
+        future, dataset = self._load(request)
+        if request.get("wait"):
+            dataset = future.result()
+        return self._status(future, dataset)
+
+    def _op_column(self, request):
+        """
+        Числовой столбец или производный столбец (выражение) в разделяемой памяти.
+        """
+        dataset = self._dataset(request)
+        name = request["name"]
+        if name not in dataset.headers:
+            dataset.add_derived(name)
+        values = dataset.float_column(name)
+        return self._publish(("column", dataset.file_path, dataset.filter_key, dataset.fingerprint,
+                              dataset.on_error, name, len(values)), {"values": values})
+
+    def _op_labels(self, request):
+        """
+        Значения столбца строками, начиная со строки start.
+        """
+        return {"values": self._dataset(request).raw_column(request["name"], request.get("start", 0))}
+
+    def _op_series(self, request):
+        """
+        Серия x, y, прореженная для диапазона [x_min, x_max] до max_points точек.
+        """
+        dataset = self._dataset(request)
+        series = self._series_of(dataset, request["x"], request["y"])
+        start, stop = series.visible_slice(request.get("x_min", -np.inf), request.get("x_max", np.inf))
+        max_points = int(request.get("max_points", 2000))
+        key = ("series", dataset.file_path, dataset.filter_key, dataset.fingerprint, dataset.on_error,
+               request["x"], request["y"], len(series), start, stop, max_points)
+        with self._lock:
+            if key in self._blocks:
+                self._blocks.move_to_end(key)
+                return {"data": self._blocks[key][1]}
+        x, y = series.downsample(request.get("x_min", -np.inf), request.get("x_max", np.inf), max_points)
+        return self._publish(key, {"x": x, "y": y})
+
+    def _op_render(self, request):
+        """
+        PNG с графиками столбцов y от x, отрисовывается в главном потоке.
+        """
+        if self.renderer is None:
+            raise ValueError("сервис запущен без отрисовки")
+        dataset = self._dataset(request)
+        series = [self._series_of(dataset, request["x"], name) for name in request["y"]]
+        future = Future()
+        self._main_queue.put((lambda: self.renderer(series, **request.get("options", {})), future))
+        png = np.frombuffer(future.result(), dtype=np.uint8)
+        return self._publish(None, {"png": png})
+
+    def _load(self, request):
+        """
+        Future разбора и набор данных: разбор запускается один раз на ключ.
+        """
+        row_filter = RowFilter(request.get("filter", ())) or None
+        on_error = request.get("on_error", ON_ERROR_NAN)
+        file_path = os.path.abspath(request["file"])
+        key = (file_path, row_filter.key if row_filter else (), on_error)
+        with self._lock:
+            future = self._loads.get(key)
+            stale = future is not None and future.done() and \
+                (future.exception() is not None or not self._partial[key].is_current())
+            if future is None or stale:
+                started = threading.Event()
+
+                def on_start(dataset):
+                    self._partial[key] = dataset
+                    started.set()
+
+                def run():
+                    try:
+                        dataset = load_dataset(file_path, on_error=on_error, row_filter=row_filter,
+                                               on_start=on_start)
+                    finally:
+                        started.set()
+                    # Давно не запрошенные файлы вытесняются на диск (бюджет - GRAPHBUILDER_MEMORY_MB)
+                    MemoryBudget.enforce()
+                    return dataset
+
+                self._loads[key] = future = Future()
+                self._loads.move_to_end(key)
+                # Разбор идёт вне очереди запросов, чтобы не занимать её потоки надолго
+                threading.Thread(target=self._run_load, args=(run, future), daemon=True).start()
+                self._evict_loads()
+            else:
+                self._loads.move_to_end(key)
+                started = None
+            dataset = self._partial.get(key)
+        if started is not None:
+            started.wait()
+            with self._lock:
+                dataset = self._partial.get(key)
+        if dataset is None or (future.done() and future.exception() is not None):
+            # Разбор завершился ошибкой: result() дожидается её и выбрасывает
+            future.result()
+        return future, dataset
+
+    def _evict_loads(self):
+        """
+        Удаление давно не запрошенных завершённых загрузок сверх max_datasets
+        вместе с их сериями и записями в кэше наборов данных. Вызывается под блокировкой.
+        """
+        for key in list(self._loads):
+            if len(self._loads) <= self.max_datasets:
+                break
+            if not self._loads[key].done():
+                continue
+            del self._loads[key]
+            dataset = self._partial.pop(key, None)
+            if dataset is None:
+                continue
+            DatasetCache.discard(dataset)
+            for series_key in [series_key for series_key in self._series
+                               if series_key[:2] == (dataset.file_path, dataset.filter_key)]:
+                del self._series[series_key]
+
+    @staticmethod
+    def _run_load(run, future):
+        try:
+            future.set_result(run())
+        except Exception as e:
+            future.set_exception(e)
+
+    def _dataset(self, request):
+        future, dataset = self._load(request)
+        if request.get("wait", True):
+            dataset = future.result()
+        return dataset
+
+    @staticmethod
+    def _status(future, dataset):
+        return {"headers": dataset.headers, "rows": dataset.row_count, "complete": dataset.complete,
+                "version": dataset.version, "encoding": dataset.encoding, "delimiter": dataset.delimiter,
+                "errors": len(dataset.errors), "done": future.done()}
+
+    def _series_of(self, dataset, x_field, y_field):
+        key = (dataset.file_path, dataset.filter_key, dataset.fingerprint, dataset.on_error, x_field, y_field)
+        with self._lock:
+            series = self._series.get(key)
+        if series is None or len(series) != dataset.row_count:
+            for name in (x_field, y_field):
+                if name not in dataset.headers:
+                    dataset.add_derived(name)
+            series = Series(dataset.float_column(x_field), dataset.float_column(y_field), name=y_field,
+                            order=dataset.column_order(x_field))
+        with self._lock:
+            self._series[key] = series
+            self._series.move_to_end(key)
+            while len(self._series) > 64:
+                self._series.popitem(last=False)
+        return series
+
+    def _publish(self, key, arrays):
+        """
+        Запись массивов в новый блок разделяемой памяти.
+
+        :param key: Ключ для повторного использования блока, None - блок не переиспользуется.
+        :param arrays: Словарь {название: массив}.
+        :return: Ответ с описанием блока.
+        """
+        with self._lock:
+            if key is not None and key in self._blocks:
+                self._blocks.move_to_end(key)
+                return {"data": self._blocks[key][1]}
+
+        arrays = {name: np.ascontiguousarray(values) for name, values in arrays.items()}
+        size = sum(values.nbytes for values in arrays.values())
+        block = shared_memory.SharedMemory(create=True, size=max(size, 1))
+        layout = {"shm": block.name, "arrays": {}}
+        offset = 0
+        for name, values in arrays.items():
+            block.buf[offset:offset + values.nbytes] = values.tobytes()
+            layout["arrays"][name] = [offset, len(values), values.dtype.str]
+            offset += values.nbytes
+
+        with self._lock:
+            self._blocks[key if key is not None else ("once", block.name)] = (block, layout)
+            self._blocks_size += block.size
+            # Старые блоки удаляются, подключённые клиенты сохраняют свои копии
+            while self._blocks_size > self.cache_bytes and len(self._blocks) > 1:
+                _, (old, _) = self._blocks.popitem(last=False)
+                self._blocks_size -= old.size
+                old.close()
+                old.unlink()
+        return {"data": layout}
+
+
+class ServiceClient:
+    """
+    Клиент сервиса. Методы можно вызывать из разных потоков, запросы выполняются по очереди.
+    """
+
+    def __init__(self, address=None):
+        """
+        :param address: Адрес сервиса, по умолчанию default_address().
+        """
+        self.address = address or default_address()
+        if isinstance(self.address, str) and os.name == "posix" and not address and not os.environ.get(ADDRESS_ENV):
+            # Сокет по умолчанию должен быть создан сервисом этого же пользователя
+            _check_private(self.address)
+        self._conn = connection.Client(self.address, authkey=_authkey())
+        self._lock = threading.Lock()
+
+    @classmethod
+    def connect(cls, address=None):
+        """
+        Подключение к запущенному сервису.
+
+        :return: ServiceClient или None, если сервис не запущен, сокет чужой или ключ не подходит.
+        """
+        try:
+            return cls(address)
+        except (OSError, EOFError, connection.AuthenticationError):
+            return None
+
+    def close(self):
+        self._conn.close()
+
+    def request(self, op, **params):
+        """
+        Запрос к сервису.
+
+        :param op: Операция.
+        :param params: Параметры операции.
+        :return: Словарь ответа.
+        """
+        with self._lock:
+            self._conn.send_bytes(json.dumps(dict(params, op=op)).encode())
+            response = json.loads(self._conn.recv_bytes())
+        if not response.pop("ok"):
+            raise ServiceError(response["error"])
+        return response
+
+    def _arrays(self, op, **params):
+        """
+        Запрос, ответ на который лежит в разделяемой памяти: массивы копируются из блока.
+        """
+        for attempt in range(2):
+            layout = self.request(op, **params)["data"]
+            try:
+                block = _attach(layout["shm"])
+            except FileNotFoundError:
+                # Блок вытеснен между ответом и подключением - запрос повторяется
+                continue
+            try:
+                return {name: np.frombuffer(block.buf, dtype=dtype, count=length, offset=offset).copy()
+                        for name, (offset, length, dtype) in layout["arrays"].items()}
+            finally:
+                block.close()
+        raise ServiceError("блок данных удалён сервисом")
+
+    def ping(self):
+        return self.request("ping")
+
+    def shutdown(self):
+        return self.request("shutdown")
+
+    def load(self, file_path, on_error=ON_ERROR_NAN, conditions=(), wait=True):
+        """
+        Разбор файла сервисом.
+
+        :param file_path: Путь к файлу или папке с частями.
+        :param on_error: Политика обработки ошибок.
+        :param conditions: Условия фильтра строк.
+        :param wait: Дождаться окончания разбора.
+        :return: Состояние: headers, rows, complete, version, encoding, delimiter, errors, done.
+        """
+        return self.request("load", file=os.path.abspath(file_path), on_error=on_error, filter=list(conditions),
+                            wait=wait)
+
+    def column(self, file_path, name, on_error=ON_ERROR_NAN, conditions=(), wait=True):
+        """
+        Числовой столбец (или выражение производного столбца) в виде массива float64.
+        """
+        return self._arrays("column", file=os.path.abspath(file_path), name=name, on_error=on_error,
+                            filter=list(conditions), wait=wait)["values"]
+
+    def labels(self, file_path, name, start=0, on_error=ON_ERROR_NAN, conditions=(), wait=True):
+        """
+        Значения столбца строками.
+        """
+        return self.request("labels", file=os.path.abspath(file_path), name=name, start=start, on_error=on_error,
+                            filter=list(conditions), wait=wait)["values"]
+
+    def series(self, file_path, x, y, x_min=-np.inf, x_max=np.inf, max_points=2000,
+               on_error=ON_ERROR_NAN, conditions=()):
+        """
+        Серия, прореженная сервисом для диапазона X.
+
+        :return: Кортеж массивов (x, y).
+        """
+        # Путь относительно каталога клиента, а не сервиса
+        data = self._arrays("series", file=os.path.abspath(file_path), x=x, y=y, x_min=x_min, x_max=x_max, max_points=max_points,
+                            on_error=on_error, filter=list(conditions))
+        return data["x"], data["y"]
+
+    def render(self, file_path, x, y, on_error=ON_ERROR_NAN, conditions=(), **options):
+        """
+        PNG с графиками.
+
+        :param y: Список столбцов Y.
+        :param options: Параметры render_png (width, height, x_min, x_max, is_line).
+        :return: Байты PNG.
+        """
+        return self._arrays("render", file=os.path.abspath(file_path), x=x, y=list(y), on_error=on_error,
+                            filter=list(conditions), options=options)["png"].tobytes()
+
+
+class RemoteDataset:
+    """
+    Набор данных, разобранный сервисом, с интерфейсом Dataset для окна графиков.
+
+    Числовые столбцы запрашиваются у сервиса при первом обращении и
+    кэшируются до следующего обновления состояния разбора. Ошибки разбора
+    остаются в сервисе, здесь известно только их количество.
+    """
+
+    def __init__(self, client, file_path, on_error=ON_ERROR_NAN, row_filter=None):
+        """
+        :param client: ServiceClient.
+        :param file_path: Путь к файлу.
+        :param on_error: Политика обработки ошибок.
+        :param row_filter: Фильтр строк (RowFilter) или None.
+        """
+        self.client = client
+        self.file_path = file_path
+        self.on_error = on_error
+        self.row_filter = row_filter
+        self.conditions = row_filter.conditions if row_filter else ()
+        self.errors = ParseErrorIndex()
+        self.error_count = 0
+        self.headers = []
+        self.row_count = 0
+        self.complete = False
+        self.version = 0
+        self.encoding = None
+        self.delimiter = None
+        self._derived = []
+        self._float_columns = {}
+        self._orders = {}
+
+    def refresh(self):
+        """
+        Обновление состояния разбора без ожидания его окончания.
+
+        :return: True, если появились новые строки или разбор завершён.
+        """
+        status = self.client.load(self.file_path, self.on_error, self.conditions, wait=False)
+        changed = status["version"] != self.version or status["done"] != self.complete
+        self.headers = status["headers"]
+        self.row_count = status["rows"]
+        self.version = status["version"]
+        self.encoding = status["encoding"]
+        self.delimiter = status["delimiter"]
+        self.error_count = status["errors"]
+        self.complete = status["done"]
+        return changed
+
+    @property
+    def columns(self):
+        return self.headers + [name for name in self._derived if name not in self.headers]
+
+    @property
+    def filter_key(self):
+        return self.row_filter.key if self.row_filter else ()
+
+    def is_current(self):
+        return True
+
+    def add_derived(self, text):
+        if text not in self._derived:
+            self._derived.append(text)
+        return text
+
+    def float_column(self, name):
+        version, values = self._float_columns.get(name, (None, None))
+        if version != self.version:
+            values = self.client.column(self.file_path, name, self.on_error, self.conditions, wait=False)
+            self._float_columns[name] = (self.version, values)
+        return values
+
+    def column_order(self, name):
+        """
+        Упорядоченность столбца (см. Dataset.column_order), определяется по полученному массиву.
+        """
+        values = self.float_column(name)
+        order = self._orders.get(name)
+        if order is None or order.length > len(values) or name in self._derived:
+            order = ColumnOrder.detect(values)
+        else:
+            order = order.extend(values)
+        self._orders[name] = order
+        return order
+
+    def raw_column(self, name, start=0):
+        return self.client.labels(self.file_path, name, start, self.on_error, self.conditions, wait=False)
+
+
+def render_png(series, width=800, height=600, x_min=None, x_max=None, is_line=True):
+    """
+    Отрисовка серий на одном графике в PNG. Требует созданного QApplication.
+
+    :param series: Список серий (Series).
+    :param width: Ширина изображения.
+    :param height: Высота изображения.
+    :param x_min: Левая граница X, None - по данным.
+    :param x_max: Правая граница X, None - по данным.
+    :param is_line: Соединять точки линией.
+    :return: Байты PNG.
+    """
+    import pyqtgraph as pg
+    from PySide6 import QtCore, QtGui
+
+    from CSVLoader import CSVLoader
+    from GraphManager import Styles
+
+    widget = pg.GraphicsLayoutWidget()
+    widget.resize(width, height)
+    plot = widget.addPlot()
+    plot.addLegend()
+    plot.showGrid(x=True, y=True)
+    low = -np.inf if x_min is None else x_min
+    high = np.inf if x_max is None else x_max
+    for i, item in enumerate(series):
+        color = CSVLoader.colors[i % len(CSVLoader.colors)][1].name()
+        curve = plot.plot(name=item.name, **Styles.curve_style(color, is_line))
+        curve.setData(*item.downsample(low, high, max(width * 2, 500)))
+    if x_min is not None and x_max is not None:
+        plot.setXRange(x_min, x_max, padding=0)
+
+    image = QtGui.QImage(widget.size(), QtGui.QImage.Format_ARGB32)
+    image.fill(QtGui.QColor("black"))
+    painter = QtGui.QPainter(image)
+    widget.render(painter)
+    painter.end()
+    widget.close()
+
+    buffer = QtCore.QBuffer()
+    buffer.open(QtCore.QIODevice.WriteOnly)
+    image.save(buffer, "PNG")
+    return bytes(buffer.data())
+
+
+def serve(args):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6 import QtWidgets
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    service = PlotService(args.address, workers=args.workers, cache_bytes=args.cache_mb << 20,
+                          renderer=render_png, max_datasets=args.max_datasets)
+    print(f"Сервис запущен: {service.address}")
+    try:
+        service.serve_forever()
+    except KeyboardInterrupt:
+        service.close()
+    del app
+
+
+def _client(args):
+    client = ServiceClient.connect(args.address)
+    if client is None:
+        sys.exit(f"Сервис не запущен: {args.address or default_address()}")
+    return client
+
+
+def cli_load(args):
+    status = _client(args).load(args.file, conditions=args.filter)
+    print(f"Строк: {status['rows']}, столбцы: {', '.join(status['headers'])}, ошибок: {status['errors']}")
+
+
+def cli_series(args):
+    x, y = _client(args).series(args.file, args.x, args.y, args.x_min, args.x_max, args.points,
+                                conditions=args.filter)
+    if args.output:
+        np.savez(args.output, x=x, y=y)
+    else:
+        np.savetxt(sys.stdout, np.column_stack((x, y)), fmt="%.10g", delimiter=",", header=f"{args.x},{args.y}",
+                   comments="")
+
+
+def cli_render(args):
+    png = _client(args).render(args.file, args.x, args.y, conditions=args.filter, width=args.width,
+                               height=args.height, x_min=args.x_min, x_max=args.x_max)
+    with open(args.output, "wb") as file:
+        file.write(png)
+
+
+def cli_stop(args):
+    _client(args).shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Сервис разбора и прореживания CSV файлов GraphBuilder")
+    parser.add_argument("--address", type=parse_address, help="путь к сокету или host:port")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    server = commands.add_parser("serve", help="запуск сервиса")
+    server.add_argument("--workers", type=int, default=4)
+    server.add_argument("--cache-mb", type=int, default=512)
+    server.add_argument("--max-datasets", type=int, default=16, help="количество хранимых разобранных файлов")
+    server.set_defaults(func=serve)
+
+    load = commands.add_parser("load", help="разбор файла сервисом")
+    load.add_argument("file")
+    load.add_argument("--filter", action="append", default=[], help="условие фильтра строк")
+    load.set_defaults(func=cli_load)
+
+    series = commands.add_parser("series", help="прореженная серия в CSV или NPZ")
+    series.add_argument("file")
+    series.add_argument("x")
+    series.add_argument("y")
+    series.add_argument("--x-min", type=float, default=-np.inf)
+    series.add_argument("--x-max", type=float, default=np.inf)
+    series.add_argument("--points", type=int, default=2000)
+    series.add_argument("--filter", action="append", default=[])
+    series.add_argument("--output", help="файл .npz, по умолчанию CSV в stdout")
+    series.set_defaults(func=cli_series)
+
+    render = commands.add_parser("render", help="график в PNG")
+    render.add_argument("file")
+    render.add_argument("x")
+    render.add_argument("y", nargs="+")
+    render.add_argument("--output", required=True)
+    render.add_argument("--width", type=int, default=800)
+    render.add_argument("--height", type=int, default=600)
+    render.add_argument("--x-min", type=float)
+    render.add_argument("--x-max", type=float)
+    render.add_argument("--filter", action="append", default=[])
+    render.set_defaults(func=cli_render)
+
+    stop = commands.add_parser("stop", help="остановка сервиса")
+    stop.set_defaults(func=cli_stop)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+Файлы сессий GraphBuilder: наборы данных, серии, стили и диапазоны графиков.
+
+Сессия - JSON-файл. Для каждого набора данных в нём записаны путь, хэш
+содержимого, диалект (кодировка, разделитель), политика ошибок, фильтр
+строк, производные столбцы и используемые числовые столбцы. При сохранении
+эти столбцы кладутся в кэш разбора (ParseCache), поэтому при восстановлении
+неизменившиеся файлы не разбираются заново, а столбцы читаются с диска
+параллельно.
+"""
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from PySide6.QtCore import QThread, Signal
+
+from CSVManager.Expressions import Expression
+from CSVManager.Filters import RowFilter
+from CSVManager.Loading import load_dataset
+from CSVManager.ParseCache import ParseCache
+from CSVManager.ParseErrors import ON_ERROR_NAN
+
+SESSION_VERSION = 1
+# Расширение файлов сессий
+SESSION_SUFFIX = ".gbsession"
+
+
+class SessionError(Exception):
+    """
+    Файл сессии не прочитан: повреждён или записан несовместимой версией.
+    """
+
+
+def _needed_columns(dataset, fields):
+    """
+    Столбцы файла, по которым строятся поля, и нужны ли для них строковые значения.
+
+    :return: Кортеж (список столбцов, нужны ли строки).
+    """
+    columns, needs_text = [], False
+    for field in fields:
+        if field in dataset.headers:
+            columns.append(field)
+            continue
+        expression = Expression(field)
+        columns += [name for name in expression.columns if name not in expression.text_columns]
+        needs_text = needs_text or bool(expression.text_columns)
+    return list(dict.fromkeys(columns)), needs_text
+
+
+def describe_dataset(dataset, fields, by_label=False, cache=None):
+    """
+    Описание набора данных для файла сессии. Нужные числовые столбцы полностью
+    разобранного набора сохраняются в кэш разбора.
+
+    Хэш файла берётся из кэша разбора, пока отпечаток файла (размер и время
+    изменения) не изменился, поэтому повторное сохранение не перечитывает файлы.
+
+    :param dataset: Dataset (или RemoteDataset).
+    :param fields: Поля X и Y серий, построенных по набору.
+    :param by_label: Есть ли серии, сгруппированные по значениям X (им нужны строки).
+    :param cache: ParseCache, по умолчанию в каталоге по умолчанию.
+    :return: Словарь для файла сессии.
+    """
+    cache = cache or ParseCache()
+    columns, needs_text = _needed_columns(dataset, fields)
+    file_hash = cache.file_hash(dataset.file_path)
+    row_filter = dataset.row_filter
+    spec = {
+        "file": os.path.abspath(dataset.file_path),
+        "hash": file_hash,
+        "encoding": dataset.encoding,
+        "delimiter": dataset.delimiter,
+        "on_error": dataset.on_error,
+        "filter": list(row_filter.conditions) if row_filter else [],
+        "derived": [name for name in dataset.columns if name not in dataset.headers],
+        "columns": columns,
+        "needs_text": needs_text or by_label,
+    }
+    # Столбцы изменившегося после разбора файла не соответствуют его новому хэшу
+    if dataset.complete and dataset.is_current():
+        cache.store(_cache_key(spec, file_hash), dataset, columns)
+    return spec
+
+
+def _cache_key(spec, file_hash):
+    conditions = RowFilter(spec["filter"]).key
+    return ParseCache.key(file_hash, spec["encoding"], spec["delimiter"], spec["on_error"], conditions)
+
+
+def restore_dataset(spec, cache=None, is_cancelled=None):
+    """
+    Набор данных по описанию из файла сессии: из кэша разбора, если файл не изменился
+    и нужные столбцы сохранены, иначе - разбором файла (результат кладётся в кэш).
+
+    :param spec: Описание набора (см. describe_dataset).
+    :param cache: ParseCache.
+    :param is_cancelled: Функция без аргументов, True - прервать разбор.
+    :return: Кортеж (Dataset или None, если разбор прерван; разобран ли файл заново).
+    """
+    cache = cache or ParseCache()
+    file_hash = cache.file_hash(spec["file"], spec.get("hash"))
+    row_filter = RowFilter(spec["filter"]) or None
+    on_error = spec.get("on_error", ON_ERROR_NAN)
+    key = _cache_key(spec, file_hash)
+
+    dataset = None
+    if not spec["needs_text"]:
+        dataset = cache.load(key, spec["file"], on_error, row_filter, spec["columns"])
+    if dataset is None:
+        dataset = load_dataset(spec["file"], spec["delimiter"], spec["encoding"], on_error, row_filter,
+                               is_cancelled=is_cancelled)
+        if dataset is None:
+            return None, True
+        cache.store(key, dataset, spec["columns"])
+        parsed = True
+    else:
+        parsed = False
+    for text in spec["derived"]:
+        dataset.add_derived(text)
+    return dataset, parsed
+
+
+def write_session(path, state):
+    """
+    Запись сессии в файл.
+
+    :param path: Путь к файлу.
+    :param state: Словарь: datasets, series, view.
+    :return:
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": SESSION_VERSION, **state}, f, ensure_ascii=False, indent=1)
+
+
+def save_session(path, state, cache=None):
+    """
+    Описание наборов данных и запись сессии в файл.
+
+    :param path: Путь к файлу.
+    :param state: Словарь: datasets - кортежи (набор данных, поля серий, есть ли группировка
+        по меткам), series, view.
+    :param cache: ParseCache.
+    :return:
+    """
+    cache = cache or ParseCache()
+    datasets = [describe_dataset(dataset, fields, by_label, cache) for dataset, fields, by_label in state["datasets"]]
+    write_session(path, dict(state, datasets=datasets))
+
+
+def read_session(path):
+    """
+    Чтение файла сессии.
+
+    :param path: Путь к файлу.
+    :return: Словарь: datasets, series, view.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            state = json.load(f)
+    except ValueError as e:
+        raise SessionError(f"файл сессии повреждён: {e}") from None
+    if state.get("version") != SESSION_VERSION:
+        raise SessionError(f"неподдерживаемая версия файла сессии: {state.get('version')!r}")
+    return state
+
+
+class SessionRestoreThread(QThread):
+    """
+    Поток восстановления наборов данных сессии.
+
+    Наборы восстанавливаются параллельно: чтение столбцов из кэша и хэширование
+    файлов отпускают GIL. Прерывается через requestInterruption().
+    """
+    # Номер набора в сессии, набор данных, разобран ли файл заново
+    dataset_restored = Signal(int, object, bool)
+    error_occurred = Signal(int, str)
+
+    def __init__(self, specs, workers=None, parent=None):
+        """
+        :param specs: Описания наборов данных (см. describe_dataset).
+        :param workers: Количество потоков, по умолчанию по числу ядер (не больше 8).
+        :param parent: Родительский объект.
+        """
+        super().__init__(parent)
+        self.specs = specs
+        self.workers = workers or min(os.cpu_count() or 1, 8)
+        self.cache = ParseCache()
+
+    def run(self):
+        with ThreadPoolExecutor(self.workers) as executor:
+            futures = [executor.submit(restore_dataset, spec, self.cache, self.isInterruptionRequested)
+                       for spec in self.specs]
+            for index, future in enumerate(futures):
+                try:
+                    dataset, parsed = future.result()
+                except Exception as e:
+                    # Любая ошибка набора (в т.ч. повреждённого описания) не должна прерывать остальные
+                    spec = self.specs[index]
+                    name = spec.get("file", index) if isinstance(spec, dict) else index
+                    self.error_occurred.emit(index, f"{name}: {e}")
+                    continue
+                if dataset is not None and not self.isInterruptionRequested():
+                    self.dataset_restored.emit(index, dataset, parsed)
+
+
+class SessionSaveThread(QThread):
+    """
+    Поток сохранения сессии: хэширование файлов и запись столбцов в кэш разбора
+    не блокируют интерфейс.
+    """
+    saved = Signal(str)
+    error_occurred = Signal(str)
+
+    def __init__(self, path, state, parent=None):
+        """
+        :param path: Путь к файлу сессии.
+        :param state: Состояние (см. save_session).
+        :param parent: Родительский объект.
+        """
+        super().__init__(parent)
+        self.path = path
+        self.state = state
+
+    def run(self):
+        try:
+            save_session(self.path, self.state)
+        except Exception as e:
+            self.error_occurred.emit(str(e))
+            return
+        self.saved.emit(self.path)
@@ -0,0 +1,238 @@
+"""
+Замеры производительности.
+
+Запуск: python bench.py <замер>, список замеров - python bench.py --help.
+"""
+import argparse
+import os
+import subprocess
+import sys
+
+# Бюджет времени запуска до показа первого окна, мс
+STARTUP_BUDGET_MS = 400
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_FIRST_WINDOW_SCRIPT = """
+import time
+start = time.perf_counter()
+from PySide6 import QtWidgets
+app = QtWidgets.QApplication([])
+import main
+window = main.GraphBuilder()
+window.show()
+app.processEvents()
+print((time.perf_counter() - start) * 1000)
+"""
+
+
+def _python_env():
+    env = dict(os.environ)
+    env.setdefault("QT_QPA_PLATFORM", "offscreen")
+    return env
+
+
+def import_time_report(module="main", top=15):
+    """
+    Разбор вывода python -X importtime для импорта модуля.
+
+    :param module: Импортируемый модуль.
+    :param top: Количество самых долгих модулей в отчёте.
+    :return: Кортеж (общее время в мс, список (время в мс, модуль)).
+    """
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, env=_python_env(), capture_output=True, text=True, check=True
+    )
+    modules = []
+    for line in result.stderr.splitlines():
+        # Формат строки: "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative) / 1000, name.rstrip()))
+
+    # Модули верхнего уровня записаны без отступа
+    total = sum(ms for ms, name in modules if not name.startswith("  "))
+    modules.sort(reverse=True)
+    return total, modules[:top]
+
+
+def time_to_first_window():
+    """
+    Время от начала импорта до показа окна GraphBuilder в новом процессе.
+
+    :return: Время в мс.
+    """
+    result = subprocess.run(
+        [sys.executable, "-c", _FIRST_WINDOW_SCRIPT],
+        cwd=ROOT, env=_python_env(), capture_output=True, text=True, check=True
+    )
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def bench_startup(args):
+    total, modules = import_time_report(args.module, args.top)
+    print(f"Импорт {args.module}: {total:.1f} мс")
+    for ms, name in modules:
+        print(f"{ms:10.1f} мс  {name}")
+
+    first_window = min(time_to_first_window() for _ in range(args.repeat))
+    verdict = "в норме" if first_window <= STARTUP_BUDGET_MS else "превышен"
+    print(f"Первое окно: {first_window:.1f} мс, бюджет {STARTUP_BUDGET_MS} мс: {verdict}")
+    return first_window <= STARTUP_BUDGET_MS
+
+
+def _paint_frames(widget, curves, frames, points):
+    """
+    Среднее время кадра: новые данные во всех кривых и отрисовка виджета.
+    """
+    import time
+
+    import numpy as np
+    from PySide6 import QtGui
+
+    rng = np.random.default_rng(0)
+    image = QtGui.QImage(widget.size(), QtGui.QImage.Format_ARGB32)
+    timings = []
+    for frame in range(frames):
+        start = time.perf_counter()
+        for curve in curves:
+            curve.setData(np.arange(points, dtype=np.float64), rng.standard_normal(points))
+        painter = QtGui.QPainter(image)
+        widget.render(painter)
+        painter.end()
+        timings.append((time.perf_counter() - start) * 1000)
+    # Первый кадр включает создание атласа и не показателен
+    return sum(timings[1:]) / max(len(timings) - 1, 1)
+
+
+def bench_paint(args):
+    os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+    from PySide6 import QtWidgets
+    app = QtWidgets.QApplication.instance() or QtWidgets.QApplication([])
+
+    import pyqtgraph as pg
+    from CSVLoader import CSVLoader
+    from ColorListModel import ColorListModel
+    from GraphManager import Styles
+
+    colors = [color.name() for _, color in CSVLoader.colors]
+    results = {}
+    # Режимы чередуются, лучший результат каждого режима сглаживает шум и прогрев
+    for mode in ("без кэша", "с кэшем") * args.repeat:
+        widget = pg.GraphicsLayoutWidget()
+        widget.resize(800, 600)
+        plot = widget.addPlot()
+        curves = []
+        for i in range(args.series):
+            color = colors[i % len(colors)]
+            if mode == "с кэшем":
+                curve = plot.plot(**Styles.curve_style(color, args.line))
+            else:
+                # Как раньше: перья и кисти создаются заново при каждом setData
+                curve = plot.plot(pen=pg.mkPen(color=color, width=2) if args.line else None, symbol='o',
+                                  symbolPen=(200, 200, 200), symbolBrush=color)
+            curves.append(curve)
+        frame_ms = _paint_frames(widget, curves, args.frames, args.points)
+        results[mode] = min(results.get(mode, frame_ms), frame_ms)
+        widget.close()
+    for mode, frame_ms in results.items():
+        print(f"Кадр {mode}: {frame_ms:.2f} мс ({args.series} серий по {args.points} точек)")
+
+    model = ColorListModel(CSVLoader.colors)
+    import time
+    start = time.perf_counter()
+    for _ in range(1000):
+        for row in range(model.rowCount()):
+            model.data(model.index(row), pg.QtCore.Qt.DecorationRole)
+    elapsed = (time.perf_counter() - start) * 1000
+    print(f"Образцы цветов: {elapsed / 1000:.3f} мс на открытие списка из {model.rowCount()} цветов")
+    app.processEvents()
+
+
+def _write_table(path, delimiter, rows, columns):
+    """
+    Файл машинного вида без кавычек: номер строки и столбцы случайных чисел.
+    Для разделителя ';' дробная часть отделяется запятой.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    values = rng.standard_normal((rows, columns))
+    lines = np.char.mod("%.6f", values)
+    if delimiter == ";":
+        lines = np.char.replace(lines, ".", ",")
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        file.write(delimiter.join(["t"] + [f"c{i}" for i in range(columns)]) + "\n")
+        for start in range(0, rows, 100000):
+            block = lines[start:start + 100000]
+            file.writelines(f"{start + i}{delimiter}{delimiter.join(row)}\n" for i, row in enumerate(block.tolist()))
+
+
+def _parse_time(path, fast):
+    """
+    Время разбора файла в столбцы и преобразования их в числа, с.
+    """
+    import time
+
+    from CSVManager.Dataset import to_float
+    from CSVManager.Reader import Reader
+
+    reader = Reader(path, on_error="nan")
+    reader.fast_tokenizer = fast
+    start = time.perf_counter()
+    for chunk in reader.iter_chunks(100000):
+        for values in chunk.values():
+            to_float(values)
+    return time.perf_counter() - start
+
+
+def bench_tokenizer(args):
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        for name, delimiter in (("запятая", ","), ("точка с запятой", ";"), ("табуляция", "\t")):
+            path = os.path.join(directory, "table.csv")
+            _write_table(path, delimiter, args.rows, args.columns)
+            size = os.path.getsize(path) / 2 ** 20
+            # Режимы чередуются, лучший результат каждого режима сглаживает шум и прогрев
+            results = {}
+            for fast in (False, True) * args.repeat:
+                elapsed = _parse_time(path, fast)
+                results[fast] = min(results.get(fast, elapsed), elapsed)
+            print(f"{name}: {size:.0f} МБ, модуль csv {results[False]:.2f} с, "
+                  f"разбиение блоков {results[True]:.2f} с, ускорение {results[False] / results[True]:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности GraphBuilder")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    startup = commands.add_parser("startup", help="время импорта и показа первого окна")
+    startup.add_argument("--module", default="main")
+    startup.add_argument("--top", type=int, default=15)
+    startup.add_argument("--repeat", type=int, default=3)
+    startup.set_defaults(func=bench_startup)
+
+    paint = commands.add_parser("paint", help="время кадра с общими перьями и кистями")
+    paint.add_argument("--series", type=int, default=12)
+    paint.add_argument("--points", type=int, default=1000)
+    paint.add_argument("--frames", type=int, default=50)
+    paint.add_argument("--line", action="store_true")
+    paint.add_argument("--repeat", type=int, default=2)
+    paint.set_defaults(func=bench_paint)
+
+    tokenizer = commands.add_parser("tokenizer", help="разбор файлов без кавычек: модуль csv и разбиение блоков")
+    tokenizer.add_argument("--rows", type=int, default=1000000)
+    tokenizer.add_argument("--columns", type=int, default=4)
+    tokenizer.add_argument("--repeat", type=int, default=2)
+    tokenizer.set_defaults(func=bench_tokenizer)
+
+    args = parser.parse_args()
+    ok = args.func(args)
+    sys.exit(0 if ok is not False else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,25 @@
 import sys
 
 from PySide6 import QtWidgets, QtCore, QtGui
-import pyqtgraph as pg
 
-from CSVLoader import CSVLoader
+from LazyImport import lazy_import
+
+# Тяжёлые модули загружаются при первом использовании, а не при запуске
+pg = lazy_import("pyqtgraph")
+Aggregation = lazy_import("CSVManager.Aggregation")
+Align = lazy_import("GraphManager.Align")
+CSVLoader = lazy_import("CSVLoader")
+Cursor = lazy_import("GraphManager.Cursor")
+Export = lazy_import("GraphManager.Export")
+Jobs = lazy_import("CSVManager.Jobs")
+Layout = lazy_import("GraphManager.Layout")
+Memory = lazy_import("CSVManager.Memory")
+ParseCache = lazy_import("CSVManager.ParseCache")
+RegionStats = lazy_import("GraphManager.RegionStats")
+RenderScheduler = lazy_import("GraphManager.RenderScheduler")
+Series = lazy_import("GraphManager.Series")
+Session = lazy_import("Session")
+Spectrum = lazy_import("GraphManager.Spectrum")
 
 
 class GraphBuilder(QtWidgets.QMainWindow):
@@ -16,6 +32,10 @@ class GraphBuilder(QtWidgets.QMainWindow):
         self.resize(840, 840)
         self.setMinimumSize(840, 840)
 
+        self.settings = QtCore.QSettings("MyCompany", "GraphBuilder")
+        # Бюджет памяти в МБ, None - по умолчанию (см. Memory.default_budget)
+        self.memory_budget_mb = self.settings.value("memory_budget_mb", None, type=int) or None
+
         self._init_menu()
 
         # Создание центрального виджета и layout
@@ -35,20 +55,63 @@ class GraphBuilder(QtWidgets.QMainWindow):
 
         control_layout.addWidget(self.clear_btn)
         control_layout.addWidget(self.build_median_btn)
+        control_layout.addWidget(self.spectrum_btn)
+        control_layout.addWidget(self.split_btn)
+        control_layout.addWidget(self.cursor_btn)
+        control_layout.addWidget(self.region_stats_btn)
+        control_layout.addWidget(self.align_btn)
+        control_layout.addWidget(self.memory_btn)
         control_layout.addStretch()
         control_layout.setAlignment(QtCore.Qt.AlignCenter)
 
         main_layout.addWidget(control_widget)
 
-        # Виджет для графиков
-        self.graph_widget = pg.GraphicsLayoutWidget()
-        main_layout.addWidget(self.graph_widget, 1)
+        # Виджет для графиков и строка значений под курсором
+        graph_area = QtWidgets.QWidget()
+        self.graph_layout = QtWidgets.QVBoxLayout(graph_area)
+        self.graph_layout.setContentsMargins(0, 0, 0, 0)
+
+        self.cursor_label = QtWidgets.QLabel()
+        self.cursor_label.setVisible(False)
+        self.graph_layout.addWidget(self.cursor_label)
+
+        self.stats_label = QtWidgets.QLabel()
+        self.stats_label.setVisible(False)
+        self.graph_layout.addWidget(self.stats_label)
 
+        self.memory_label = QtWidgets.QLabel()
+        self.memory_label.setVisible(False)
+        self.graph_layout.addWidget(self.memory_label)
+
+        # Область графиков создаётся при первом построении, до этого - подсказка
+        self.placeholder_label = QtWidgets.QLabel("Файл → Открыть, чтобы построить график")
+        self.placeholder_label.setAlignment(QtCore.Qt.AlignCenter)
+        self.graph_layout.addWidget(self.placeholder_label, 1)
+        main_layout.addWidget(graph_area, 1)
+
+        # Серии по ключу файл+столбцы, данные общие для всех графиков
         self.graphs = {}
-        self.plot = None
+        # Столбцы серий, строящихся по ещё загружающимся файлам: ключ -> (набор данных, x, y)
+        self._streaming = {}
+        # Агрегаты серий: ключ -> [агрегатор, количество учтённых строк]
+        self._aggregators = {}
+        # Источники серий для файла сессии: ключ -> (набор данных, имя файла, x, y, настройки агрегирования)
+        self._sources = {}
+        # Восстанавливаемая сессия и поток восстановления её наборов данных
+        self._restoring = None
+        self._restore_thread = None
+        self._export_thread = None
+        self._save_thread = None
+        # Фоновое вытеснение данных на диск при превышении бюджета памяти
+        self._spill_job = None
+        self.graph_widget = None
+        self.render_scheduler = None
+        self.plot_grid = None
+        self.crosshair = None
+        self.region_stats = None
+        self.spectrum = None
 
         self.is_line = False
-        self.color = "#ff0000"
 
 
     def _init_btn(self):
@@ -72,22 +135,93 @@ class GraphBuilder(QtWidgets.QMainWindow):
         self.build_median_btn.toggled.connect(self.build_median)
         self.build_median_btn.setFixedSize(100, 30)
 
+        self.spectrum_btn = QtWidgets.QPushButton("Спектр")
+        self.spectrum_btn.setStyleSheet(btn_style)
+        self.spectrum_btn.setCheckable(True)
+        self.spectrum_btn.setToolTip("Спектр видимой части серии: БПФ, метод Уэлча или спектрограмма")
+        self.spectrum_btn.toggled.connect(self.set_spectrum_enabled)
+        self.spectrum_btn.setFixedSize(100, 30)
+
         self.clear_btn = QtWidgets.QPushButton("Очистить")
         self.clear_btn.setStyleSheet(btn_style)
         self.clear_btn.pressed.connect(self.clear_graph)
         self.clear_btn.setFixedSize(100, 30)
 
+        self.split_btn = QtWidgets.QPushButton("Раздельные\n графики")
+        self.split_btn.setStyleSheet(btn_style)
+        self.split_btn.setCheckable(True)
+        self.split_btn.toggled.connect(self.set_split_view)
+        self.split_btn.setFixedSize(100, 30)
+
+        self.cursor_btn = QtWidgets.QPushButton("Курсор")
+        self.cursor_btn.setStyleSheet(btn_style)
+        self.cursor_btn.setCheckable(True)
+        self.cursor_btn.toggled.connect(self.set_cursor_enabled)
+        self.cursor_btn.setFixedSize(100, 30)
+
+        self.region_stats_btn = QtWidgets.QPushButton("Статистика\n диапазона")
+        self.region_stats_btn.setStyleSheet(btn_style)
+        self.region_stats_btn.setCheckable(True)
+        self.region_stats_btn.toggled.connect(self.set_region_stats_enabled)
+        self.region_stats_btn.setFixedSize(100, 30)
+
+        self.align_btn = QtWidgets.QPushButton("Выровнять\n по X")
+        self.align_btn.setStyleSheet(btn_style)
+        self.align_btn.setToolTip("Интерполяция всех серий на сетку X первой серии")
+        self.align_btn.pressed.connect(self.align_series)
+        self.align_btn.setFixedSize(100, 30)
+
+        self.memory_btn = QtWidgets.QPushButton("Память")
+        self.memory_btn.setStyleSheet(btn_style)
+        self.memory_btn.setCheckable(True)
+        self.memory_btn.setToolTip("Память серий: в оперативной памяти и вытеснено на диск")
+        self.memory_btn.toggled.connect(self.set_memory_info_enabled)
+        self.memory_btn.setFixedSize(100, 30)
+
+    def _init_plot_area(self):
+        """
+        Отложенное создание области графиков и инструментов.
+        :return: Сетка графиков.
+        """
+        if self.plot_grid is not None:
+            return self.plot_grid
+
+        self.graph_widget = pg.GraphicsLayoutWidget()
+        self.graph_layout.replaceWidget(self.placeholder_label, self.graph_widget)
+        self.graph_layout.setStretchFactor(self.graph_widget, 1)
+        self.placeholder_label.deleteLater()
+
+        self.render_scheduler = RenderScheduler.RenderScheduler(target_fps=60, parent=self)
+        self.render_scheduler.frame_rendered.connect(self._on_frame_rendered)
+        self.plot_grid = Layout.PlotGrid(self.graph_widget, self.render_scheduler, parent=self)
+
+        self.crosshair = Cursor.CrosshairTool(self.plot_grid, parent=self)
+        self.crosshair.values_changed.connect(self.cursor_label.setText)
+
+        self.region_stats = RegionStats.RegionStatsTool(self.plot_grid, parent=self)
+        self.region_stats.stats_changed.connect(self.stats_label.setText)
+
+        self.spectrum = Spectrum.SpectrumPanel(self.plot_grid)
+        self.spectrum.setVisible(False)
+        self.graph_layout.addWidget(self.spectrum, 1)
+        return self.plot_grid
+
     def _open_CSV_loader(self):
         if not self._CSV_loader_window:
-            self._CSV_loader_window = CSVLoader()
+            self._CSV_loader_window = CSVLoader.CSVLoader()
             self._CSV_loader_window.cols_selected.connect(self._on_cols_selected)
+            self._CSV_loader_window.dataset_updated.connect(self._on_dataset_updated)
+            self._CSV_loader_window.dataset_completed.connect(self._on_dataset_completed)
+            self._CSV_loader_window.dataset_aborted.connect(self._on_dataset_aborted)
             self._CSV_loader_window.is_line_checked.connect(self.set_is_lined)
-            self._CSV_loader_window.color_selected.connect(self._on_color_selected)
 
         self._CSV_loader_window.show()
         self._CSV_loader_window.raise_()
         self._CSV_loader_window.activateWindow()
 
+        # Пока пользователь выбирает файл, подгружаем pyqtgraph, чтобы первый график появился сразу
+        QtCore.QTimer.singleShot(0, self._init_plot_area)
+
     def _init_menu(self):
         """
         Инициализация меню панели
@@ -121,59 +255,547 @@ class GraphBuilder(QtWidgets.QMainWindow):
         save_as_action = QtGui.QAction("Сохранить как ...", self)
         exit_action = QtGui.QAction("Выход", self)
 
+        open_session_action = QtGui.QAction("Открыть сессию ...", self)
+        save_session_action = QtGui.QAction("Сохранить сессию ...", self)
+
         exit_action.triggered.connect(self.close)
         open_action.triggered.connect(self._open_CSV_loader)
+        save_as_action.triggered.connect(self._ask_export)
+        open_session_action.triggered.connect(self._ask_open_session)
+        save_session_action.triggered.connect(self._ask_save_session)
 
 
         file_menu.addAction(open_action)
         file_menu.addAction(save_as_action)
+        file_menu.addSeparator()
+        file_menu.addAction(open_session_action)
+        file_menu.addAction(save_session_action)
+        file_menu.addSeparator()
         file_menu.addAction(exit_action)
 
-    def _on_cols_selected(self, data, file_name, x_field, y_field):
-        print(f"data: {data}")
-        print(f"for x: {x_field}")
-        print(f"for y: {y_field}")
+        # Меню настроек
+        settings_menu = menu_bar.addMenu("Настройки")
+        budget_action = QtGui.QAction("Бюджет памяти ...", self)
+        budget_action.triggered.connect(self._ask_memory_budget)
+        settings_menu.addAction(budget_action)
+        clear_cache_action = QtGui.QAction("Очистить кэш разбора ...", self)
+        clear_cache_action.triggered.connect(self._clear_parse_cache)
+        settings_menu.addAction(clear_cache_action)
 
-        graph_key = file_name+x_field+y_field
-        graph = []
+    def _on_cols_selected(self, dataset, file_name, x_field, y_fields, colors, aggregation=None):
+        """
+        Построение серий по выбранным столбцам: все серии ссылаются на один массив X.
+        При агрегировании серии строятся по статистикам интервалов X.
+        :return:
+        """
+        plot_grid = self._init_plot_area()
+        replaced = False
+        with self.render_scheduler.batch():
+            for y_field, color in zip(y_fields, colors):
+                graph_key = file_name+x_field+y_field
+                self._aggregators.pop(graph_key, None)
+                if aggregation is not None:
+                    self._aggregators[graph_key] = [Aggregation.make_aggregator(**aggregation), 0]
+                x, y, labels = self._series_data(graph_key, dataset, x_field, y_field)
+
+                series = Series.Series(x, y, name=y_field, color=color, is_line=self.is_line, x_labels=labels,
+                                       order=self._series_order(graph_key, dataset, x_field))
+                replaced = replaced or graph_key in self.graphs
+                self.graphs[graph_key] = series
+                self._sources[graph_key] = (dataset, file_name, x_field, y_field, aggregation)
+                if not dataset.complete:
+                    self._streaming[graph_key] = (dataset, x_field, y_field)
+                    series.streaming = True
+
+                if replaced:
+                    continue
+                if self.split_btn.isChecked():
+                    plot_grid.add_series(series, plot_grid.add_plot())
+                else:
+                    plot_grid.add_series(series)
+            if replaced:
+                self._rebuild_plots()
+        self.spectrum.refresh()
+        self._enforce_memory()
+
+    def _series_data(self, key, dataset, x_field, y_field):
+        """
+        Данные серии: столбцы набора данных или результат агрегирования,
+        в который добавляются только ещё не учтённые строки.
+        :return: Кортеж (x, y, метки X или None).
+        """
+        y = dataset.float_column(y_field)
+        if key not in self._aggregators:
+            # float_column возвращает один и тот же буфер X для всех серий файла
+            return dataset.float_column(x_field), y, None
+
+        state = self._aggregators[key]
+        aggregator, consumed = state
+        if isinstance(aggregator, Aggregation.GroupAggregator):
+            labels = dataset.raw_column(x_field, consumed)
+            aggregator.update(labels, y[consumed:consumed + len(labels)])
+            state[1] = consumed + len(labels)
+            return aggregator.result()
+
+        x = dataset.float_column(x_field)
+        rows = min(len(x), len(y))
+        aggregator.update(x[consumed:rows], y[consumed:rows])
+        state[1] = rows
+        return (*aggregator.result(), None)
+
+    def _series_order(self, key, dataset, x_field):
+        """
+        Упорядоченность X серии из набора данных: одна на все серии файла и дополняется при дозагрузке.
+        Для агрегированных серий None - серия определяет её сама.
+        """
+        return dataset.column_order(x_field) if key not in self._aggregators else None
 
-        if not self.plot:
-            self.plot = self.graph_widget.addPlot(titele=f"X = {x_field}"
-                                         f"Y = {y_field}")
-            self.plot.addLegend()
-            self.plot.showGrid(x=True, y=True)
+    def _on_dataset_updated(self, dataset):
+        """
+        Дозагрузка блока файла: серии получают новые данные, перерисовка объединяется планировщиком.
+        :param dataset: Набор данных.
+        :return:
+        """
+        for key, (stream_dataset, x_field, y_field) in list(self._streaming.items()):
+            series = self.graphs.get(key)
+            if stream_dataset is not dataset or series is None:
+                continue
+            x, y, labels = self._series_data(key, dataset, x_field, y_field)
+            series.update(x, y, self._series_order(key, dataset, x_field))
+            series.x_labels = labels
+        self.plot_grid.refresh()
+        self.spectrum.refresh()
+        self._enforce_memory()
+
+    def _on_dataset_completed(self, dataset):
+        self._on_dataset_updated(dataset)
+        self._finish_streaming(dataset)
+        self.plot_grid.auto_range()
+
+    def _on_dataset_aborted(self, dataset):
+        """
+        Загрузка прервана: серии остаются с уже разобранными строками и отмечаются как неполные.
+        :param dataset: Набор данных.
+        :return:
+        """
+        self._on_dataset_updated(dataset)
+        truncated = self._finish_streaming(dataset)
+        for series in truncated:
+            series.truncated = True
+        self.plot_grid.auto_range()
+        if truncated:
+            self.statusBar().showMessage(
+                f"Загрузка прервана, графики построены по {dataset.row_count} строкам: "
+                + ", ".join(series.name for series in truncated))
+
+    def _finish_streaming(self, dataset):
+        """
+        Серии набора данных больше не дозагружаются.
+        :return: Список серий.
+        """
+        finished = []
+        for key in [key for key, stream in self._streaming.items() if stream[0] is dataset]:
+            del self._streaming[key]
+            if key in self.graphs:
+                self.graphs[key].streaming = False
+                finished.append(self.graphs[key])
+        return finished
+
+    def align_series(self, method=None):
+        """
+        Выравнивание загруженных серий на общую сетку X для сравнения.
+        Серии ещё загружающихся файлов не выравниваются.
 
+        :param method: Способ выравнивания Align.ALIGN_INTERP (по умолчанию) или Align.ALIGN_MERGE.
+        :return:
+        """
+        keys = [key for key in self.graphs if key not in self._streaming]
+        if len(keys) < 2:
+            return
+        series = [self.graphs[key] for key in keys]
+        grid, values = Align.align([(item.x, item.y) for item in series], method or Align.ALIGN_INTERP,
+                                   [item.order for item in series])
+        with self.render_scheduler.batch():
+            order = None
+            for item, y in zip(series, values):
+                # Все выровненные серии ссылаются на одну сетку X и её упорядоченность
+                item.update(grid, y, order)
+                order = item.order
+            self.plot_grid.refresh()
+        self.spectrum.refresh()
+        self._enforce_memory()
+
+    def _rebuild_plots(self):
+        """
+        Перестроение графиков: все серии на одном графике или по графику на серию.
+        :return:
+        """
+        if self.plot_grid is None:
+            return
+        series = list(self.graphs.values())
+        if self.split_btn.isChecked():
+            self.plot_grid.set_layout([[item] for item in series])
+        else:
+            self.plot_grid.set_layout([series] if series else [])
 
-        x = [float(item[x_field].replace(",", ".")) for item in data]
-        y = [float(item[y_field].replace(",", ".")) for item in data]
+    def show_small_multiples(self, keys=None):
+        """
+        Отображение выбранных серий на отдельных графиках со связанной осью X.
 
-        if self.graphs.get(graph_key, False):
+        :param keys: Ключи серий, по умолчанию все серии.
+        :return:
+        """
+        keys = list(self.graphs) if keys is None else keys
+        self._init_plot_area().set_layout([[self.graphs[key]] for key in keys])
+
+    def set_split_view(self, is_split):
+        self._rebuild_plots()
+
+    def _on_frame_rendered(self, frame_ms):
+        stats = self.render_scheduler.frame_stats()
+        self.statusBar().showMessage(
+            f"Кадр: {frame_ms:.1f} мс, среднее: {stats['mean_ms']:.1f} мс, кадров: {stats['frames']}"
+        )
+
+    def set_cursor_enabled(self, is_enabled):
+        self.cursor_label.setVisible(is_enabled)
+        self._init_plot_area()
+        if is_enabled:
+            self.crosshair.attach()
+        else:
+            self.crosshair.detach()
 
-            if self.is_line:
-                curve = self.plot.plot(pen=pg.mkPen(color=self.color, width=2), symbol='o')
-                curve.setData(x, y)
-                graph.append(curve)
-            else:
-                curve = self.plot.plot(pen=None, symbol='o')
-                curve.setData(x, y)
-                graph.append(curve)
+    def set_region_stats_enabled(self, is_enabled):
+        self.stats_label.setVisible(is_enabled)
+        self._init_plot_area()
+        if is_enabled:
+            self.region_stats.attach()
+        else:
+            self.region_stats.detach()
 
+    def set_spectrum_enabled(self, is_enabled):
+        self._init_plot_area()
+        self.spectrum.setVisible(is_enabled)
+        if is_enabled:
+            self.spectrum.attach()
         else:
-            if self.is_line:
-                curve = self.plot.plot(pen=pg.mkPen(color=self.color, width=2), symbol='o')
+            self.spectrum.detach()
+
+    def set_memory_info_enabled(self, is_enabled):
+        self.memory_label.setVisible(is_enabled)
+        self._update_memory_label()
+
+    def _ask_memory_budget(self):
+        """
+        Запрос бюджета памяти у пользователя, значение сохраняется в настройках.
+        :return:
+        """
+        current = self.memory_budget_mb or Memory.default_budget() // 2 ** 20
+        budget, ok = QtWidgets.QInputDialog.getInt(
+            self, "Бюджет памяти", "Память под данные графиков, МБ.\n"
+            "При превышении давно не использованные данные вытесняются во временные файлы.",
+            current, 64, 1024 * 1024, 64)
+        if not ok:
+            return
+        self.memory_budget_mb = budget
+        self.settings.setValue("memory_budget_mb", budget)
+        self._enforce_memory()
 
-                curve.setData(x, y)
+    def _clear_parse_cache(self):
+        """
+        Удаление кэша разобранных столбцов после подтверждения пользователя.
+        :return:
+        """
+        cache = ParseCache.ParseCache()
+        answer = QtWidgets.QMessageBox.question(
+            self, "Очистить кэш разбора",
+            f"Удалить кэш разобранных столбцов ({cache.size() / 2 ** 20:.1f} МБ)?\n"
+            "Сохранённые сессии откроются, но файлы будут разобраны заново.")
+        if answer == QtWidgets.QMessageBox.StandardButton.Yes:
+            cache.clear()
+            self.statusBar().showMessage("Кэш разбора очищен", 5000)
+
+    def _enforce_memory(self):
+        """
+        Вытеснение давно не использованных данных при превышении бюджета памяти.
+        Файлы пишутся в пуле задач, одновременно идёт одно вытеснение.
+        :return:
+        """
+        if self.memory_budget_mb:
+            Memory.MemoryBudget.budget = self.memory_budget_mb * 2 ** 20
+        if self._spill_job is None and Memory.MemoryBudget.usage() > Memory.MemoryBudget.budget:
+            self._spill_job = Jobs.Job(lambda job: Memory.MemoryBudget.enforce())
+            self._spill_job.done.connect(self._on_memory_enforced)
+            Jobs.JobScheduler.shared().submit(self._spill_job)
+        self._update_memory_label()
+
+    def _on_memory_enforced(self):
+        self._spill_job = None
+        self._update_memory_label()
+
+    def _update_memory_label(self):
+        """
+        Память каждой серии и всех данных в сравнении с бюджетом.
+        :return:
+        """
+        if not self.memory_label.isVisible():
+            return
+        ram, disk = Memory.MemoryBudget.totals()
+        lines = [f"Память: {Memory.format_bytes(ram)} из {Memory.format_bytes(Memory.MemoryBudget.budget)}, "
+                 f"на диске: {Memory.format_bytes(disk)}"]
+        for series in self.graphs.values():
+            series_ram, series_disk = series.memory_usage()
+            lines.append(f"<span style='color: {series.color}'>{series.name}: {len(series)} точек"
+                         f"{' (часть файла)' if series.truncated else ''}, "
+                         f"в памяти {Memory.format_bytes(series_ram)}, "
+                         f"на диске {Memory.format_bytes(series_disk)}</span>")
+        self.memory_label.setText("<br>".join(lines))
+
+    def session_state(self):
+        """
+        Состояние графиков для файла сессии: наборы данных, серии со стилями и диапазоны графиков.
+        Наборы данных описываются (с хэшами файлов и сохранением столбцов в кэш разбора)
+        в потоке сохранения, см. Session.save_session.
+        :return: Словарь: datasets - кортежи (набор данных, поля серий, есть ли группировка по меткам),
+            series, view.
+        """
+        datasets, series = [], []
+        # id набора данных -> (номер в сессии, набор, поля серий, есть ли группировка по меткам)
+        used = {}
+        for key, item in self.graphs.items():
+            dataset, file_name, x_field, y_field, aggregation = self._sources[key]
+            index, _, fields, by_label = used.setdefault(id(dataset), (len(used), dataset, [], [False]))
+            fields += [x_field, y_field]
+            by_label[0] = by_label[0] or bool(aggregation and aggregation.get("by_label"))
+            series.append({"dataset": index, "file_name": file_name, "x": x_field, "y": y_field,
+                           "color": item.color, "is_line": item.is_line, "aggregation": aggregation})
+        for _, dataset, fields, by_label in sorted(used.values(), key=lambda entry: entry[0]):
+            datasets.append((dataset, fields, by_label[0]))
+
+        plots = self.plot_grid.plots if self.plot_grid is not None else []
+        ranges = [{"range": plot.vb.viewRange(), "auto": [bool(auto) for auto in plot.vb.autoRangeEnabled()]}
+                  for plot in plots]
+        return {"datasets": datasets, "series": series,
+                "view": {"split": self.split_btn.isChecked(), "plots": ranges}}
+
+    def _ask_save_session(self):
+        if not self.graphs:
+            return
+        if self._save_thread is not None:
+            self.statusBar().showMessage("Сохранение сессии ещё не закончено")
+            return
+        path, _ = QtWidgets.QFileDialog.getSaveFileName(
+            self, "Сохранить сессию", "", f"Сессия GraphBuilder (*{Session.SESSION_SUFFIX})")
+        if not path:
+            return
+        if not path.endswith(Session.SESSION_SUFFIX):
+            path += Session.SESSION_SUFFIX
+        self.save_session(path)
 
-                graph.append(curve)
-            else:
-                curve = self.plot.plot(pen=None, symbol='o')
+    def save_session(self, path):
+        """
+        Сохранение сессии в файл в фоновом потоке.
 
-                curve.setData(x, y)
+        :param path: Путь к файлу сессии.
+        :return:
+        """
+        self.statusBar().showMessage(f"Сохранение сессии: {path} ...")
+        self._save_thread = Session.SessionSaveThread(path, self.session_state(), parent=self)
+        self._save_thread.saved.connect(lambda path: self.statusBar().showMessage(f"Сессия сохранена: {path}"))
+        self._save_thread.error_occurred.connect(
+            lambda message: QtWidgets.QMessageBox.warning(self, "Ошибка сохранения сессии", message))
+        self._save_thread.finished.connect(self._on_session_saved)
+        self._save_thread.start(QtCore.QThread.LowPriority)
+
+    def _on_session_saved(self):
+        self._save_thread = None
+
+    def _ask_open_session(self):
+        path, _ = QtWidgets.QFileDialog.getOpenFileName(
+            self, "Открыть сессию", "", f"Сессия GraphBuilder (*{Session.SESSION_SUFFIX})")
+        if path:
+            self.open_session(path)
+
+    def open_session(self, path):
+        """
+        Восстановление сессии из файла. Наборы данных читаются из кэша разбора
+        параллельно, изменившиеся файлы разбираются заново. Серии добавляются
+        в сохранённом порядке по мере готовности наборов.
 
-                graph.append(curve)
+        :param path: Путь к файлу сессии.
+        :return:
+        """
+        try:
+            state = Session.read_session(path)
+        except (OSError, Session.SessionError) as e:
+            QtWidgets.QMessageBox.warning(self, "Ошибка открытия сессии", str(e))
+            return
+        if self._restore_thread is not None:
+            self._restore_thread.requestInterruption()
+            self._restore_thread.wait()
+        self.clear_graph()
+        self._init_plot_area()
+        self.split_btn.setChecked(state["view"]["split"])
+
+        self._restore_thread = Session.SessionRestoreThread(state["datasets"], parent=self)
+        self._restoring = {"state": state, "thread": self._restore_thread, "datasets": {}, "next": 0,
+                           "parsed": 0, "errors": [], "timer": QtCore.QElapsedTimer()}
+        self._restoring["timer"].start()
+        self.statusBar().showMessage(f"Восстановление сессии: {len(state['datasets'])} файлов ...")
+        self._restore_thread.dataset_restored.connect(self._on_session_dataset)
+        self._restore_thread.error_occurred.connect(self._on_session_error)
+        self._restore_thread.finished.connect(self._on_session_restored)
+        self._restore_thread.start()
+
+    def _is_current_restore(self):
+        # Сигналы прерванного восстановления могут прийти уже после начала следующего
+        return self._restoring is not None and self._restoring["thread"] is self.sender()
+
+    def _on_session_dataset(self, index, dataset, parsed):
+        if not self._is_current_restore():
+            return
+        self._restoring["datasets"][index] = dataset
+        self._restoring["parsed"] += parsed
+        self._add_session_series()
 
-        self.graphs[file_name+x_field+y_field] = graph
-        pass
+    def _on_session_error(self, index, message):
+        if not self._is_current_restore():
+            return
+        self._restoring["errors"].append(message)
+        # Серии файла, который не удалось восстановить, пропускаются
+        self._restoring["datasets"][index] = None
+        self._add_session_series()
+
+    def _add_session_series(self):
+        """
+        Добавление серий сессии в сохранённом порядке, пока их наборы данных готовы.
+        :return:
+        """
+        restoring = self._restoring
+        series = restoring["state"]["series"]
+        is_line = self.is_line
+        while restoring["next"] < len(series):
+            entry = series[restoring["next"]]
+            if entry["dataset"] not in restoring["datasets"]:
+                break
+            restoring["next"] += 1
+            dataset = restoring["datasets"][entry["dataset"]]
+            if dataset is None:
+                continue
+            self.is_line = entry["is_line"]
+            try:
+                self._on_cols_selected(dataset, entry["file_name"], entry["x"], [entry["y"]], [entry["color"]],
+                                       entry["aggregation"])
+            except (KeyError, ValueError) as e:
+                restoring["errors"].append(f"{entry['y']}: {e}")
+        self.is_line = is_line
+
+    def _on_session_restored(self):
+        """
+        Все наборы данных сессии восстановлены: применение сохранённых диапазонов графиков.
+        :return:
+        """
+        if not self._is_current_restore():
+            return
+        restoring, self._restoring = self._restoring, None
+        self._restore_thread = None
+        if restoring["next"] < len(restoring["state"]["series"]):
+            # Восстановление прервано
+            return
+        self.plot_grid.redraw()
+        for plot, view in zip(self.plot_grid.plots, restoring["state"]["view"]["plots"]):
+            (x_min, x_max), (y_min, y_max) = view["range"]
+            plot.vb.setRange(xRange=(x_min, x_max), yRange=(y_min, y_max), padding=0)
+            auto_x, auto_y = view["auto"]
+            plot.vb.enableAutoRange(x=auto_x, y=auto_y)
+        self.plot_grid.refresh()
+
+        elapsed = restoring["timer"].elapsed() / 1000
+        self.statusBar().showMessage(
+            f"Сессия восстановлена за {elapsed:.2f} с, разобрано заново файлов: {restoring['parsed']}")
+        if restoring["errors"]:
+            QtWidgets.QMessageBox.warning(self, "Ошибка открытия сессии", "\n".join(restoring["errors"]))
+
+    def _ask_export(self):
+        """
+        Экспорт графиков в PNG/SVG или данных видимых серий в CSV/NPZ.
+        :return:
+        """
+        if not self.graphs:
+            return
+        if self._export_thread is not None:
+            self.statusBar().showMessage("Экспорт ещё не закончен")
+            return
+        filters = {"Изображение PNG (*.png)": Export.EXPORT_PNG, "Изображение SVG (*.svg)": Export.EXPORT_SVG,
+                   "Данные CSV (*.csv)": Export.EXPORT_CSV, "Данные NumPy (*.npz)": Export.EXPORT_NPZ}
+        path, selected = QtWidgets.QFileDialog.getSaveFileName(self, "Сохранить как", "", ";;".join(filters))
+        if not path:
+            return
+        export_format = Export.export_format(path)
+        if export_format is None:
+            export_format = filters.get(selected, Export.EXPORT_PNG)
+            path += "." + export_format
+
+        if export_format in Export.IMAGE_FORMATS:
+            scale, ok = QtWidgets.QInputDialog.getDouble(
+                self, "Размер изображения", "Масштаб относительно области графиков:", 1.0, 0.25, 16.0, 2)
+            if not ok:
+                return
+            export = self._image_export(export_format, scale)
+        else:
+            export = self._data_export(export_format)
+
+        self.statusBar().showMessage(f"Экспорт: {path} ...")
+        self._export_thread = Export.ExportThread(path, export, parent=self)
+        self._export_thread.exported.connect(
+            lambda path, result: self.statusBar().showMessage(f"Сохранено: {path} ({result})"))
+        self._export_thread.error_occurred.connect(
+            lambda message: QtWidgets.QMessageBox.warning(self, "Ошибка экспорта", message))
+        self._export_thread.finished.connect(self._on_export_finished)
+        self._export_thread.start(QtCore.QThread.LowPriority)
+
+    def _on_export_finished(self):
+        self._export_thread = None
+
+    def _image_export(self, image_format, scale):
+        """
+        Экспорт изображения: снимки графиков берутся сейчас, отрисовка идёт в потоке экспорта.
+        :return: Функция export(path, is_cancelled) для Export.ExportThread.
+        """
+        width = max(int(self.graph_widget.width() * scale), 1)
+        height = max(int(self.graph_widget.height() * scale), 1)
+        curves = {}
+        for plot, _, series in self.plot_grid.items():
+            curves.setdefault(plot, []).append(series)
+        snapshots = [Export.plot_snapshot(plot, curves.get(plot, []), width * 2) for plot in self.plot_grid.plots]
+
+        def export(path, is_cancelled):
+            Export.render_image(path, snapshots, width, height, scale, image_format)
+            return f"{width}x{height}"
+        return export
+
+    def _data_export(self, data_format):
+        """
+        Экспорт данных видимых серий в кодировке и с разделителем файла первой серии.
+        :return: Функция export(path, is_cancelled) для Export.ExportThread.
+        """
+        plot = self.plot_grid.plots[0] if self.plot_grid.plots else None
+        x_min = x_max = None
+        if plot is not None and not plot.vb.autoRangeEnabled()[0]:
+            x_min, x_max = plot.vb.viewRange()[0]
+        dataset, _, x_name, _, _ = self._sources[next(iter(self.graphs))]
+        encoding = dataset.encoding or "utf-8"
+        delimiter = dataset.delimiter or ","
+        series = [(item.name, item.x, item.y, item.order) for item in self.graphs.values()]
+
+        def export(path, is_cancelled):
+            visible = [(name, *Export.visible_data(x, y, order, x_min, x_max)) for name, x, y, order in series]
+            if data_format == Export.EXPORT_NPZ:
+                points = Export.write_npz(path, x_name, visible)
+                return f"{points} точек"
+            rows = Export.write_csv(path, x_name, visible, encoding, delimiter, is_cancelled=is_cancelled)
+            return None if rows is None else f"{rows} строк"
+        return export
 
     def set_is_lined(self, _is_lined):
         self.is_line = _is_lined
@@ -184,14 +806,20 @@ class GraphBuilder(QtWidgets.QMainWindow):
     def clear_graph(self):
         if not self.graphs:
             return
-        self.plot.clear()
+        self.plot_grid.clear()
         self.graphs = {}
-
-    def _on_color_selected(self, color):
-        self.color = color
+        self._streaming = {}
+        self._aggregators = {}
+        self._sources = {}
+        self._update_memory_label()
 
     def closeEvent(self, event, /):
         super().closeEvent(event)
+        # Сохранение сессии не прерывается, чтобы не оставить недописанный файл
+        for thread in (self._restore_thread, self._export_thread, self._save_thread):
+            if thread is not None:
+                thread.requestInterruption()
+                thread.wait()
         if not self._CSV_loader_window:
             return
         self._CSV_loader_window.close()
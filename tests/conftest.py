@@ -0,0 +1,78 @@
+"""
+Общие фикстуры тестов. Тесты запускаются без дисплея (платформа Qt offscreen):
+
+    python -m pytest tests              # без порогов времени (см. pytest.ini)
+    python -m pytest tests -m perf      # только пороги времени
+    python -m pytest tests -m ""        # все тесты
+"""
+import os
+import sys
+import tempfile
+
+# До импорта Qt: без дисплея и без настроек пользователя (QSettings пишет в XDG_CONFIG_HOME)
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+os.environ["XDG_CONFIG_HOME"] = tempfile.mkdtemp(prefix="graphbuilder-tests-")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pytest
+
+from CSVManager.Dataset import DatasetCache
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "perf: пороги скорости на сгенерированных файлах, зависят от машины")
+
+
+def write_table(path, headers, columns, delimiter=",", encoding="utf-8", sep_line=False, decimal_comma=False):
+    """
+    Запись таблицы CSV из столбцов.
+
+    :param path: Путь к файлу.
+    :param headers: Заголовки.
+    :param columns: Столбцы: массивы numpy или списки строк.
+    :param delimiter: Разделитель полей.
+    :param encoding: Кодировка файла.
+    :param sep_line: Добавить первую строку sep=.
+    :param decimal_comma: Десятичная запятая в числах.
+    :return: Путь к файлу.
+    """
+    texts = []
+    for column in columns:
+        column = np.asarray(column)
+        text = column.astype(str) if column.dtype.kind != "f" else np.char.mod("%.6g", column)
+        texts.append(np.char.replace(text, ".", ",") if decimal_comma else text)
+    with open(path, "w", encoding=encoding, newline="") as f:
+        if sep_line:
+            f.write(f"sep={delimiter}\n")
+        f.write(delimiter.join(headers) + "\n")
+        for row in zip(*texts):
+            f.write(delimiter.join(row) + "\n")
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def qapp():
+    from PySide6.QtWidgets import QApplication
+    app = QApplication.instance() or QApplication([])
+    yield app
+
+
+@pytest.fixture(autouse=True)
+def clean_dataset_cache():
+    """
+    Каждый тест разбирает свои файлы заново: кэш наборов данных общий для процесса.
+    """
+    DatasetCache._datasets.clear()
+    yield
+    DatasetCache._datasets.clear()
+
+
+@pytest.fixture
+def numeric_file(tmp_path):
+    """
+    Небольшой файл с отсортированным столбцом t и двумя числовыми столбцами.
+    """
+    t = np.arange(1000) * 0.5
+    return write_table(tmp_path / "numeric.csv", ["t", "v", "w"], [t, np.sin(t), t * 2])
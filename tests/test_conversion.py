@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+
+from conftest import write_table
+from CSVManager.Dataset import DatasetCache, to_float
+from CSVManager.Loading import load_dataset
+from CSVManager.ParseErrors import ON_ERROR_NAN, ON_ERROR_RAISE, REASON_EMPTY_VALUE, REASON_NOT_A_NUMBER
+
+
+def test_to_float_dot():
+    values, bad = to_float(["1", "-2.5", "1e3", " 4 ", "inf"])
+    assert bad == []
+    assert values.dtype == np.float64
+    np.testing.assert_array_equal(values, [1, -2.5, 1000, 4, np.inf])
+
+
+def test_to_float_decimal_comma():
+    values, bad = to_float(["1,5", "-0,25", "3"])
+    assert bad == []
+    np.testing.assert_array_equal(values, [1.5, -0.25, 3])
+
+
+def test_to_float_bad_values():
+    values, bad = to_float(["1,5", "", "abc", "2.5", "1,2,3"])
+    assert bad == [1, 2, 4]
+    np.testing.assert_array_equal(values[[0, 3]], [1.5, 2.5])
+    assert np.isnan(values[bad]).all()
+
+
+def test_to_float_empty():
+    values, bad = to_float([])
+    assert len(values) == 0 and bad == []
+
+
+def test_float_column_decimal_comma_file(tmp_path):
+    t = np.arange(500) * 0.25
+    path = write_table(tmp_path / "comma.csv", ["t", "v"], [t, -t], delimiter=";", sep_line=True,
+                       decimal_comma=True)
+    dataset = load_dataset(path, chunk_rows=64, first_chunk_rows=10)
+    assert dataset.complete and dataset.row_count == 500
+    np.testing.assert_array_equal(dataset.float_column("t"), t)
+    np.testing.assert_array_equal(dataset.float_column("v"), -t)
+
+
+def test_float_column_grows_with_chunks(numeric_file):
+    dataset = load_dataset(numeric_file, chunk_rows=100)
+    DatasetCache.discard(dataset)
+    whole = load_dataset(numeric_file, chunk_rows=100000)
+    assert whole is not dataset
+    np.testing.assert_array_equal(dataset.float_column("w"), np.arange(1000) * 1.0)
+    np.testing.assert_allclose(dataset.float_column("v"), np.sin(np.arange(1000) * 0.5), atol=1e-5)
+    np.testing.assert_array_equal(dataset.float_column("v"), whole.float_column("v"))
+
+
+def test_bad_values_are_recorded(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("x,y\n1,2\n2,\n3,abc\n4,5\n", encoding="utf-8")
+    dataset = load_dataset(str(path), on_error=ON_ERROR_NAN)
+    y = dataset.float_column("y")
+    np.testing.assert_array_equal(np.isnan(y), [False, True, True, False])
+    assert list(dataset.errors.lines) == [3, 4]
+    assert list(dataset.errors.reasons) == [REASON_EMPTY_VALUE, REASON_NOT_A_NUMBER]
+
+
+def test_bad_values_raise(tmp_path):
+    path = tmp_path / "bad.csv"
+    path.write_text("x,y\n1,2\n3,abc\n", encoding="utf-8")
+    dataset = load_dataset(str(path), on_error=ON_ERROR_RAISE)
+    with pytest.raises(ValueError, match="строка 3"):
+        dataset.float_column("y")
+
+
+def test_derived_column(numeric_file):
+    dataset = load_dataset(numeric_file, chunk_rows=300)
+    name = dataset.add_derived("w - t")
+    np.testing.assert_array_equal(dataset.float_column(name), np.arange(1000) * 0.5)
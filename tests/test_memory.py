@@ -0,0 +1,70 @@
+import numpy as np
+
+from CSVManager.Dataset import Dataset
+from CSVManager.Filters import RowFilter
+from CSVManager.Memory import MemoryBudget, SpilledStrings, is_spilled
+from CSVManager.Reader import Reader
+from GraphManager.Series import Series
+
+
+def test_spill_growing_buffer(numeric_file):
+    # Буфер столбца дописывается после вытеснения серии, построенной по его началу
+    chunks = Reader(numeric_file).iter_chunks(10)
+    dataset = Dataset(numeric_file)
+    dataset.expected_rows = 1000
+    dataset.append_chunk(next(chunks))
+    series = Series(dataset.float_column("t"), dataset.float_column("w"))
+    series.spill()
+    assert is_spilled(series.y)
+
+    dataset.append_chunk(next(chunks))
+    series.update(dataset.float_column("t"), dataset.float_column("w"))
+    series.spill()
+    assert is_spilled(series.y)
+    np.testing.assert_array_equal(series.y, np.arange(20) * 1.0)
+    np.testing.assert_array_equal(series.x, np.arange(20) * 0.5)
+
+
+def test_spill_shares_file_between_views():
+    buffer = np.arange(100, dtype=float)
+    first = MemoryBudget.spill_array(buffer[:50])
+    second = MemoryBudget.spill_array(buffer[10:40])
+    assert second.base is first.base
+    np.testing.assert_array_equal(second, buffer[10:40])
+
+
+def test_streaming_series_is_not_spilled():
+    series = Series(np.arange(10.0), np.arange(10.0))
+    series.streaming = True
+    assert not series.spillable()
+    series.streaming = False
+    assert series.spillable()
+
+
+def test_spilled_strings():
+    values = ["", "abc", "строка", "с\nпереводом", "x" * 1000]
+    spilled = SpilledStrings(values)
+    assert is_spilled(spilled.data) and spilled.data.nbytes == sum(len(value.encode()) for value in values)
+    assert len(spilled) == 5 and spilled.tolist() == values
+    assert spilled[2] == "строка" and spilled[-1] == "x" * 1000
+    assert spilled[1:4] == values[1:4] and spilled[3:] == values[3:] and spilled[4:2] == []
+
+
+def test_spilled_dataset_keeps_values(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("t,name,v\n" + "".join(f"{i},имя{i % 7},{i * 2}\n" for i in range(300)), encoding="utf-8")
+    chunks = Reader(str(path)).iter_chunks(100)
+    dataset = Dataset(str(path))
+    for chunk in chunks:
+        dataset.append_chunk(chunk)
+    dataset.complete = True
+    dataset.float_column("t")
+    assert dataset.spillable()
+    dataset.spill()
+
+    assert not dataset.spillable() and dataset.memory_overhead() == 0
+    assert is_spilled(dataset.float_column("t"))
+    # Столбцы, не преобразованные до вытеснения, читаются из вытесненных строк
+    np.testing.assert_array_equal(dataset.float_column("v"), np.arange(300) * 2.0)
+    assert dataset.raw_column("name", 250)[:2] == ["имя5", "имя6"]
+    assert dataset.filtered(RowFilter(["t >= 298"])).rows() == [["298", "имя4", "596"], ["299", "имя5", "598"]]
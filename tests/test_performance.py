@@ -0,0 +1,172 @@
+"""
+Пороги скорости и памяти горячих путей на сгенерированных файлах.
+
+Пороги скорости взяты с запасом в 3-5 раз от измерений на одном ядре,
+поэтому срабатывают на заметные регрессии, а не на шум; время - лучшее из
+нескольких запусков. Память почти не зависит от машины, её пороги - с
+запасом около 1.7 раза; память - пик tracemalloc сверх уже занятой.
+Пороги памяти проверяются при каждом запуске, а пороги времени отмечены
+маркером perf и по умолчанию не выбираются (pytest.ini), запуск:
+python -m pytest tests -m perf.
+"""
+import time
+import tracemalloc
+
+import numpy as np
+import pytest
+
+from conftest import write_table
+from CSVManager.Dataset import DatasetCache, to_float
+from CSVManager.Loading import load_dataset
+from CSVManager.Reader import Reader
+from GraphManager.Cursor import KDTreeIndex
+from GraphManager.Series import Series
+
+ROWS = 200000
+
+# Строк в секунду
+MIN_TOKENIZER_SPEED = 250000
+MIN_CSV_MODULE_SPEED = 120000
+MIN_LOAD_SPEED = 200000
+MIN_DECIMAL_COMMA_LOAD_SPEED = 150000
+MIN_TO_FLOAT_SPEED = 1000000
+# Секунды
+MAX_DOWNSAMPLE_TIME = 0.01
+MAX_READ_N_TIME = 0.01
+MAX_HOVER_TIME = 0.002
+# Байт на строку: при потоковом чтении - на строку блока, при загрузке - на строку файла
+MAX_CHUNK_BYTES_PER_ROW = 1000
+MAX_LOAD_BYTES_PER_ROW = 450
+MAX_READ_N_BYTES = 256 * 1024
+
+
+@pytest.fixture(scope="module")
+def columns():
+    rng = np.random.default_rng(0)
+    return np.arange(ROWS) * 0.001, rng.normal(size=ROWS), rng.normal(size=ROWS)
+
+
+@pytest.fixture(scope="module")
+def large_file(tmp_path_factory, columns):
+    return write_table(tmp_path_factory.mktemp("perf") / "large.csv", ["t", "v", "w"], columns)
+
+
+@pytest.fixture(scope="module")
+def comma_file(tmp_path_factory, columns):
+    return write_table(tmp_path_factory.mktemp("perf") / "comma.csv", ["t", "v"], columns[:2], delimiter=";",
+                       decimal_comma=True)
+
+
+def best_time(function, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def peak_memory(function):
+    """
+    Пик памяти Python-объектов и массивов numpy во время вызова сверх уже занятой, в байтах.
+    """
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = function()
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak - baseline
+
+
+def read_chunks(path, chunk_rows=100000, fast=True):
+    reader = Reader(path)
+    reader.fast_tokenizer = fast
+    rows = 0
+    for chunk in reader.iter_chunks(chunk_rows):
+        rows += len(chunk["t"])
+    return rows
+
+
+def load_numeric(path):
+    DatasetCache._datasets.clear()
+    dataset = load_dataset(path)
+    dataset.float_column("t")
+    dataset.float_column("v")
+    return dataset
+
+
+@pytest.mark.perf
+def test_tokenizer_speed(large_file):
+    assert read_chunks(large_file) == ROWS
+    assert ROWS / best_time(lambda: read_chunks(large_file)) > MIN_TOKENIZER_SPEED
+
+
+@pytest.mark.perf
+def test_csv_module_speed(large_file):
+    assert ROWS / best_time(lambda: read_chunks(large_file, fast=False)) > MIN_CSV_MODULE_SPEED
+
+
+@pytest.mark.perf
+def test_load_speed(large_file):
+    assert ROWS / best_time(lambda: load_numeric(large_file)) > MIN_LOAD_SPEED
+
+
+@pytest.mark.perf
+def test_decimal_comma_load_speed(comma_file, columns):
+    dataset = load_numeric(comma_file)
+    np.testing.assert_allclose(dataset.float_column("v"), columns[1], rtol=1e-5)
+    assert ROWS / best_time(lambda: load_numeric(comma_file)) > MIN_DECIMAL_COMMA_LOAD_SPEED
+
+
+@pytest.mark.perf
+@pytest.mark.parametrize("decimal_comma", [False, True])
+def test_to_float_speed(columns, decimal_comma):
+    values = np.char.mod("%.6f", columns[1]).tolist()
+    if decimal_comma:
+        values = [value.replace(".", ",") for value in values]
+    assert ROWS / best_time(lambda: to_float(values)) > MIN_TO_FLOAT_SPEED
+
+
+@pytest.mark.perf
+def test_downsample_time(columns):
+    series = Series(columns[0], columns[1])
+
+    def downsample():
+        series._cache.clear()
+        return series.downsample(float("-inf"), float("inf"), 2000)
+
+    assert best_time(downsample) < MAX_DOWNSAMPLE_TIME
+
+
+@pytest.mark.perf
+def test_hover_time_on_clustered_points():
+    # Все точки в одном углу и одна далёкая: курсор и внутри скопления, и в пустой области
+    rng = np.random.default_rng(0)
+    x = np.r_[rng.normal(0, 0.01, ROWS), 1000.0]
+    y = np.r_[rng.normal(0, 0.01, ROWS), 1000.0]
+    index = KDTreeIndex(x, y)
+    for x0, y0 in [(0, 0), (500, 500), (-100, 900)]:
+        assert best_time(lambda: index.nearest(x0, y0, 0.5, 2.0), repeat=10) < MAX_HOVER_TIME
+
+
+@pytest.mark.perf
+def test_read_n_time(large_file):
+    # Предпросмотр не зависит от размера файла
+    assert best_time(lambda: Reader(large_file).read_n(5)) < MAX_READ_N_TIME
+
+
+def test_read_n_memory(large_file):
+    assert peak_memory(lambda: Reader(large_file).read_n(5)) < MAX_READ_N_BYTES
+
+
+def test_streaming_memory(large_file):
+    # Потоковое чтение держит в памяти один блок, а не весь файл
+    chunk_rows = 20000
+    assert peak_memory(lambda: read_chunks(large_file, chunk_rows)) < MAX_CHUNK_BYTES_PER_ROW * chunk_rows
+
+
+def test_load_memory(large_file):
+    assert peak_memory(lambda: load_numeric(large_file)) < MAX_LOAD_BYTES_PER_ROW * ROWS
@@ -0,0 +1,281 @@
+import time
+
+import numpy as np
+import pytest
+
+from conftest import write_table
+from CSVManager.Dataset import Dataset
+from CSVManager.Jobs import Job, JobScheduler, PRIORITY_PREFETCH, PRIORITY_PREVIEW
+from CSVManager.Reader import Reader
+from CSVManager.view.CSVView import read_table
+from GraphManager.Cursor import KDTreeIndex
+from GraphManager.Export import visible_data
+from GraphManager.Series import Series
+
+
+def wait_until(app, condition, timeout=30):
+    """
+    Обработка событий Qt, пока не выполнится условие: результаты задач приходят через очередь событий.
+    """
+    end = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < end, "условие не выполнилось за отведённое время"
+        app.processEvents()
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def graph_builder(qapp):
+    import main
+    window = main.GraphBuilder()
+    window._open_CSV_loader()
+    yield window
+    window.close()
+    qapp.processEvents()
+
+
+def test_downsample_keeps_extremes():
+    x = np.arange(100000, dtype=float)
+    y = np.sin(x / 500)
+    y[12345] = 10
+    y[54321] = -10
+    series = Series(x, y)
+    dx, dy = series.downsample(float("-inf"), float("inf"), 1000)
+    # Точки после последней полной корзины прореживания передаются как есть
+    bucket = int(np.ceil(len(x) / 500))
+    assert len(dx) <= 1000 + len(x) % bucket
+    assert dy.max() == 10 and dy.min() == -10
+    assert np.all(np.diff(dx) >= 0)
+
+
+@pytest.mark.parametrize("is_line, is_sorted, spilled", [
+    (False, True, False), (False, False, False), (True, False, False), (False, True, True)])
+def test_downsample_draws_data_points(is_line, is_sorted, spilled):
+    rng = np.random.default_rng(2)
+    x = rng.uniform(0, 100, 100000)
+    x = np.sort(x) if is_sorted else x
+    y = rng.normal(size=len(x))
+    y[[10, 20000]] = np.nan
+    series = Series(x, y, is_line=is_line)
+    if spilled:
+        series.spill()
+    dx, dy = series.downsample(10, 90, 2000)
+    assert len(dx) <= 2000 + 2 * int(np.ceil(len(x) / 1000))
+    points = set(zip(x.tolist(), y.tolist()))
+    assert all(point in points for point in zip(dx.tolist(), dy.tolist()))
+    start, stop = series.visible_slice(10, 90)
+    assert np.nanmax(dy) == np.nanmax(y[start:stop]) and np.nanmin(dy) == np.nanmin(y[start:stop])
+
+
+@pytest.fixture(scope="module")
+def clustered_points():
+    # Почти все точки в одном углу и одна далёкая точка: равномерная сетка по охвату здесь вырождается
+    rng = np.random.default_rng(3)
+    x = np.r_[rng.normal(0, 0.01, 200000), 1000.0]
+    y = np.r_[rng.normal(0, 0.01, 200000), 1000.0]
+    x[5], y[5] = np.nan, 0.0
+    return x, y
+
+
+@pytest.mark.parametrize("x0, y0", [(0, 0), (0.004, -0.002), (500, 500), (999, 3), (-50, 2000)])
+def test_nearest_point_on_clustered_data(clustered_points, x0, y0):
+    x, y = clustered_points
+    index = KDTreeIndex(x, y)
+    visited = []
+    box_distance = index._box_distance
+    index._box_distance = lambda *args: visited.append(1) or box_distance(*args)
+
+    i = index.nearest(x0, y0, 0.5, 2.0)
+    dist = np.hypot((x - x0) / 0.5, (y - y0) / 2.0)
+    assert dist[i] == np.nanmin(dist)
+    # Просматривается несколько узлов дерева, а не все точки или ячейки
+    assert len(visited) < 100
+
+
+def test_visible_slice_and_data():
+    x = np.arange(1000) * 0.1
+    series = Series(x, x * 2)
+    start, stop = series.visible_slice(10, 20)
+    assert x[start] < 10 <= x[start + 1] and x[stop - 2] <= 20 < x[stop - 1]
+    vx, vy = visible_data(series.x, series.y, series.order, 10, 20)
+    assert vx[0] >= 10 and vx[-1] <= 20
+    np.testing.assert_array_equal(vy, vx * 2)
+
+
+def test_job_priorities_and_cancel(qapp):
+    scheduler = JobScheduler(workers=1)
+    blocker = Job(lambda job: job.sleep(10))
+    scheduler.submit(blocker)
+    wait_until(qapp, blocker.is_running)
+
+    order = []
+    queued = Job(lambda job: "отменена")
+    queued.finished.connect(order.append)
+    cancelled = []
+    queued.done.connect(lambda: cancelled.append(queued))
+    low = Job(lambda job: "prefetch", priority=PRIORITY_PREFETCH)
+    high = Job(lambda job: "preview", priority=PRIORITY_PREVIEW)
+    low.finished.connect(order.append)
+    high.finished.connect(order.append)
+    for job in (queued, low, high):
+        scheduler.submit(job)
+    assert scheduler.cancel(queued.id)
+    assert cancelled == [queued] and queued.is_done()
+
+    blocker.cancel()
+    wait_until(qapp, lambda: len(order) == 2)
+    assert order == ["preview", "prefetch"]
+    assert scheduler.wait_all(5000) and not scheduler.jobs()
+
+
+def test_read_table_job(qapp, numeric_file):
+    results = []
+    job = Job(read_table, numeric_file, rows=5)
+    job.finished.connect(results.append)
+    JobScheduler.shared().submit(job)
+    wait_until(qapp, lambda: results)
+    result = results[0]
+    assert result["headers"] == ["t", "v", "w"]
+    assert len(result["rows"]) == 5
+    assert (result["encoding"], result["delimiter"]) == ("utf-8", ",")
+
+
+def test_file_to_plot(qapp, graph_builder, tmp_path):
+    t = np.arange(20000) * 0.25
+    path = write_table(tmp_path / "signal.csv", ["t", "v", "w"], [t, np.round(np.sin(t), 4), t * 2],
+                       delimiter=";")
+    other = write_table(tmp_path / "other.csv", ["a", "b"], [range(10), range(10)])
+    loader = graph_builder._CSV_loader_window
+
+    # Предпросмотр ранее открытого файла не должен заменить последний
+    loader.file_name = other
+    loader._load_5_lines_from_csv_file(other)
+    loader.file_name = path
+    loader._load_5_lines_from_csv_file(path)
+    wait_until(qapp, lambda: loader.file_headers == ["t", "v", "w"])
+    qapp.processEvents()
+    assert loader.file_headers == ["t", "v", "w"]
+    assert loader.delimiter_label.text() == "Разделитель: ;"
+
+    completed = []
+    loader.dataset_completed.connect(completed.append)
+    loader.x_col_combobox.setCurrentText("t")
+    loader.y_col_combobox.set_checked_items(["v", "w"])
+    loader._load_csv_file()
+    wait_until(qapp, lambda: len(graph_builder.graphs) == 2 and all(
+        dataset.complete for dataset, *_ in graph_builder._sources.values()))
+
+    series = graph_builder.graphs[path + "t" + "w"]
+    np.testing.assert_array_equal(series.x, t)
+    np.testing.assert_array_equal(series.y, t * 2)
+    # Серии файла разделяют один массив X
+    assert graph_builder.graphs[path + "t" + "v"].x.base is series.x.base
+
+    graph_builder.plot_grid.redraw()
+    graph_builder.render_scheduler.flush()
+    _, curve, _ = next(graph_builder.plot_grid.items())
+    x, y = curve.getData()
+    assert 0 < len(x) < len(t)
+    assert y.max() == pytest.approx(1, abs=1e-3)
+
+
+def test_streaming_updates(qapp, graph_builder, numeric_file):
+    reader = Reader(numeric_file)
+    chunks = reader.iter_chunks(100)
+    dataset = Dataset(numeric_file)
+    dataset.append_chunk(next(chunks))
+
+    graph_builder._on_cols_selected(dataset, numeric_file, "t", ["w"], ["#ff0000"])
+    key = numeric_file + "t" + "w"
+    assert len(graph_builder.graphs[key]) == 100
+    assert key in graph_builder._streaming
+
+    for chunk in chunks:
+        dataset.append_chunk(chunk)
+        graph_builder._on_dataset_updated(dataset)
+    dataset.complete = True
+    graph_builder._on_dataset_completed(dataset)
+
+    series = graph_builder.graphs[key]
+    assert len(series) == 1000 and not graph_builder._streaming
+    np.testing.assert_array_equal(series.y, np.arange(1000) * 1.0)
+    assert series.order.is_sorted
+
+
+def test_memory_enforced_in_background(qapp, graph_builder, numeric_file, monkeypatch):
+    from CSVManager.Loading import load_dataset
+    from CSVManager.Memory import MemoryBudget, is_spilled
+
+    dataset = load_dataset(numeric_file)
+    graph_builder._on_cols_selected(dataset, numeric_file, "t", ["w"], ["#ff0000"])
+    monkeypatch.setattr(MemoryBudget, "budget", 0)
+    graph_builder.memory_budget_mb = None
+    graph_builder._enforce_memory()
+    assert graph_builder._spill_job is not None
+    wait_until(qapp, lambda: graph_builder._spill_job is None)
+    assert is_spilled(graph_builder.graphs[numeric_file + "t" + "w"].y)
+
+
+def test_browse_mode_reports_read_errors(qapp, tmp_path):
+    from CSVManager.view.CSVView import CSVTableViewer
+
+    path = tmp_path / "data.csv"
+    path.write_text("a,б\n1,2\n", encoding="utf-8")
+    viewer = CSVTableViewer()
+    viewer.encoding = "ascii"
+    viewer.file_name = str(path)
+    viewer.browse_action.setChecked(True)
+    assert not viewer.browse_action.isChecked() and viewer.browse_model is None
+    assert viewer.status_bar.currentMessage().startswith("Не удалось открыть файл для просмотра")
+    viewer.close()
+
+
+def test_browse_mode_explains_unavailable_source(qapp, tmp_path):
+    import gzip
+
+    from CSVManager.view.CSVView import CSVTableViewer
+
+    with gzip.open(tmp_path / "data.csv.gz", "wt") as f:
+        f.write("a\n1\n")
+    viewer = CSVTableViewer()
+    messages = {}
+    for name, source in [("shards", str(tmp_path)), ("glob", str(tmp_path / "*.csv")),
+                         ("missing", str(tmp_path / "missing.csv")), ("gzip", str(tmp_path / "data.csv.gz"))]:
+        viewer.file_name = source
+        viewer.browse_action.setChecked(True)
+        assert not viewer.browse_action.isChecked() and viewer.browse_model is None
+        messages[name] = viewer.status_bar.currentMessage()
+    assert "набора файлов" in messages["shards"] and messages["glob"] == messages["shards"]
+    assert "не найден" in messages["missing"]
+    assert "сжатого файла (gzip)" in messages["gzip"]
+    viewer.close()
+
+
+def test_cancel_prefetch_does_not_wait(qapp, graph_builder):
+    loader = graph_builder._CSV_loader_window
+    job = Job(lambda job: time.sleep(0.5))
+    for signal in (job.progress, job.finished, job.failed):
+        signal.connect(loader._on_prefetch_error)
+    loader.prefetch_job = job
+    JobScheduler.shared().submit(job)
+    wait_until(qapp, job.is_running)
+
+    start = time.monotonic()
+    loader._cancel_prefetch()
+    assert time.monotonic() - start < 0.2
+    assert loader.prefetch_job is None and job.is_cancelled()
+    wait_until(qapp, job.is_done)
+
+
+def test_aborted_streaming_releases_series(qapp, graph_builder, numeric_file):
+    loader = graph_builder._CSV_loader_window
+    dataset = Dataset(numeric_file)
+    dataset.append_chunk(next(Reader(numeric_file).iter_chunks(100)))
+    graph_builder._on_cols_selected(dataset, numeric_file, "t", ["w"], ["#ff0000"])
+    loader._streaming_dataset = dataset
+
+    # Выбор другого файла прерывает загрузку
+    loader._cancel_prefetch()
+    series = graph_builder.graphs[numeric_file + "t" + "w"]
+    assert not graph_builder._streaming
+    assert not series.streaming and series.truncated and len(series) == 100
@@ -0,0 +1,150 @@
+import numpy as np
+import pytest
+
+from conftest import write_table
+from CSVManager.ParseErrors import ON_ERROR_NAN, ON_ERROR_SKIP
+from CSVManager.Reader import Reader
+
+NAMES = ["имя", "значение"]
+ROWS = [[f"строка{i}" for i in range(300)], [str(i) for i in range(300)]]
+
+
+@pytest.mark.parametrize("encoding", ["utf-8", "cp1251"])
+def test_detect_encoding(tmp_path, encoding):
+    path = write_table(tmp_path / "text.csv", NAMES, ROWS, encoding=encoding)
+    reader = Reader(path)
+    data = reader.read_n(2)
+    assert reader._detected_encoding == encoding
+    assert data == [{"имя": "строка0", "значение": "0"}, {"имя": "строка1", "значение": "1"}]
+
+
+def test_detect_utf8_sample_cut_inside_character(tmp_path):
+    # Образец для определения кодировки - первые 1024 байта, они заканчиваются на первом байте буквы
+    path = tmp_path / "text.csv"
+    path.write_text("x" * 1022 + ",я\n1,2\n", encoding="utf-8")
+    reader = Reader(str(path))
+    assert reader.read_n(1) == [{"x" * 1022: "1", "я": "2"}]
+    assert reader._detected_encoding == "utf-8"
+
+
+def test_explicit_encoding(tmp_path):
+    path = write_table(tmp_path / "text.csv", NAMES, ROWS, encoding="cp1251")
+    reader = Reader(path, encoding="cp1251")
+    assert reader.read_n(1)[0]["имя"] == "строка0"
+
+
+@pytest.mark.parametrize("delimiter", [",", ";", "\t", "|"])
+def test_detect_delimiter(tmp_path, delimiter):
+    path = write_table(tmp_path / "data.csv", ["a", "b", "c"], [range(50), range(50, 100), range(100, 150)],
+                       delimiter=delimiter)
+    reader = Reader(path)
+    data = reader.read()
+    assert reader._detected_delimiter == delimiter
+    assert len(data) == 50
+    assert data[-1] == {"a": "49", "b": "99", "c": "149"}
+
+
+@pytest.mark.parametrize("delimiter", [";", "\t", "|"])
+def test_sep_line(tmp_path, delimiter):
+    path = write_table(tmp_path / "data.csv", ["a", "b"], [range(10), range(10, 20)],
+                       delimiter=delimiter, sep_line=True)
+    reader = Reader(path)
+    data = reader.read()
+    assert reader._has_sep_line
+    assert reader._detected_delimiter == delimiter
+    assert list(data[0]) == ["a", "b"]
+    assert len(data) == 10
+
+
+def test_sep_line_in_chunks(tmp_path):
+    path = write_table(tmp_path / "data.csv", ["a", "b"], [range(10), range(10, 20)], delimiter=";",
+                       sep_line=True)
+    reader = Reader(path)
+    chunks = list(reader.iter_chunks(4))
+    assert reader.headers == ["a", "b"]
+    assert [value for chunk in chunks for value in chunk["a"]] == [str(i) for i in range(10)]
+    assert reader.errors.first_data_line == 3
+
+
+def test_explicit_delimiter_overrides_sep_line(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("sep=;\na,b\n1,2\n", encoding="utf-8")
+    reader = Reader(str(path), delimiter=",")
+    assert reader.read() == [{"a": "1", "b": "2"}]
+
+
+@pytest.mark.parametrize("n, expected", [(0, 0), (1, 1), (5, 5), (20, 20), (21, 20), (1000, 20), (-1, 0)])
+def test_read_n_bounds(tmp_path, n, expected):
+    path = write_table(tmp_path / "data.csv", ["a", "b"], [range(20), range(20)])
+    data = Reader(path).read_n(n)
+    assert len(data) == expected
+    assert [row["a"] for row in data] == [str(i) for i in range(expected)]
+
+
+def test_read_n_header_only_and_empty(tmp_path):
+    header_only = tmp_path / "header.csv"
+    header_only.write_text("a,b\n", encoding="utf-8")
+    empty = tmp_path / "empty.csv"
+    empty.write_text("", encoding="utf-8")
+    assert Reader(str(header_only)).read_n(5) == []
+    assert Reader(str(empty)).read_n(5) == []
+
+
+def test_missing_file(tmp_path):
+    with pytest.raises(FileNotFoundError):
+        Reader(str(tmp_path / "missing.csv")).read_n(5)
+
+
+def test_quoted_fields_match_csv_module(tmp_path):
+    path = tmp_path / "quoted.csv"
+    path.write_text('a,b\n1,"x, y"\n2,"с ""кавычками"""\n3,z\n', encoding="utf-8")
+    chunks = list(Reader(str(path)).iter_chunks(2))
+    assert [value for chunk in chunks for value in chunk["b"]] == ["x, y", 'с "кавычками"', "z"]
+
+
+def test_fast_tokenizer_matches_csv_path(tmp_path):
+    rng = np.random.default_rng(1)
+    path = write_table(tmp_path / "data.csv", ["t", "v", "w"],
+                       [np.arange(5000), rng.normal(size=5000), rng.integers(0, 9, 5000)], delimiter=";")
+
+    def columns(fast):
+        reader = Reader(path)
+        reader.fast_tokenizer = fast
+        result = {}
+        for chunk in reader.iter_chunks(700, 100, columns=["w", "t"]):
+            for name, values in chunk.items():
+                result.setdefault(name, []).extend(values)
+        return result
+
+    assert columns(True) == columns(False)
+
+
+@pytest.mark.parametrize("chunk_rows", [1, 2, 3, 4, 100])
+@pytest.mark.parametrize("newline", ["\n", "\r\n"])
+def test_single_column_blank_lines_match_csv_path(tmp_path, chunk_rows, newline):
+    # Пустая строка может оказаться и в середине, и в конце блока строк
+    path = tmp_path / "column.csv"
+    path.write_bytes(newline.join(["v", "1", "2", "", "3", "4", "", "", "5", "6", ""]).encode() + b"\n")
+
+    def read(fast):
+        reader = Reader(str(path), delimiter=",")
+        reader.fast_tokenizer = fast
+        chunks = list(reader.iter_chunks(chunk_rows))
+        return [value for chunk in chunks for value in chunk["v"]], reader.errors.row_to_line(4)
+
+    assert read(True) == read(False)
+
+
+@pytest.mark.parametrize("fast", [True, False])
+def test_bad_rows(tmp_path, fast):
+    path = tmp_path / "bad.csv"
+    path.write_text("a,b\n1,2\n3\n4,5,6\n7,8\n", encoding="utf-8")
+
+    def read(on_error):
+        reader = Reader(str(path), on_error=on_error)
+        reader.fast_tokenizer = fast
+        chunks = list(reader.iter_chunks(10))
+        return [value for chunk in chunks for value in chunk["a"]], list(reader.errors.lines)
+
+    assert read(ON_ERROR_SKIP) == (["1", "7"], [3, 4])
+    assert read(ON_ERROR_NAN)[0] == ["1", "3", "4", "7"]
@@ -0,0 +1,53 @@
+import os
+import threading
+
+import pytest
+
+import PlotService
+from CSVManager.Dataset import DatasetCache
+from PlotService import PlotService as Service, ServiceClient
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    # Личный каталог сервиса - во временной папке теста
+    monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path / "runtime"))
+    monkeypatch.delenv(PlotService.ADDRESS_ENV, raising=False)
+    monkeypatch.delenv(PlotService.AUTHKEY_ENV, raising=False)
+    os.makedirs(tmp_path / "runtime", mode=0o700)
+    service = Service(workers=2, max_datasets=1)
+    thread = threading.Thread(target=service.serve_forever, daemon=True)
+    thread.start()
+    yield service
+    service._running = False
+    thread.join(5)
+
+
+@pytest.mark.skipif(os.name != "posix", reason="права доступа к сокету")
+def test_service_is_private(service):
+    directory = PlotService.user_directory()
+    assert service.address == os.path.join(directory, "service.sock")
+    assert os.stat(directory).st_mode & 0o777 == 0o700
+    assert os.stat(os.path.join(directory, PlotService.KEY_FILE)).st_mode & 0o777 == 0o600
+
+
+def test_service_requires_key(service, monkeypatch):
+    monkeypatch.setenv(PlotService.AUTHKEY_ENV, "чужой ключ")
+    assert ServiceClient.connect() is None
+
+
+def test_relative_paths_and_eviction(service, numeric_file, tmp_path, monkeypatch):
+    other = tmp_path / "other.csv"
+    other.write_text("a,b\n1,2\n", encoding="utf-8")
+    client = ServiceClient.connect()
+    assert client is not None
+    # Путь относителен каталогу клиента, а не сервиса
+    monkeypatch.chdir(os.path.dirname(numeric_file))
+    status = client.load(os.path.basename(numeric_file))
+    assert (status["headers"], status["rows"]) == (["t", "v", "w"], 1000)
+
+    assert client.load(str(other))["rows"] == 1
+    # Хранится один набор данных: первый файл удалён из сервиса и кэша
+    assert len(service._loads) == 1 and len(service._partial) == 1
+    assert DatasetCache.get(numeric_file) is None
+    client.close()
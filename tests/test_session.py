@@ -0,0 +1,73 @@
+import Session
+from CSVManager.ParseCache import ParseCache
+
+
+def test_restore_reports_every_error(qapp, numeric_file, tmp_path):
+    thread = Session.SessionRestoreThread([
+        {"file": numeric_file},
+        {"file": numeric_file, "filter": ["не условие"], "encoding": None, "delimiter": None,
+         "needs_text": False, "columns": [], "derived": []},
+        ["не описание"],
+    ], workers=1)
+    thread.cache = ParseCache(str(tmp_path / "cache"))
+    errors = []
+    thread.error_occurred.connect(lambda index, message: errors.append(index))
+    thread.run()
+    assert errors == [0, 1, 2]
+
+
+def test_save_hashes_unchanged_file_once(numeric_file, tmp_path, monkeypatch):
+    from CSVManager import ParseCache as parse_cache
+    from CSVManager.Loading import load_dataset
+
+    hashed = []
+    content_hash = parse_cache.content_hash
+    monkeypatch.setattr(parse_cache, "content_hash", lambda source: hashed.append(source) or content_hash(source))
+    cache = ParseCache(str(tmp_path / "cache"))
+    dataset = load_dataset(numeric_file)
+    state = {"datasets": [(dataset, ["t", "w"], False)], "series": [], "view": {}}
+    for name in ("first", "second"):
+        Session.save_session(str(tmp_path / f"{name}.gbsession"), state, cache)
+    assert hashed == [numeric_file]
+
+    spec = Session.read_session(str(tmp_path / "second.gbsession"))["datasets"][0]
+    restored, parsed = Session.restore_dataset(spec, cache)
+    assert not parsed and restored.float_column("w")[-1] == 999
+
+
+def test_cache_evicts_least_recently_used(numeric_file, tmp_path):
+    import os
+
+    from CSVManager.Loading import load_dataset
+
+    dataset = load_dataset(numeric_file)
+    cache = ParseCache(str(tmp_path / "cache"))
+    cache.store("first", dataset, ["t"])
+    entry_size = cache.size()
+    cache.store("second", dataset, ["t"])
+    os.utime(tmp_path / "cache" / "first", (1, 1))
+    os.utime(tmp_path / "cache" / "second", (2, 2))
+    assert cache.load("first", numeric_file, "nan", columns=["t"]) is not None
+
+    cache.max_bytes = 2 * entry_size
+    cache.store("third", dataset, ["t"])
+    assert sorted(key for key, _, _ in cache.entries()) == ["first", "third"]
+    assert cache.size() <= cache.max_bytes
+
+    cache.clear()
+    assert cache.entries() == []
+
+
+def test_concurrent_store_of_same_key(numeric_file, tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+
+    from CSVManager.Loading import load_dataset
+
+    dataset = load_dataset(numeric_file)
+    cache = ParseCache(str(tmp_path / "cache"))
+    columns = [["t"], ["w"], ["w", "t"], ["t", "w"]] * 4
+    with ThreadPoolExecutor(4) as pool:
+        list(pool.map(lambda names: cache.store("key", dataset, names), columns))
+    loaded = cache.load("key", numeric_file, "nan", columns=["t", "w"])
+    assert loaded.float_column("w")[-1] == 999
+    assert loaded.float_column("t")[-1] == dataset.float_column("t")[-1]
@@ -0,0 +1,40 @@
+import os
+
+from CSVManager.Filters import RowFilter
+from CSVManager.Shards import ShardedDataset
+from CSVManager.view.ParseErrorsView import ParseErrorsModel
+
+
+def test_shard_errors_in_dataset_errors(qapp, tmp_path):
+    (tmp_path / "1.csv").write_text("a,b\n1,2\n3,4\n", encoding="utf-8")
+    (tmp_path / "2.csv").write_text("a,b\n5,6\n7\n8,x\n9,10\n", encoding="utf-8")
+    dataset = ShardedDataset(str(tmp_path))
+    dataset.load(workers=1)
+    dataset.float_column("b")
+
+    second = str(tmp_path / "2.csv")
+    assert [(line, reason, column, file) for line, _, reason, column, file in dataset.errors] == [
+        (3, "неверное количество полей", "", second), (3, "пустое значение", "b", second),
+        (4, "не число", "b", second)]
+    dataset.errors.resolve_offsets(None)
+    assert [offset for _, offset, *_ in dataset.errors] == [8, 8, 10]
+
+    # После уточнения фильтра строки по-прежнему сопоставляются строкам частей
+    filtered = dataset.filtered(RowFilter(["a > 4"]))
+    filtered.float_column("b")
+    assert [(line, file) for line, _, _, _, file in list(filtered.errors)[-2:]] == [(3, second), (4, second)]
+
+    model = ParseErrorsModel(dataset.errors)
+    assert model.columnCount() == 5
+    assert model.data(model.index(1, 4)) == os.path.basename(second)
+
+
+def test_process_pool_without_forkserver(tmp_path, monkeypatch):
+    # В Windows нет forkserver: части разбираются в процессах, запущенных через spawn
+    import multiprocessing
+    monkeypatch.setattr(multiprocessing, "get_all_start_methods", lambda: ["spawn"])
+    for i in range(2):
+        (tmp_path / f"{i}.csv").write_text(f"a,b\n{i},2\n", encoding="utf-8")
+    dataset = ShardedDataset(str(tmp_path))
+    dataset.load(workers=2)
+    assert dataset.raw_column("a") == ["0", "1"]